@@ -0,0 +1,31 @@
+"""Add node/start_time index on reservations
+
+Revision ID: 3b9d2f4a6c10
+Revises: 227e025a171c
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3b9d2f4a6c10"
+down_revision: Union[str, None] = "227e025a171c"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_reservations_node_id_start_time",
+        "reservations",
+        ["node_id", "start_time"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_reservations_node_id_start_time", table_name="reservations")
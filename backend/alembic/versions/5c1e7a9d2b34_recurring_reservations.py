@@ -0,0 +1,97 @@
+"""Add recurring reservations
+
+Revision ID: 5c1e7a9d2b34
+Revises: 3b9d2f4a6c10
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5c1e7a9d2b34"
+down_revision: Union[str, None] = "3b9d2f4a6c10"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "recurring_reservations",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("start_time", sa.DateTime(), nullable=False),
+        sa.Column("end_time", sa.DateTime(), nullable=False),
+        sa.Column(
+            "type", sa.Enum("MACHINE", "DEVICE", name="reservationtype"), nullable=False
+        ),
+        sa.Column(
+            "frequency",
+            sa.Enum("DAILY", "WEEKLY", name="recurrencefrequency"),
+            nullable=False,
+        ),
+        sa.Column("interval", sa.Integer(), nullable=False),
+        sa.Column("by_weekday", sa.String(length=20), nullable=True),
+        sa.Column("until", sa.DateTime(), nullable=True),
+        sa.Column("count", sa.Integer(), nullable=True),
+        sa.Column("series_end", sa.DateTime(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("node_id", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["node_id"],
+            ["nodes.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_recurring_reservations_id"), "recurring_reservations", ["id"], unique=False
+    )
+    op.create_index(
+        "ix_recurring_reservations_node_id_start_time",
+        "recurring_reservations",
+        ["node_id", "start_time"],
+        unique=False,
+    )
+    op.create_table(
+        "recurring_reservation_devices",
+        sa.Column("series_id", sa.Integer(), nullable=False),
+        sa.Column("device_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["device_id"],
+            ["devices.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["series_id"],
+            ["recurring_reservations.id"],
+        ),
+        sa.PrimaryKeyConstraint("series_id", "device_id"),
+    )
+    op.create_table(
+        "recurring_reservation_exceptions",
+        sa.Column("series_id", sa.Integer(), nullable=False),
+        sa.Column("occurrence_start", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["series_id"],
+            ["recurring_reservations.id"],
+        ),
+        sa.PrimaryKeyConstraint("series_id", "occurrence_start"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("recurring_reservation_exceptions")
+    op.drop_table("recurring_reservation_devices")
+    op.drop_index(
+        "ix_recurring_reservations_node_id_start_time", table_name="recurring_reservations"
+    )
+    op.drop_index(op.f("ix_recurring_reservations_id"), table_name="recurring_reservations")
+    op.drop_table("recurring_reservations")
@@ -0,0 +1,89 @@
+"""Add reservation archive tables
+
+Revision ID: 8d4f2b6e1a57
+Revises: 5c1e7a9d2b34
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8d4f2b6e1a57"
+down_revision: Union[str, None] = "5c1e7a9d2b34"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "reservations_archive",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("start_time", sa.DateTime(), nullable=False),
+        sa.Column("end_time", sa.DateTime(), nullable=False),
+        sa.Column(
+            "type", sa.Enum("MACHINE", "DEVICE", name="reservationtype"), nullable=False
+        ),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.Column("archived_at", sa.DateTime(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("node_id", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["node_id"],
+            ["nodes.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_reservations_archive_start_time",
+        "reservations_archive",
+        ["start_time"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_reservations_archive_user_id_start_time",
+        "reservations_archive",
+        ["user_id", "start_time"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_reservations_archive_node_id_start_time",
+        "reservations_archive",
+        ["node_id", "start_time"],
+        unique=False,
+    )
+    op.create_table(
+        "reservation_devices_archive",
+        sa.Column("reservation_id", sa.Integer(), nullable=False),
+        sa.Column("device_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["device_id"],
+            ["devices.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["reservation_id"],
+            ["reservations_archive.id"],
+        ),
+        sa.PrimaryKeyConstraint("reservation_id", "device_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("reservation_devices_archive")
+    op.drop_index(
+        "ix_reservations_archive_node_id_start_time", table_name="reservations_archive"
+    )
+    op.drop_index(
+        "ix_reservations_archive_user_id_start_time", table_name="reservations_archive"
+    )
+    op.drop_index("ix_reservations_archive_start_time", table_name="reservations_archive")
+    op.drop_table("reservations_archive")
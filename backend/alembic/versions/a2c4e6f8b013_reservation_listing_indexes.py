@@ -0,0 +1,35 @@
+"""Add start_time indexes for keyset-paginated reservation listings
+
+Revision ID: a2c4e6f8b013
+Revises: 8d4f2b6e1a57
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a2c4e6f8b013"
+down_revision: Union[str, None] = "8d4f2b6e1a57"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_reservations_start_time", "reservations", ["start_time"], unique=False
+    )
+    op.create_index(
+        "ix_reservations_user_id_start_time",
+        "reservations",
+        ["user_id", "start_time"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_reservations_user_id_start_time", table_name="reservations")
+    op.drop_index("ix_reservations_start_time", table_name="reservations")
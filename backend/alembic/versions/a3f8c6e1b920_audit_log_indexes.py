@@ -0,0 +1,54 @@
+"""Add composite indexes for audit log queries
+
+Revision ID: a3f8c6e1b920
+Revises: f7d1b5c9e832
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a3f8c6e1b920"
+down_revision: Union[str, None] = "f7d1b5c9e832"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    "ix_audit_logs_created_at_id": ["created_at", "id"],
+    "ix_audit_logs_user_id_created_at": ["user_id", "created_at"],
+    "ix_audit_logs_action_created_at": ["action", "created_at"],
+    "ix_audit_logs_resource_created_at": ["resource_type", "resource_id", "created_at"],
+}
+
+
+def upgrade() -> None:
+    # audit_logs was never part of a migration; databases built from the
+    # migrations alone don't have it yet
+    if not sa.inspect(op.get_bind()).has_table("audit_logs"):
+        op.create_table(
+            "audit_logs",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=True),
+            sa.Column("action", sa.String(length=50), nullable=False),
+            sa.Column("resource_type", sa.String(length=50), nullable=False),
+            sa.Column("resource_id", sa.Integer(), nullable=True),
+            sa.Column("details", sa.JSON(), nullable=True),
+            sa.Column("ip_address", sa.String(length=45), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_audit_logs_id", "audit_logs", ["id"], unique=False)
+    for name, columns in INDEXES.items():
+        op.create_index(name, "audit_logs", columns, unique=False)
+
+
+def downgrade() -> None:
+    # The table is kept: it may predate this revision
+    for name in reversed(list(INDEXES)):
+        op.drop_index(name, table_name="audit_logs")
@@ -0,0 +1,76 @@
+"""Add reservation waitlist
+
+Revision ID: b7e3d1c5f924
+Revises: a2c4e6f8b013
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b7e3d1c5f924"
+down_revision: Union[str, None] = "a2c4e6f8b013"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "waitlist_entries",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("start_time", sa.DateTime(), nullable=False),
+        sa.Column("end_time", sa.DateTime(), nullable=False),
+        sa.Column(
+            "type", sa.Enum("MACHINE", "DEVICE", name="reservationtype"), nullable=False
+        ),
+        sa.Column("device_ids", sa.JSON(), nullable=True),
+        sa.Column("priority", sa.Integer(), nullable=False),
+        sa.Column(
+            "status",
+            sa.Enum("WAITING", "ALLOCATED", "EXPIRED", "CANCELLED", name="waitliststatus"),
+            nullable=False,
+        ),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("resolved_at", sa.DateTime(), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("node_id", sa.Integer(), nullable=True),
+        sa.Column("reservation_id", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["node_id"],
+            ["nodes.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_waitlist_entries_id"), "waitlist_entries", ["id"], unique=False
+    )
+    op.create_index(
+        "ix_waitlist_entries_node_id_status_start_time",
+        "waitlist_entries",
+        ["node_id", "status", "start_time"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_waitlist_entries_user_id_status",
+        "waitlist_entries",
+        ["user_id", "status"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_waitlist_entries_user_id_status", table_name="waitlist_entries")
+    op.drop_index(
+        "ix_waitlist_entries_node_id_status_start_time", table_name="waitlist_entries"
+    )
+    op.drop_index(op.f("ix_waitlist_entries_id"), table_name="waitlist_entries")
+    op.drop_table("waitlist_entries")
@@ -0,0 +1,48 @@
+"""Never reuse reservation IDs on SQLite
+
+Revision ID: b8d2f4a6c135
+Revises: a3f8c6e1b920
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b8d2f4a6c135"
+down_revision: Union[str, None] = "a3f8c6e1b920"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Without AUTOINCREMENT, SQLite hands out max(id) + 1, which after
+    # archiving can be an ID that already exists in reservations_archive
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    with op.batch_alter_table(
+        "reservations", recreate="always", table_kwargs={"sqlite_autoincrement": True}
+    ):
+        pass
+    # New IDs must also stay above every archived one
+    op.execute(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'reservations', 0 "
+        "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'reservations')"
+    )
+    op.execute(
+        "UPDATE sqlite_sequence SET seq = max("
+        "seq, "
+        "(SELECT coalesce(max(id), 0) FROM reservations), "
+        "(SELECT coalesce(max(id), 0) FROM reservations_archive)"
+        ") WHERE name = 'reservations'"
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    with op.batch_alter_table("reservations", recreate="always"):
+        pass
@@ -0,0 +1,46 @@
+"""Add token versions and token revocations
+
+Revision ID: c4a8e2f6d310
+Revises: b7e3d1c5f924
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c4a8e2f6d310"
+down_revision: Union[str, None] = "b7e3d1c5f924"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.add_column(
+            sa.Column("token_version", sa.Integer(), server_default="0", nullable=False)
+        )
+    op.create_table(
+        "token_revocations",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("token_version", sa.Integer(), nullable=False),
+        sa.Column("revoked_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_token_revocations_id"), "token_revocations", ["id"], unique=False)
+    op.create_index(
+        op.f("ix_token_revocations_revoked_at"), "token_revocations", ["revoked_at"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_token_revocations_revoked_at"), table_name="token_revocations")
+    op.drop_index(op.f("ix_token_revocations_id"), table_name="token_revocations")
+    op.drop_table("token_revocations")
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("token_version")
@@ -0,0 +1,95 @@
+"""Recompute SSH key fingerprints as OpenSSH SHA256 fingerprints
+
+Revision ID: e5c9a3b7d621
+Revises: d2b6f0a8c417
+Create Date: 2026-10-18 17:00:00.000000
+
+Fingerprints used to be a truncated SHA-256 of the whole key line, comment
+included. They become the standard "SHA256:<base64>" fingerprint of the key
+blob. Rows that turn out to hold the same key as an older row are deleted;
+rows whose key can't be decoded keep their old fingerprint.
+"""
+
+import base64
+import binascii
+import hashlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e5c9a3b7d621"
+down_revision: Union[str, None] = "d2b6f0a8c417"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ssh_keys = sa.table(
+    "ssh_keys",
+    sa.column("id", sa.Integer),
+    sa.column("public_key", sa.String),
+    sa.column("fingerprint", sa.String),
+)
+
+
+def _openssh_fingerprint(public_key: str):
+    parts = public_key.split()
+    if len(parts) < 2:
+        return None
+    try:
+        blob = base64.b64decode(parts[1] + "=" * (-len(parts[1]) % 4), validate=True)
+    except (ValueError, binascii.Error):
+        return None
+    return "SHA256:" + base64.b64encode(hashlib.sha256(blob).digest()).decode().rstrip("=")
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    rows = connection.execute(
+        sa.select(ssh_keys.c.id, ssh_keys.c.public_key).order_by(ssh_keys.c.id)
+    ).all()
+
+    fingerprints = {}
+    seen = set()
+    duplicates = []
+    for row_id, public_key in rows:
+        fingerprint = _openssh_fingerprint(public_key)
+        if fingerprint is None:
+            continue
+        if fingerprint in seen:
+            duplicates.append(row_id)
+        else:
+            seen.add(fingerprint)
+            fingerprints[row_id] = fingerprint
+
+    if duplicates:
+        connection.execute(ssh_keys.delete().where(ssh_keys.c.id.in_(duplicates)))
+    if fingerprints:
+        connection.execute(
+            ssh_keys.update()
+            .where(ssh_keys.c.id == sa.bindparam("key_id"))
+            .values(fingerprint=sa.bindparam("new_fingerprint")),
+            [
+                {"key_id": row_id, "new_fingerprint": fingerprint}
+                for row_id, fingerprint in fingerprints.items()
+            ],
+        )
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    rows = connection.execute(sa.select(ssh_keys.c.id, ssh_keys.c.public_key)).all()
+    if rows:
+        connection.execute(
+            ssh_keys.update()
+            .where(ssh_keys.c.id == sa.bindparam("key_id"))
+            .values(fingerprint=sa.bindparam("old_fingerprint")),
+            [
+                {
+                    "key_id": row_id,
+                    "old_fingerprint": hashlib.sha256(public_key.encode()).hexdigest()[:32],
+                }
+                for row_id, public_key in rows
+            ],
+        )
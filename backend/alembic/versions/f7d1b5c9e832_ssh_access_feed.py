@@ -0,0 +1,53 @@
+"""Add SSH access events and grants
+
+Revision ID: f7d1b5c9e832
+Revises: e5c9a3b7d621
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f7d1b5c9e832"
+down_revision: Union[str, None] = "e5c9a3b7d621"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "ssh_access_events",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("node_id", sa.Integer(), nullable=False),
+        sa.Column("action", sa.Enum("GRANT", "REVOKE", name="sshaccessaction"), nullable=False),
+        sa.Column("fingerprint", sa.String(length=255), nullable=False),
+        sa.Column("username", sa.String(length=50), nullable=False),
+        sa.Column("public_key", sa.String(length=1024), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["node_id"], ["nodes.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_ssh_access_events_node_id_id", "ssh_access_events", ["node_id", "id"], unique=False
+    )
+    op.create_table(
+        "ssh_access_grants",
+        sa.Column("node_id", sa.Integer(), nullable=False),
+        sa.Column("fingerprint", sa.String(length=255), nullable=False),
+        sa.Column("username", sa.String(length=50), nullable=False),
+        sa.Column("public_key", sa.String(length=1024), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["node_id"], ["nodes.id"]),
+        sa.PrimaryKeyConstraint("node_id", "fingerprint"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("ssh_access_grants")
+    op.drop_index("ix_ssh_access_events_node_id_id", table_name="ssh_access_events")
+    op.drop_table("ssh_access_events")
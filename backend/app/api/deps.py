@@ -3,25 +3,69 @@ API dependencies for authentication and database access.
 """
 from typing import Optional
 
-from fastapi import Depends, HTTPException, Request, status
+from fastapi import Depends, HTTPException, Query, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, make_transient_to_detached
 
 from app.core.database import get_db
-from app.core.security import decode_access_token
+from app.core.pagination import Cursor, decode_cursor
+from app.core.security import API_KEY_MARKER, decode_access_token
 from app.crud import crud_user
+from app.crud.principal_cache import principal_cache
+from app.crud.token_revocation import revocation_filter
 from app.models.user import User
+from app.services import auth_service
 
 # OAuth2 scheme for token authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
 
+def _user_from_claims(db: Session, payload: dict) -> User:
+    # Columns not in the token are expired and load on first access
+    user = User(
+        id=payload["uid"],
+        username=payload["sub"],
+        is_admin=bool(payload.get("adm")),
+        is_active=True,
+        token_version=payload.get("ver", 0),
+    )
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
+
+
+def _user_from_api_key(request: Request, db: Session, key: str) -> User:
+    api_key = auth_service.authenticate_api_key(db, key)
+    if api_key is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid API key",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if not auth_service.api_key_allows(api_key, request.method, request.url.path):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="API key scope does not allow this request",
+        )
+    return api_key.owner
+
+
 def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
+    request: Request,
+    db: Session = Depends(get_db),
+    token: str = Depends(oauth2_scheme),
 ) -> User:
     """
     Dependency to get the current authenticated user.
     Validates JWT token and returns the user object.
+
+    API keys ("ssk_..." bearer tokens) are verified with one indexed query
+    and an HMAC comparison, and restricted to their scopes.
+
+    Access tokens carry the user ID, admin flag and token version. Unless the
+    revocation filter reports the version as possibly revoked, the user is
+    built from those claims without querying the users table; other columns
+    load on first access. Tokens without claims fall back to the principal
+    cache.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -29,6 +73,9 @@ def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
+    if token.startswith(API_KEY_MARKER):
+        return _user_from_api_key(request, db, token)
+    
     payload = decode_access_token(token)
     if payload is None:
         raise credentials_exception
@@ -37,9 +84,22 @@ def get_current_user(
     if username is None:
         raise credentials_exception
     
-    user = crud_user.get_user_by_username(db, username=username)
-    if user is None:
-        raise credentials_exception
+    user_id = payload.get("uid")
+    if user_id is not None:
+        version = payload.get("ver", 0)
+        revocation_filter.refresh(db)
+        if not revocation_filter.might_be_revoked(user_id, version):
+            return _user_from_claims(db, payload)
+        user = crud_user.get_user(db, user_id)
+        if user is None or (user.token_version or 0) != version:
+            raise credentials_exception
+    else:
+        user = principal_cache.get(db, username)
+        if user is None:
+            user = crud_user.get_user_by_username(db, username=username)
+            if user is None:
+                raise credentials_exception
+            principal_cache.put(user)
     
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
@@ -89,3 +149,19 @@ def get_client_ip(request: Request) -> str:
         return request.client.host
     
     return "unknown"
+
+
+def get_page_cursor(
+    cursor: Optional[str] = Query(
+        None, description="Opaque cursor from the X-Next-Cursor header of the previous page"
+    ),
+) -> Optional[Cursor]:
+    """
+    Dependency decoding the keyset pagination cursor of a listing.
+    """
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -0,0 +1,120 @@
+"""
+Audit log query and export endpoints.
+"""
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_current_active_admin, get_db, get_page_cursor
+from app.core.pagination import NEXT_CURSOR_HEADER, Cursor, split_page
+from app.crud.reservation_index import as_naive_utc
+from app.schemas.audit import AuditLogEntry
+from app.services import audit_service
+
+# Audit entries cover every user's actions, so they are admin-only
+router = APIRouter(dependencies=[Depends(get_current_active_admin)])
+
+
+def get_audit_filters(
+    user_id: Optional[int] = None,
+    action: Optional[str] = None,
+    resource_type: Optional[str] = None,
+    resource_id: Optional[int] = None,
+    start_time: Optional[datetime] = Query(None, description="Entries at or after (UTC)"),
+    end_time: Optional[datetime] = Query(None, description="Entries before (UTC)"),
+) -> dict:
+    """
+    Dependency collecting the audit entry filters shared by listing and export.
+
+    Times are converted to naive UTC, the form entries are stored in, so
+    offsets are honoured by both the live table and the archive.
+    """
+    return {
+        "user_id": user_id,
+        "action": action,
+        "resource_type": resource_type,
+        "resource_id": resource_id,
+        "start_time": as_naive_utc(start_time) if start_time is not None else None,
+        "end_time": as_naive_utc(end_time) if end_time is not None else None,
+    }
+
+
+@router.get("/", response_model=List[AuditLogEntry])
+def list_audit_logs(
+    response: Response,
+    db: Session = Depends(get_db),
+    limit: int = Query(100, ge=1, le=1000),
+    include_archived: bool = Query(False, description="Continue into archived entries"),
+    filters: dict = Depends(get_audit_filters),
+    cursor: Optional[Cursor] = Depends(get_page_cursor),
+):
+    """
+    Retrieve audit entries, newest first.
+
+    - **user_id**, **action**, **resource_type**, **resource_id**: Exact matches
+    - **start_time** / **end_time**: Time range of the entries (end exclusive)
+    - **include_archived**: Also return entries moved out of the live table
+      by retention; they follow the live entries, as they are all older
+    - **cursor**: Keyset pagination cursor from the `X-Next-Cursor` header
+
+    Requires admin privileges.
+    """
+    entries = audit_service.get_audit_logs(
+        db, limit=limit + 1, after=cursor, include_archived=include_archived, **filters
+    )
+    entries, next_cursor = split_page(entries, limit, time_field="created_at")
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return entries
+
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "content": {media_type: {} for media_type in audit_service.EXPORT_FORMATS.values()}
+        }
+    },
+)
+def export_audit_logs(
+    db: Session = Depends(get_db),
+    export_format: str = Query(
+        "ndjson", alias="format", enum=list(audit_service.EXPORT_FORMATS)
+    ),
+    include_archived: bool = Query(False, description="Include archived entries"),
+    filters: dict = Depends(get_audit_filters),
+):
+    """
+    Download every matching audit entry, oldest first, as NDJSON or CSV.
+
+    Takes the same filters and `include_archived` flag as `GET /audit-logs`;
+    archived entries come first. The file is streamed while it is read, so
+    large time ranges don't need to fit in memory.
+
+    Requires admin privileges.
+    """
+    try:
+        lines = audit_service.export_audit_logs(
+            db, export_format, include_archived=include_archived, **filters
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    def stream() -> Iterator[str]:
+        # The request's session is done with before the body is sent
+        try:
+            yield from lines
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        stream(),
+        media_type=audit_service.EXPORT_FORMATS[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="audit-logs.{export_format}"'
+        },
+    )
@@ -1,24 +1,25 @@
 """
 Authentication endpoints.
 """
-from datetime import timedelta
+import math
 
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from app.api.deps import get_client_ip
-from app.core.config import settings
+from app.api.deps import get_client_ip, get_current_user
 from app.core.database import get_db
-from app.core.security import create_access_token
-from app.schemas.auth import Token
+from app.core.security import PasswordHasherBusy
+from app.models.user import User
+from app.schemas.auth import RefreshRequest, Token
 from app.services import audit_service, auth_service
 
 router = APIRouter()
 
 
 @router.post("/login", response_model=Token)
-def login(
+async def login(
     request: Request,
     db: Session = Depends(get_db),
     form_data: OAuth2PasswordRequestForm = Depends(),
@@ -26,31 +27,88 @@ def login(
     """
     OAuth2 compatible token login.
     
-    Returns JWT access token on successful authentication.
+    Returns a short-lived JWT access token and a refresh token on successful
+    authentication. Attempts are
+    limited per username and per client IP (429 with Retry-After). Password
+    checks run on a bounded pool; when it is saturated the response is 503
+    with Retry-After.
     """
     client_ip = get_client_ip(request)
+    username = form_data.username
     
-    user = auth_service.authenticate_user(db, form_data.username, form_data.password)
+    # Write the failed-attempt summary of the previous window, if it is over
+    await run_in_threadpool(auth_service.flush_failed_logins, db)
+    
+    # Throttled attempts never reach password verification
+    retry_after = auth_service.check_login_rate(username, client_ip)
+    if retry_after:
+        auth_service.record_failed_login(username, client_ip, throttled=True)
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, please retry later",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+    
+    try:
+        user = await auth_service.authenticate_user(db, username, form_data.password)
+    except PasswordHasherBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many logins in progress, please retry",
+            headers={"Retry-After": "1"},
+        )
     if not user:
-        # Log failed login attempt (if we can identify the user)
-        # For now, we skip logging failed attempts without user_id
+        # Audited in aggregate by flush_failed_logins, not one row per attempt
+        auth_service.record_failed_login(username, client_ip)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Issued before the audit commit expires the instance
+    tokens = auth_service.issue_tokens(user)
+    
     # Log successful login
-    audit_service.log_user_login(
+    await run_in_threadpool(
+        audit_service.log_user_login,
         db=db,
         user_id=user.id,
         ip_address=client_ip,
         success=True,
     )
     
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
+    return tokens
+
+
+@router.post("/refresh", response_model=Token)
+def refresh_token(body: RefreshRequest, db: Session = Depends(get_db)):
+    """
+    Exchange a refresh token for a new access/refresh token pair.
+    
+    - **refresh_token**: Refresh token from login or a previous refresh
     
-    return {"access_token": access_token, "token_type": "bearer"}
+    The new access token reflects the user's current admin flag. Fails with
+    401 once the user is deactivated or their tokens have been revoked.
+    """
+    user = auth_service.get_refresh_token_user(db, body.refresh_token)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return auth_service.issue_tokens(user)
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+def logout_everywhere(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Revoke every access and refresh token of the current user.
+    
+    Requires authentication.
+    """
+    auth_service.revoke_all_tokens(db, current_user)
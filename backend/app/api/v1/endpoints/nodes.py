@@ -1,17 +1,32 @@
 """
 Node and device management endpoints.
 """
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_current_active_admin, get_current_user
+from app.core.config import settings
 from app.core.database import get_db
 from app.crud import crud_node
 from app.models.user import User
-from app.schemas.node import Device, DeviceCreate, Node, NodeCreate, NodeWithDevices
-from app.services import node_service
+from app.schemas.node import (
+    AvailabilityMatrix,
+    Device,
+    DeviceCreate,
+    Node,
+    NodeCreate,
+    NodeWithDevices,
+    SSHAccessDelta,
+)
+from app.services import (
+    authorized_keys_service,
+    availability_service,
+    node_service,
+    ssh_access_service,
+)
 
 router = APIRouter()
 
@@ -32,6 +47,32 @@ def list_nodes(
     return nodes
 
 
+@router.get("/availability", response_model=AvailabilityMatrix)
+def get_availability(
+    db: Session = Depends(get_db),
+    start: datetime = Query(..., description="Window start (UTC)"),
+    end: datetime = Query(..., description="Window end (UTC)"),
+    step: str = Query("15m", description="Slot length, e.g. '15m', '1h', '1d'"),
+    model_name: Optional[str] = Query(None, description="Only include devices of this model"),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Get the node x device x time-slot occupancy grid for the whole fleet.
+    
+    Each occupancy string has one character per slot: '1' if the slot overlaps
+    a reservation, '0' if it is free. Machine-level reservations mark every
+    device of their node.
+    
+    Requires authentication.
+    """
+    try:
+        return availability_service.build_availability_matrix(
+            db, start_time=start, end_time=end, step=step, model_name=model_name
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
 @router.get("/{node_id}", response_model=NodeWithDevices)
 def get_node(
     node_id: int,
@@ -89,3 +130,77 @@ def add_device(
         return device
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.get(
+    "/{node_id}/authorized_keys",
+    response_class=Response,
+    responses={200: {"content": {"text/plain": {}}}, 304: {"description": "Not modified"}},
+)
+def get_authorized_keys(
+    node_id: int,
+    db: Session = Depends(get_db),
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_active_admin),
+):
+    """
+    Get the authorized_keys file for a node.
+    
+    Contains the SSH public keys of the users holding a reservation on the
+    node right now. Responses carry a strong ETag; send it back in
+    If-None-Match to get 304 while the file is unchanged.
+    
+    Requires admin privileges; node agents should use an admin's API key
+    with only the "node_access" scope.
+    """
+    authorized_keys = authorized_keys_service.get_authorized_keys(db, node_id)
+    if authorized_keys is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Node not found",
+        )
+    
+    headers = {"ETag": authorized_keys.etag, "Cache-Control": "no-cache"}
+    if if_none_match is not None and authorized_keys.etag in {
+        tag.strip() for tag in if_none_match.split(",")
+    }:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(
+        content=authorized_keys.body, media_type="text/plain", headers=headers
+    )
+
+
+@router.get("/{node_id}/ssh-access", response_model=SSHAccessDelta)
+async def get_ssh_access_changes(
+    node_id: int,
+    db: Session = Depends(get_db),
+    since: Optional[int] = Query(None, ge=0, description="Version of the last applied response"),
+    timeout: float = Query(
+        settings.SSH_ACCESS_POLL_TIMEOUT_SECONDS,
+        ge=0,
+        le=settings.SSH_ACCESS_POLL_MAX_TIMEOUT_SECONDS,
+        description="Seconds to wait for a change",
+    ),
+    current_user: User = Depends(get_current_active_admin),
+):
+    """
+    Get SSH access grants and revocations for a node, for node agents.
+    
+    - **since**: Omit for the full set of current grants; otherwise only the
+      changes after this version are returned
+    - **timeout**: Long-poll: wait up to this many seconds for a change
+      before answering with no changes
+    
+    Apply the changes in order and pass the response's version as `since`
+    next time. A response may stop at SSH_ACCESS_MAX_CHANGES changes.
+    
+    Requires admin privileges; node agents should use an admin's API key
+    with only the "node_access" scope.
+    """
+    delta = await ssh_access_service.wait_for_changes(db, node_id, since, timeout)
+    if delta is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Node not found",
+        )
+    return delta
@@ -1,19 +1,35 @@
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_client_ip, get_current_user
+from app.api.deps import get_client_ip, get_current_user, get_page_cursor
 from app.core.database import get_db
-from app.crud import crud_reservation
+from app.core.pagination import NEXT_CURSOR_HEADER, Cursor, split_page
+from app.crud import crud_recurring, crud_reservation, crud_waitlist
+from app.models.reservation import ReservationType
 from app.models.user import User
+from app.models.waitlist import WaitlistStatus
 from app.schemas import reservation as schemas
-from app.services import audit_service, reservation_service
+from app.services import (
+    audit_service,
+    reservation_service,
+    scheduling_service,
+    waitlist_service,
+)
 
 router = APIRouter()
 
 
+def _conflict_detail(error: crud_reservation.ReservationConflictError) -> dict:
+    return schemas.ReservationConflictDetail(
+        message=str(error),
+        conflicts=error.conflicts,
+        next_available_start=error.next_available_start,
+    ).model_dump(mode="json")
+
+
 @router.post("/", response_model=schemas.Reservation, status_code=status.HTTP_201_CREATED)
 def create_reservation(
     *,
@@ -31,6 +47,12 @@ def create_reservation(
     - **type**: 'machine' or 'device'.
     - **device_ids**: A list of device IDs to reserve (required if type is 'device').
     
+    On a conflict the 409 detail lists every clashing reservation and the
+    earliest `next_available_start` at which the same request would fit.
+    
+    Send an `Idempotency-Key` header to make retries safe: a retry with the
+    same key and body returns the stored response instead of booking again.
+    
     Requires authentication.
     """
     client_ip = get_client_ip(request)
@@ -54,6 +76,8 @@ def create_reservation(
         )
         
         return reservation
+    except crud_reservation.ReservationConflictError as e:
+        raise HTTPException(status_code=409, detail=_conflict_detail(e))
     except ValueError as e:
         raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
@@ -61,8 +85,48 @@ def create_reservation(
         raise HTTPException(status_code=500, detail="An unexpected error occurred.")
 
 
+@router.post(
+    "/batch", response_model=List[schemas.Reservation], status_code=status.HTTP_201_CREATED
+)
+def create_reservations_batch(
+    *,
+    request: Request,
+    db: Session = Depends(get_db),
+    batch_in: schemas.ReservationBatchCreate,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Create many reservations atomically.
+    
+    - **reservations**: List of reservation requests, same shape as `POST /reservations`.
+    
+    All requests are validated against existing reservations and against each
+    other. Either every reservation is created or none is; on failure the 409
+    response lists every problem with the index of the offending request.
+    
+    Requires authentication.
+    """
+    client_ip = get_client_ip(request)
+    
+    try:
+        return reservation_service.create_reservations_batch(
+            db=db,
+            reservations=batch_in.reservations,
+            user_id=current_user.id,
+            ip_address=client_ip,
+        )
+    except reservation_service.ReservationBatchError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": str(e), "conflicts": e.conflicts},
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
 @router.get("/", response_model=List[schemas.Reservation])
 def list_reservations(
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
     user_id: Optional[int] = Query(None, description="Filter by user ID (admin only)"),
@@ -71,9 +135,10 @@ def list_reservations(
     end_date: Optional[datetime] = Query(None, description="Filter reservations starting before this date"),
     skip: int = Query(0, ge=0, description="Number of records to skip"),
     limit: int = Query(100, ge=1, le=1000, description="Maximum number of records to return"),
+    cursor: Optional[Cursor] = Depends(get_page_cursor),
 ):
     """
-    Get reservations with optional filters.
+    Get reservations with optional filters, newest start first.
     
     - **user_id**: Filter by user (admin only, otherwise returns current user's reservations)
     - **node_id**: Filter by node
@@ -81,6 +146,10 @@ def list_reservations(
     - **end_date**: Get reservations starting before this date
     - **skip**: Pagination offset
     - **limit**: Maximum results
+    - **cursor**: Keyset pagination cursor (replaces skip)
+    
+    When more results exist, the `X-Next-Cursor` response header carries the
+    cursor of the next page. Cursor pages cost the same at any depth.
     
     Requires authentication.
     """
@@ -103,34 +172,444 @@ def list_reservations(
         start_date=start_date,
         end_date=end_date,
         skip=skip,
-        limit=limit,
+        limit=limit + 1,
+        after=cursor,
     )
     
+    reservations, next_cursor = split_page(reservations, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return reservations
 
 
 @router.get("/my", response_model=List[schemas.Reservation])
 def get_my_reservations(
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[Cursor] = Depends(get_page_cursor),
 ):
     """
     Get all reservations for the current user.
     
+    Supports the same `cursor` / `X-Next-Cursor` pagination as `GET /reservations`.
+    
     Requires authentication.
     """
     reservations = crud_reservation.get_reservations(
         db=db,
         user_id=current_user.id,
         skip=skip,
-        limit=limit,
+        limit=limit + 1,
+        after=cursor,
     )
     
+    reservations, next_cursor = split_page(reservations, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return reservations
 
 
+@router.post(
+    "/place", response_model=schemas.Reservation, status_code=status.HTTP_201_CREATED
+)
+def place_reservation(
+    *,
+    request: Request,
+    db: Session = Depends(get_db),
+    placement_in: schemas.PlacementCreate,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Create a reservation on a node chosen by the server.
+    
+    - **start_time**: Reservation start time in UTC.
+    - **end_time**: Reservation end time in UTC.
+    - **type**: 'device' (default) or 'machine'.
+    - **device_count**: Devices needed; for 'machine', the minimum node size.
+    - **model_name**: Only use devices (or nodes having devices) of this model.
+    
+    Device requests are packed onto nodes that are already partly used, so
+    whole nodes stay free for large jobs.
+    
+    Requires authentication.
+    """
+    try:
+        reservation = reservation_service.place_reservation(
+            db, placement_in, current_user.id
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    
+    audit_service.log_reservation_created(
+        db=db,
+        user_id=current_user.id,
+        reservation_id=reservation.id,
+        node_id=reservation.node_id,
+        reservation_type=reservation.type.value,
+        start_time=reservation.start_time.isoformat(),
+        end_time=reservation.end_time.isoformat(),
+        device_ids=[device.id for device in reservation.reserved_devices],
+        ip_address=get_client_ip(request),
+    )
+    
+    return reservation
+
+
+@router.get("/slots", response_model=List[schemas.SlotCandidate])
+def search_free_slots(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    duration_minutes: int = Query(..., ge=1, description="Length of the window in minutes"),
+    type: ReservationType = Query(ReservationType.DEVICE, description="'machine' or 'device'"),
+    device_count: int = Query(1, ge=1, description="Devices needed (device reservations)"),
+    model_name: Optional[str] = Query(None, description="Only nodes/devices of this model"),
+    earliest_start: Optional[datetime] = Query(None, description="Earliest start (default: now)"),
+    horizon_days: int = Query(30, ge=1, description="How far ahead to search"),
+    limit: int = Query(5, ge=1, le=50, description="Maximum number of candidates"),
+):
+    """
+    Find the earliest windows where a reservation would fit.
+    
+    Returns up to `limit` candidates (at most one per node) ordered by start
+    time. Each candidate can be submitted as-is to `POST /reservations`.
+    
+    Requires authentication.
+    """
+    try:
+        return scheduling_service.find_free_slots(
+            db,
+            duration=timedelta(minutes=duration_minutes),
+            reservation_type=type,
+            device_count=device_count,
+            model_name=model_name,
+            earliest_start=earliest_start,
+            horizon_days=horizon_days,
+            limit=limit,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.post(
+    "/recurring",
+    response_model=schemas.RecurringReservation,
+    status_code=status.HTTP_201_CREATED,
+)
+def create_recurring_reservation(
+    *,
+    request: Request,
+    db: Session = Depends(get_db),
+    series_in: schemas.RecurringReservationCreate,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Create a recurring reservation.
+    
+    - **start_time** / **end_time**: The first occurrence, in UTC.
+    - **node_id**, **type**, **device_ids**: As for `POST /reservations`.
+    - **frequency**: 'daily' or 'weekly'.
+    - **interval**: Repeat every N days/weeks (default 1).
+    - **by_weekday**: Weekdays for weekly rules, 0 = Monday (default: weekday of start_time).
+    - **until**: Latest occurrence start; and/or
+    - **count**: Number of occurrences.
+    
+    The series is conflict-checked as a unit: if any occurrence overlaps an
+    existing reservation or another series, nothing is created.
+    
+    Requires authentication.
+    """
+    client_ip = get_client_ip(request)
+    
+    try:
+        series = reservation_service.create_recurring_reservation(
+            db=db, series_data=series_in, user_id=current_user.id
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    
+    audit_service.log_recurring_reservation_created(
+        db=db,
+        user_id=current_user.id,
+        series_id=series.id,
+        node_id=series.node_id,
+        rule={
+            "type": series_in.type.value,
+            "start_time": series_in.start_time.isoformat(),
+            "end_time": series_in.end_time.isoformat(),
+            "frequency": series_in.frequency.value,
+            "interval": series_in.interval,
+            "by_weekday": series_in.by_weekday,
+            "until": series_in.until.isoformat() if series_in.until else None,
+            "count": series_in.count,
+            "device_ids": series_in.device_ids,
+        },
+        ip_address=client_ip,
+    )
+    
+    return series
+
+
+@router.get("/recurring", response_model=List[schemas.RecurringReservation])
+def list_recurring_reservations(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    node_id: Optional[int] = Query(None, description="Filter by node ID"),
+    skip: int = Query(0, ge=0, description="Number of records to skip"),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of records to return"),
+):
+    """
+    Get recurring reservations.
+    
+    Admins see every series, other users only their own.
+    
+    Requires authentication.
+    """
+    return crud_recurring.get_recurring_reservations(
+        db=db,
+        user_id=None if current_user.is_admin else current_user.id,
+        node_id=node_id,
+        skip=skip,
+        limit=limit,
+    )
+
+
+def _get_owned_series(db: Session, series_id: int, current_user: User):
+    series = crud_recurring.get_recurring_reservation(db, series_id)
+    if not series:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Recurring reservation not found",
+        )
+    if series.user_id != current_user.id and not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You can only access your own reservations",
+        )
+    return series
+
+
+@router.get("/recurring/{series_id}", response_model=schemas.RecurringReservation)
+def get_recurring_reservation(
+    series_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Get a recurring reservation by ID.
+    
+    Requires authentication.
+    """
+    return _get_owned_series(db, series_id, current_user)
+
+
+@router.get(
+    "/recurring/{series_id}/occurrences",
+    response_model=List[schemas.ReservationOccurrence],
+)
+def list_occurrences(
+    series_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    start: Optional[datetime] = Query(None, description="Only occurrences ending after this time"),
+    end: Optional[datetime] = Query(None, description="Only occurrences starting before this time"),
+):
+    """
+    Expand the occurrences of a recurring reservation.
+    
+    Only the occurrences inside [start, end) are generated. Cancelled
+    occurrences are included with `cancelled` set.
+    
+    Requires authentication.
+    """
+    series = _get_owned_series(db, series_id, current_user)
+    return reservation_service.get_occurrences(db, series, start, end)
+
+
+@router.delete(
+    "/recurring/{series_id}/occurrences/{occurrence_start}",
+    status_code=status.HTTP_204_NO_CONTENT,
+)
+def cancel_occurrence(
+    series_id: int,
+    occurrence_start: datetime,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Cancel a single occurrence of a recurring reservation.
+    
+    - **occurrence_start**: Start time of the occurrence, in UTC.
+    
+    Requires authentication.
+    """
+    series = _get_owned_series(db, series_id, current_user)
+    try:
+        cancelled = reservation_service.cancel_occurrence(db, series, occurrence_start)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    
+    if cancelled:
+        audit_service.log_recurring_reservation_deleted(
+            db=db,
+            user_id=current_user.id,
+            series_id=series_id,
+            occurrence_start=occurrence_start.isoformat(),
+            ip_address=get_client_ip(request),
+        )
+        waitlist_service.on_capacity_released(
+            db,
+            series.node_id,
+            occurrence_start,
+            occurrence_start + (series.end_time - series.start_time),
+        )
+    
+    return None
+
+
+@router.delete("/recurring/{series_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_recurring_reservation(
+    series_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Delete a recurring reservation and all its occurrences.
+    
+    Requires authentication.
+    """
+    series = _get_owned_series(db, series_id, current_user)
+    released = (series.node_id, series.start_time, series.series_end)
+    crud_recurring.delete_recurring_reservation(db, series_id)
+    
+    audit_service.log_recurring_reservation_deleted(
+        db=db,
+        user_id=current_user.id,
+        series_id=series_id,
+        ip_address=get_client_ip(request),
+    )
+    waitlist_service.on_capacity_released(db, *released)
+    
+    return None
+
+
+def _waitlist_view(db: Session, entry) -> schemas.WaitlistEntry:
+    view = schemas.WaitlistEntry.model_validate(entry)
+    view.position = waitlist_service.get_queue_position(db, entry)
+    return view
+
+
+def _get_owned_entry(db: Session, entry_id: int, current_user: User):
+    entry = crud_waitlist.get_entry(db, entry_id)
+    if not entry:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Waitlist entry not found",
+        )
+    if entry.user_id != current_user.id and not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You can only access your own waitlist entries",
+        )
+    return entry
+
+
+@router.post(
+    "/waitlist", response_model=schemas.WaitlistEntry, status_code=status.HTTP_201_CREATED
+)
+def join_waitlist(
+    *,
+    db: Session = Depends(get_db),
+    entry_in: schemas.WaitlistCreate,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Reserve a window, or queue for it if it is taken.
+    
+    Same body as `POST /reservations`, plus:
+    - **priority**: Higher is served first (admins only; default 0).
+    
+    If the window is free the reservation is made immediately and the entry
+    is returned as `allocated`. Otherwise the entry is `waiting` and is
+    allocated automatically as soon as conflicting reservations are released;
+    `position` shows its place in the queue.
+    
+    Requires authentication.
+    """
+    if entry_in.priority != 0 and not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can set a waitlist priority",
+        )
+    
+    try:
+        entry = waitlist_service.join_waitlist(
+            db,
+            schemas.ReservationCreate(**entry_in.model_dump(exclude={"priority"})),
+            current_user.id,
+            priority=entry_in.priority,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    return _waitlist_view(db, entry)
+
+
+@router.get("/waitlist", response_model=List[schemas.WaitlistEntry])
+def list_waitlist_entries(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    status_filter: Optional[WaitlistStatus] = Query(
+        None, alias="status", description="Only entries in this state"
+    ),
+):
+    """
+    Get the current user's waitlist entries with their status, queue
+    position and, once allocated, the reservation ID.
+    
+    Requires authentication.
+    """
+    crud_waitlist.expire_entries(db, datetime.now(timezone.utc), user_id=current_user.id)
+    entries = crud_waitlist.get_user_entries(db, current_user.id, status_filter)
+    return [_waitlist_view(db, entry) for entry in entries]
+
+
+@router.get("/waitlist/{entry_id}", response_model=schemas.WaitlistEntry)
+def get_waitlist_entry(
+    entry_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Get a waitlist entry with its queue position or allocation result.
+    
+    Requires authentication.
+    """
+    return _waitlist_view(db, _get_owned_entry(db, entry_id, current_user))
+
+
+@router.delete("/waitlist/{entry_id}", status_code=status.HTTP_204_NO_CONTENT)
+def cancel_waitlist_entry(
+    entry_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Leave the waitlist. Entries that were already allocated are not affected;
+    release the reservation instead.
+    
+    Requires authentication.
+    """
+    entry = _get_owned_entry(db, entry_id, current_user)
+    if entry.status == WaitlistStatus.WAITING:
+        crud_waitlist.resolve_entry(db, entry, WaitlistStatus.CANCELLED)
+    return None
+
+
 @router.get("/{reservation_id}", response_model=schemas.Reservation)
 def get_reservation(
     reservation_id: int,
@@ -162,6 +641,82 @@ def get_reservation(
     return reservation
 
 
+@router.patch("/{reservation_id}", response_model=schemas.Reservation)
+def update_reservation(
+    reservation_id: int,
+    request: Request,
+    reservation_in: schemas.ReservationUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Extend, shrink or move a reservation, or add/drop devices, in place.
+    
+    - **start_time**: New start time in UTC (optional).
+    - **end_time**: New end time in UTC (optional).
+    - **device_ids**: New device set (optional, device reservations only).
+    
+    Only the time and devices the change adds are checked for conflicts, so
+    the reservation never gives up what it already holds. Capacity released
+    by the change is offered to the waitlist.
+    
+    Users can only modify their own reservations unless they are admin.
+    
+    Requires authentication.
+    """
+    reservation = crud_reservation.get_reservation(db, reservation_id)
+    
+    if not reservation:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Reservation not found",
+        )
+    
+    if reservation.user_id != current_user.id and not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You can only modify your own reservations",
+        )
+    
+    old_start, old_end = reservation.start_time, reservation.end_time
+    old_devices = sorted(device.id for device in reservation.reserved_devices)
+    
+    try:
+        reservation = reservation_service.update_reservation(db, reservation, reservation_in)
+    except crud_reservation.ReservationConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=_conflict_detail(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    new_devices = sorted(device.id for device in reservation.reserved_devices)
+    audit_service.log_reservation_updated(
+        db=db,
+        user_id=current_user.id,
+        reservation_id=reservation_id,
+        before={
+            "start_time": old_start.isoformat(),
+            "end_time": old_end.isoformat(),
+            "device_ids": old_devices,
+        },
+        after={
+            "start_time": reservation.start_time.isoformat(),
+            "end_time": reservation.end_time.isoformat(),
+            "device_ids": new_devices,
+        },
+        ip_address=get_client_ip(request),
+    )
+    
+    # Hand time or devices given up by the change to the waitlist
+    if (
+        reservation.start_time > old_start
+        or reservation.end_time < old_end
+        or set(old_devices) - set(new_devices)
+    ):
+        waitlist_service.on_capacity_released(db, reservation.node_id, old_start, old_end)
+    
+    return reservation
+
+
 @router.delete("/{reservation_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_reservation(
     reservation_id: int,
@@ -173,6 +728,8 @@ def delete_reservation(
     Release/delete a reservation.
     
     Users can only delete their own reservations unless they are admin.
+    An `Idempotency-Key` header makes retries return the first response
+    instead of 404.
     
     Requires authentication.
     """
@@ -194,6 +751,8 @@ def delete_reservation(
             detail="You can only delete your own reservations",
         )
     
+    released = (reservation.node_id, reservation.start_time, reservation.end_time)
+    
     # Delete the reservation
     deleted = crud_reservation.delete_reservation(db, reservation_id)
     
@@ -211,4 +770,7 @@ def delete_reservation(
         ip_address=client_ip,
     )
     
+    # Hand the freed capacity to the waitlist
+    waitlist_service.on_capacity_released(db, *released)
+    
     return None
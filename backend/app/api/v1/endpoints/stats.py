@@ -1,39 +1,53 @@
 from datetime import datetime
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Response
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_db
+from app.api.deps import get_current_active_admin, get_db, get_page_cursor
+from app.core.pagination import NEXT_CURSOR_HEADER, Cursor, split_page
 from app.crud import crud_stats
 from app.schemas import stats as stats_schemas
 
-router = APIRouter()
+# Reports cover every user's reservations, so they are admin-only
+router = APIRouter(dependencies=[Depends(get_current_active_admin)])
 
 @router.get(
     "/history/reservations", response_model=List[stats_schemas.ReservationHistory]
 )
 def get_reservation_history(
+    response: Response,
     db: Session = Depends(get_db),
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=1000),
     user_id: Optional[int] = None,
     node_id: Optional[int] = None,
     start_time: Optional[datetime] = None,
     end_time: Optional[datetime] = None,
+    cursor: Optional[Cursor] = Depends(get_page_cursor),
 ):
     """
     Retrieve reservation history with filters.
+    
+    Includes reservations that have been moved to the archive. Pass the
+    `X-Next-Cursor` header of a response as `cursor` to get the next page;
+    cursor pages cost the same at any depth, unlike `skip`.
+    
+    Requires admin privileges.
     """
     history = crud_stats.get_reservation_history(
         db=db,
         skip=skip,
-        limit=limit,
+        limit=limit + 1,
         user_id=user_id,
         node_id=node_id,
         start_time=start_time,
         end_time=end_time,
+        after=cursor,
     )
+    history, next_cursor = split_page(history, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return history
 
 
@@ -65,6 +79,5 @@ def get_user_stats(db: Session = Depends(get_db)):
             total_usage_hours=r.total_usage_hours or 0.0,
         )
         for r in reports
-        ) for r in reports
     ]
     return {"reports": user_reports}
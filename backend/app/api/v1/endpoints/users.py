@@ -10,7 +10,17 @@ from app.api.deps import get_client_ip, get_current_user
 from app.core.database import get_db
 from app.crud import crud_user
 from app.models.user import User
-from app.schemas.user import SSHKey, SSHKeyCreate, User as UserSchema, UserWithKeys
+from app.schemas.user import (
+    ApiKey,
+    ApiKeyCreate,
+    ApiKeyCreated,
+    SSHKey,
+    SSHKeyCreate,
+    SSHKeyImport,
+    SSHKeyImportResult,
+    User as UserSchema,
+    UserWithKeys,
+)
 from app.services import audit_service, auth_service
 
 router = APIRouter()
@@ -60,6 +70,41 @@ def create_ssh_key(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
+@router.post(
+    "/me/ssh-keys/import",
+    response_model=SSHKeyImportResult,
+    status_code=status.HTTP_201_CREATED,
+)
+def import_ssh_keys(
+    *,
+    request: Request,
+    db: Session = Depends(get_db),
+    import_in: SSHKeyImport,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Add every new key of an authorized_keys file for the current user.
+    
+    - **authorized_keys**: File contents; comments, blank lines and key options are ignored
+    
+    Keys that are invalid, repeated or already registered are reported under
+    `skipped` with their line number; all other keys are added in one
+    transaction.
+    
+    Requires authentication.
+    """
+    client_ip = get_client_ip(request)
+    
+    try:
+        imported, skipped = auth_service.import_ssh_keys(
+            db, current_user.id, import_in.authorized_keys, ip_address=client_ip
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    return {"imported": imported, "skipped": skipped}
+
+
 @router.get("/me/ssh-keys", response_model=List[SSHKey])
 def list_ssh_keys(
     db: Session = Depends(get_db),
@@ -107,3 +152,91 @@ def delete_ssh_key(
     )
     
     return None
+
+
+@router.post("/me/api-keys", response_model=ApiKeyCreated, status_code=status.HTTP_201_CREATED)
+def create_api_key(
+    *,
+    request: Request,
+    db: Session = Depends(get_db),
+    key_in: ApiKeyCreate,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Create an API key for automation clients.
+    
+    - **name**: Label to recognise the key by
+    - **scopes**: Optional restrictions: "read" (safe methods on any endpoint),
+      "reservations" (any method on reservation endpoints) and/or
+      "node_access" (GET a node's authorized_keys and ssh-access feed, for
+      node agents); omit for full access
+    
+    The key is returned only in this response; send it as a Bearer token.
+    
+    Requires authentication.
+    """
+    client_ip = get_client_ip(request)
+    
+    try:
+        api_key, key = auth_service.create_api_key(db, current_user.id, key_in)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    audit_service.log_api_key_created(
+        db=db,
+        user_id=current_user.id,
+        key_id=api_key.id,
+        prefix=api_key.prefix,
+        scopes=api_key.scopes,
+        ip_address=client_ip,
+    )
+    
+    return ApiKeyCreated(**ApiKey.model_validate(api_key).model_dump(), key=key)
+
+
+@router.get("/me/api-keys", response_model=List[ApiKey])
+def list_api_keys(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Get all API keys of the current user (without the secret part).
+    
+    Requires authentication.
+    """
+    return crud_user.get_user_api_keys(db, current_user.id)
+
+
+@router.delete("/me/api-keys/{key_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_api_key(
+    *,
+    request: Request,
+    db: Session = Depends(get_db),
+    key_id: int,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Revoke an API key of the current user. Takes effect immediately.
+    
+    - **key_id**: ID of the API key to revoke
+    
+    Requires authentication.
+    """
+    client_ip = get_client_ip(request)
+    
+    deleted = crud_user.delete_api_key(db, key_id, current_user.id)
+    
+    if not deleted:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="API key not found",
+        )
+    
+    audit_service.log_api_key_deleted(
+        db=db,
+        user_id=current_user.id,
+        key_id=key_id,
+        ip_address=client_ip,
+    )
+    
+    return None
@@ -0,0 +1,159 @@
+"""
+Append-only, compressed archive segments of old audit log entries.
+
+Each calendar month of entries is one segment file (audit-YYYY-MM.ndjson.gz)
+of NDJSON lines in (created_at, id) order. Every archival batch is appended
+as its own gzip member, so bytes already written are never rewritten and any
+gzip reader still sees a single stream. A small index (index.json) records
+each member's byte range, entry count, (created_at, id) bounds and the users
+and actions it contains, so reads only decompress members that can match.
+
+The index is the source of truth. It is replaced atomically after a member's
+bytes are on disk; bytes past a segment's indexed length, left by a crash in
+between, are cut off before the next append. The index's watermark - the
+position of the newest archived entry - tells the archiver which live rows
+were already archived by an interrupted run. One archiver may run at a time;
+readers in other processes only ever see indexed, complete members.
+"""
+import gzip
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime
+from itertools import groupby
+from pathlib import Path
+from typing import Iterator, Optional
+
+from app.core.config import settings
+from app.core.pagination import Cursor
+
+INDEX_FILE = "index.json"
+
+
+def _position(entry: dict) -> list:
+    return [entry["created_at"], entry["id"]]
+
+
+class AuditSegmentStore:
+    """Monthly gzip NDJSON segments of archived audit entries, plus their index."""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+
+    def _load_index(self) -> dict:
+        try:
+            with open(self.directory / INDEX_FILE) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"watermark": None, "segments": {}}
+
+    def _write_index(self, index: dict) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".index.")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(index, f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.directory / INDEX_FILE)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def watermark(self) -> Optional[Cursor]:
+        """(created_at, id) of the newest archived entry, or None if there is none."""
+        watermark = self._load_index()["watermark"]
+        if watermark is None:
+            return None
+        return datetime.fromisoformat(watermark[0]), watermark[1]
+
+    def stats(self) -> dict:
+        index = self._load_index()
+        segments = index["segments"].values()
+        return {
+            "segments": len(index["segments"]),
+            "entries": sum(member["count"] for s in segments for member in s["members"]),
+            "bytes": sum(s["length"] for s in segments),
+        }
+
+    def append(self, entries: list[dict]) -> None:
+        """
+        Archive entries (AuditLogEntry dicts in JSON mode) that are newer than
+        the watermark, in (created_at, id) order.
+        """
+        if not entries:
+            return
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            index = self._load_index()
+            for month, group in groupby(entries, key=lambda entry: entry["created_at"][:7]):
+                self._append_member(index, f"audit-{month}.ndjson.gz", list(group))
+            index["watermark"] = _position(entries[-1])
+            self._write_index(index)
+
+    def _append_member(self, index: dict, name: str, entries: list[dict]) -> None:
+        segment = index["segments"].setdefault(name, {"length": 0, "members": []})
+        data = gzip.compress(
+            "".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry in entries).encode()
+        )
+        path = self.directory / name
+        with open(path, "r+b" if path.exists() else "wb") as f:
+            f.truncate(segment["length"])
+            f.seek(segment["length"])
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        segment["members"].append(
+            {
+                "offset": segment["length"],
+                "length": len(data),
+                "count": len(entries),
+                "first": _position(entries[0]),
+                "last": _position(entries[-1]),
+                "user_ids": sorted({entry["user_id"] for entry in entries}, key=str),
+                "actions": sorted({entry["action"] for entry in entries}),
+            }
+        )
+        segment["length"] += len(data)
+
+    def iter_entries(
+        self,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        user_id: Optional[int] = None,
+        action: Optional[str] = None,
+        reverse: bool = False,
+    ) -> Iterator[dict]:
+        """
+        Yield archived entries in (created_at, id) order, newest first with
+        reverse, from the members that may contain a match. Entries are not
+        filtered individually; callers apply their exact filters.
+        """
+        index = self._load_index()
+        members = [
+            (name, member)
+            for name in sorted(index["segments"])
+            for member in index["segments"][name]["members"]
+        ]
+        if reverse:
+            members.reverse()
+        for name, member in members:
+            if start_time is not None and datetime.fromisoformat(member["last"][0]) < start_time:
+                continue
+            if end_time is not None and datetime.fromisoformat(member["first"][0]) >= end_time:
+                continue
+            if user_id is not None and user_id not in member["user_ids"]:
+                continue
+            if action is not None and action not in member["actions"]:
+                continue
+            with open(self.directory / name, "rb") as f:
+                f.seek(member["offset"])
+                lines = gzip.decompress(f.read(member["length"])).decode().splitlines()
+            if reverse:
+                lines.reverse()
+            for line in lines:
+                yield json.loads(line)
+
+
+audit_archive = AuditSegmentStore(settings.AUDIT_ARCHIVE_DIR)
@@ -0,0 +1,235 @@
+"""
+Background writer for audit log entries.
+
+Requests enqueue their audit entries instead of committing them: a single
+writer thread collects them and writes one multi-row INSERT per batch, once
+AUDIT_BATCH_SIZE entries are waiting or the oldest has waited
+AUDIT_FLUSH_INTERVAL_MS. The queue is bounded; when the database can't keep
+up, further entries are dropped and counted rather than slowing requests
+down or growing memory.
+
+Durability: an entry that was queued but not yet written is lost if the
+process dies. On a clean shutdown the queue is written out first unless
+AUDIT_FLUSH_ON_SHUTDOWN is off; with AUDIT_ASYNC off, entries are committed
+on the request path as before.
+"""
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.audit_log import AuditLog
+
+logger = logging.getLogger(__name__)
+
+# Queue item telling the writer thread to exit
+_STOP = object()
+# Every queued entry has all of these, so a batch is one executemany
+_FIELDS = (
+    "user_id",
+    "action",
+    "resource_type",
+    "resource_id",
+    "details",
+    "ip_address",
+    "created_at",
+)
+
+
+class AuditWriter:
+    """Bounded queue of audit entries, written in batches by a background thread."""
+
+    def __init__(self, max_queue: int, batch_size: int, flush_interval_ms: int):
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._batch_size = batch_size
+        self._interval = flush_interval_ms / 1000
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._session_factory: Optional[Callable[[], Session]] = None
+        self._discard_on_stop = False
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, session_factory: Callable[[], Session]) -> None:
+        """Start the writer thread; entries are written with session_factory()."""
+        if self.running:
+            return
+        self._session_factory = session_factory
+        self._discard_on_stop = False
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, flush: bool = True) -> None:
+        """
+        Stop the writer thread. With flush, every queued entry is written
+        first; otherwise queued entries are discarded and counted as dropped.
+        """
+        thread = self._thread
+        if thread is None:
+            return
+        self._discard_on_stop = not flush
+        if not flush:
+            self._discard()
+        self._queue.put(_STOP)
+        thread.join()
+        self._thread = None
+        # Entries queued while the thread was exiting
+        if flush:
+            self._drain()
+        else:
+            self._discard()
+
+    def enqueue(self, entry: dict) -> bool:
+        """
+        Queue an entry with log_action's keys. Stamped with the current time,
+        so created_at is when the action happened, not when it was written.
+
+        Returns:
+            False if the queue is full and the entry was dropped
+        """
+        entry = {field: entry.get(field) for field in _FIELDS}
+        if entry["created_at"] is None:
+            entry["created_at"] = datetime.now(timezone.utc)
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until every entry queued so far has been written (or failed).
+
+        Returns:
+            False if the timeout passed first
+        """
+        if not self.running:
+            self._drain()
+            return True
+        done = threading.Event()
+        self._queue.put(done, timeout=timeout)
+        return done.wait(timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "running": self.running,
+                "queue_depth": self._queue.qsize(),
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "batches": self.batches,
+            }
+
+    def reset(self) -> None:
+        """Stop without writing and zero the counters."""
+        self.stop(flush=False)
+        with self._lock:
+            self.enqueued = self.written = self.dropped = self.failed = self.batches = 0
+
+    def _run(self) -> None:
+        while True:
+            batch, flushed, stop = self._collect()
+            if stop and self._discard_on_stop:
+                with self._lock:
+                    self.dropped += len(batch)
+            elif batch:
+                self._write(batch)
+            for done in flushed:
+                done.set()
+            if stop:
+                return
+
+    def _collect(self) -> tuple[list[dict], list[threading.Event], bool]:
+        """Wait for a batch: full, timed out, or cut short by flush()/stop()."""
+        batch: list[dict] = []
+        flushed: list[threading.Event] = []
+        item = self._queue.get()
+        deadline = time.monotonic() + self._interval
+        while True:
+            if item is _STOP:
+                return batch, flushed, True
+            if isinstance(item, threading.Event):
+                flushed.append(item)
+                return batch, flushed, False
+            batch.append(item)
+            remaining = deadline - time.monotonic()
+            if len(batch) >= self._batch_size or remaining <= 0:
+                return batch, flushed, False
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                return batch, flushed, False
+
+    def _take_all(self) -> list:
+        items = []
+        while True:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                return items
+
+    def _drain(self) -> None:
+        """Write every queued entry on the calling thread."""
+        items = self._take_all()
+        entries = [item for item in items if isinstance(item, dict)]
+        for start in range(0, len(entries), self._batch_size):
+            self._write(entries[start:start + self._batch_size])
+        for item in items:
+            if isinstance(item, threading.Event):
+                item.set()
+
+    def _discard(self) -> None:
+        items = self._take_all()
+        with self._lock:
+            self.dropped += sum(isinstance(item, dict) for item in items)
+        for item in items:
+            if isinstance(item, threading.Event):
+                item.set()
+
+    def _write(self, batch: list[dict]) -> None:
+        if self._session_factory is None:
+            with self._lock:
+                self.failed += len(batch)
+            return
+        db = self._session_factory()
+        try:
+            db.execute(insert(AuditLog), batch)
+            db.commit()
+        except SQLAlchemyError:
+            db.rollback()
+            logger.exception("Failed to write %d audit log entries", len(batch))
+            with self._lock:
+                self.failed += len(batch)
+            return
+        finally:
+            db.close()
+        with self._lock:
+            self.written += len(batch)
+            self.batches += 1
+
+
+audit_writer = AuditWriter(
+    settings.AUDIT_QUEUE_MAX_SIZE,
+    settings.AUDIT_BATCH_SIZE,
+    settings.AUDIT_FLUSH_INTERVAL_MS,
+)
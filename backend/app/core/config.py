@@ -8,7 +8,98 @@ class Settings(BaseSettings):
     # JWT settings
     SECRET_KEY: str = "a_very_secret_key_that_should_be_changed"
     ALGORITHM: str = "HS256"
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24  # 1 day
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 15  # Claims (admin flag, token version) are trusted this long
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+
+    # Access token revocation (Bloom filter over token_revocations)
+    TOKEN_REVOCATION_FILTER_BITS: int = 1 << 20  # 128 KiB
+    TOKEN_REVOCATION_FILTER_HASHES: int = 7
+    TOKEN_REVOCATION_REFRESH_SECONDS: float = 2  # Delay before revocations by other processes apply
+
+    # Password hashing
+    BCRYPT_ROUNDS: int = 12  # Existing hashes are upgraded on login when this changes
+    PASSWORD_HASH_WORKERS: int = 4  # Threads dedicated to bcrypt
+    PASSWORD_HASH_MAX_PENDING: int = 64  # Running + queued hashes before logins get 503
+
+    # API keys for automation clients
+    API_KEY_MAX_PER_USER: int = 20
+
+    # SSH key import
+    SSH_KEY_IMPORT_MAX_KEYS: int = 500  # Keys per authorized_keys upload
+
+    # Login throttling (token buckets per username and per client IP). The
+    # username limit is kept well above the IP limit so that guessing from
+    # one address can't lock the account's owner out.
+    LOGIN_USERNAME_BURST: int = 60
+    LOGIN_USERNAME_PER_MINUTE: float = 90
+    LOGIN_IP_BURST: int = 20
+    LOGIN_IP_PER_MINUTE: float = 30
+    LOGIN_LIMITER_MAX_KEYS: int = 100000  # Least recently used keys are evicted beyond this
+    LOGIN_FAILURE_AUDIT_INTERVAL_SECONDS: int = 60  # Failed attempts are audited as one summary per interval
+
+    # Authenticated principal cache
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 30  # Bounds staleness of changes made by other processes
+
+    # SSH access feed polled by node agents
+    SSH_ACCESS_POLL_TIMEOUT_SECONDS: int = 25  # Default long-poll wait
+    SSH_ACCESS_POLL_MAX_TIMEOUT_SECONDS: int = 60
+    SSH_ACCESS_MAX_CHANGES: int = 1000  # Changes per response; agents poll again for the rest
+
+    # Reservation conflict index
+    RESERVATION_INDEX_PRELOAD: bool = True  # Build the in-memory index at startup
+
+    # Availability grid
+    AVAILABILITY_MAX_SLOTS: int = 8640  # 90 days of 15-minute slots
+
+    # Free-slot search
+    SLOT_SEARCH_MAX_HORIZON_DAYS: int = 180
+
+    # Conflict reports
+    CONFLICT_SUGGESTION_HORIZON_DAYS: int = 30  # How far ahead 409s look for a free window
+
+    # Server-side placement
+    PLACEMENT_MAX_ATTEMPTS: int = 3  # Re-plans when a concurrent writer takes the chosen node
+
+    # Batch reservation creation
+    RESERVATION_BATCH_MAX_SIZE: int = 500
+
+    # Recurring reservations
+    RECURRING_MAX_OCCURRENCES: int = 1000  # Upper bound on the length of one series
+
+    # authorized_keys files served to nodes
+    AUTHORIZED_KEYS_MAX_AGE_SECONDS: int = 30  # Bounds staleness of changes made by other processes
+
+    # Audit log writer (AUDIT_ASYNC=false commits each entry on the request path)
+    AUDIT_ASYNC: bool = True
+    AUDIT_QUEUE_MAX_SIZE: int = 10000  # Entries beyond this are dropped and counted
+    AUDIT_BATCH_SIZE: int = 200  # Entries per INSERT
+    AUDIT_FLUSH_INTERVAL_MS: int = 200  # Longest an entry waits for its batch
+    AUDIT_FLUSH_ON_SHUTDOWN: bool = True  # Write queued entries before exiting
+    AUDIT_EXPORT_BATCH_SIZE: int = 1000  # Rows fetched per round trip when exporting
+
+    # Audit log retention (older entries move to compressed monthly segments)
+    AUDIT_RETENTION_DAYS: int = 90  # Entries older than this leave the live table
+    AUDIT_ARCHIVE_DIR: str = "./audit_archive"
+    AUDIT_ARCHIVE_BATCH_SIZE: int = 1000  # Entries moved per transaction
+    AUDIT_ARCHIVE_PAUSE_MS: int = 50  # Pause between batches to let other writers in
+
+    # Waitlist
+    WAITLIST_MAX_ENTRIES_PER_USER: int = 20  # Waiting entries a user may have at once
+
+    # Archival of finished reservations
+    RESERVATION_ARCHIVE_AFTER_DAYS: int = 90  # Archive reservations that ended this long ago
+    RESERVATION_ARCHIVE_BATCH_SIZE: int = 500  # Reservations moved per transaction
+    RESERVATION_ARCHIVE_PAUSE_MS: int = 50  # Pause between batches to let other writers in
+
+    # Idempotency-Key replay store for reservation writes
+    IDEMPOTENCY_MAX_ENTRIES: int = 10000
+    IDEMPOTENCY_TTL_SECONDS: int = 60 * 60 * 24  # How long a key can be replayed
+
+    # Reservation write serialization
+    NODE_LOCK_STRIPES: int = 64  # In-process lock stripes shared by all nodes
+    RESERVATION_WRITE_RETRIES: int = 3  # Retries when the database write lock is busy
+    RESERVATION_WRITE_RETRY_BACKOFF_MS: int = 50  # Doubled after every retry
 
     model_config = SettingsConfigDict(env_file=".env")
 
@@ -0,0 +1,250 @@
+"""
+Idempotency-Key support for retried writes.
+
+The first request carrying a key runs normally and its response is stored;
+a retry with the same key, caller and body gets the stored response back
+without touching the endpoint, so it can neither book twice nor be rejected
+by the booking it made itself. Lookups are a single dict access.
+
+The caller is the authenticated principal - the user of a valid access token
+or the API key - not the raw Authorization header, so a retry sent after a
+token refresh still matches. Requests without valid credentials are passed
+through untouched.
+
+The store is in-process, bounded to IDEMPOTENCY_MAX_ENTRIES and evicts keys
+after IDEMPOTENCY_TTL_SECONDS, oldest first. Server errors (5xx) and
+authentication failures (401/403) are not stored, so those requests can be
+retried for real.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.security import API_KEY_MARKER, api_key_digest, decode_access_token
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+IDEMPOTENT_REPLAY_HEADER = "Idempotent-Replayed"
+
+# Outcomes of IdempotencyStore.begin
+NEW, REPLAY, IN_PROGRESS, MISMATCH = "new", "replay", "in_progress", "mismatch"
+
+# Responses that depend on the credentials rather than the request
+UNSTORED_STATUSES = (401, 403)
+
+
+def request_principal(headers: Headers) -> Optional[tuple]:
+    """
+    Identify the caller of a request from its bearer credentials.
+
+    Returns:
+        ("user", id, token version) for a valid access token, ("api_key",
+        digest) for an API key, or None without usable credentials. API keys
+        are only checked by the endpoint, so they are identified by their
+        keyed digest rather than their public prefix.
+    """
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    if token.startswith(API_KEY_MARKER):
+        return ("api_key", api_key_digest(token))
+    payload = decode_access_token(token)
+    if payload is None:
+        return None
+    if payload.get("uid") is not None:
+        # The version changes when the user's tokens are revoked
+        return ("user", payload["uid"], payload.get("ver", 0))
+    if payload.get("sub") is None:
+        return None
+    return ("user", payload["sub"])
+
+
+class IdempotencyStore:
+    """Bounded, TTL-evicted map from idempotency keys to stored responses."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._lock = threading.Lock()
+        # key -> [expires_at, fingerprint, response]; response is None while
+        # the first request is still running. Ordered by expiry.
+        self._entries: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def begin(self, key: tuple, fingerprint: str) -> tuple[str, Optional[tuple]]:
+        """
+        Claim a key for a request.
+
+        Returns:
+            (NEW, None) if the caller should run the request and then call
+            finish or abandon; (REPLAY, response) with the stored
+            (status, headers, body); (IN_PROGRESS, None) if the first request
+            hasn't finished; (MISMATCH, None) if the key was used with a
+            different body.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                self._entries[key] = [now + self._ttl, fingerprint, None]
+                if len(self._entries) > self._max_entries:
+                    self._entries.popitem(last=False)
+                return NEW, None
+            if entry[1] != fingerprint:
+                return MISMATCH, None
+            if entry[2] is None:
+                return IN_PROGRESS, None
+            return REPLAY, entry[2]
+
+    def finish(self, key: tuple, fingerprint: str, response: tuple) -> None:
+        """Store the response of a request claimed with begin."""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = [time.monotonic() + self._ttl, fingerprint, response]
+            if len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def abandon(self, key: tuple) -> None:
+        """Release a claimed key without storing anything."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is None:
+                del self._entries[key]
+
+    def _evict(self, now: float) -> None:
+        while self._entries:
+            oldest = next(iter(self._entries.values()))
+            if oldest[0] > now:
+                break
+            self._entries.popitem(last=False)
+
+
+class IdempotencyMiddleware:
+    """
+    Replays stored responses for writes carrying an Idempotency-Key header.
+
+    Applies to the given methods under a path prefix. Keys are scoped to the
+    authenticated caller (request_principal), the method and the path, so one
+    user's key never matches another user's request.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        store: "IdempotencyStore",
+        path_prefix: str,
+        methods: tuple[str, ...] = ("POST", "DELETE"),
+    ):
+        self.app = app
+        self.store = store
+        self.path_prefix = path_prefix
+        self.methods = methods
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in self.methods
+            or not scope["path"].startswith(self.path_prefix)
+        ):
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        idempotency_key = headers.get(IDEMPOTENCY_KEY_HEADER)
+        principal = request_principal(headers)
+        if idempotency_key is None or principal is None:
+            await self.app(scope, receive, send)
+            return
+        if not 0 < len(idempotency_key) <= 255:
+            await JSONResponse(
+                {"detail": f"{IDEMPOTENCY_KEY_HEADER} must be 1-255 characters"},
+                status_code=400,
+            )(scope, receive, send)
+            return
+
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+        key = (
+            principal,
+            scope["method"],
+            scope["path"],
+            idempotency_key,
+        )
+        fingerprint = hashlib.sha256(body).hexdigest()
+        outcome, stored = self.store.begin(key, fingerprint)
+        if outcome == REPLAY:
+            status_code, response_headers, response_body = stored
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": status_code,
+                    "headers": response_headers
+                    + [(IDEMPOTENT_REPLAY_HEADER.lower().encode(), b"true")],
+                }
+            )
+            await send({"type": "http.response.body", "body": response_body})
+            return
+        if outcome != NEW:
+            detail = (
+                "A request with this Idempotency-Key is still being processed"
+                if outcome == IN_PROGRESS
+                else "This Idempotency-Key was already used with a different request body"
+            )
+            await JSONResponse(
+                {"detail": detail}, status_code=409 if outcome == IN_PROGRESS else 422
+            )(scope, receive, send)
+            return
+
+        replayed = False
+
+        async def replay_body() -> Message:
+            nonlocal replayed
+            if replayed:
+                return await receive()
+            replayed = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        response: dict = {"status": 500, "headers": [], "body": b""}
+
+        async def capture(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                response["body"] += message.get("body", b"")
+            await send(message)
+
+        try:
+            await self.app(scope, replay_body, capture)
+        except BaseException:
+            self.store.abandon(key)
+            raise
+        if response["status"] >= 500 or response["status"] in UNSTORED_STATUSES:
+            self.store.abandon(key)
+        else:
+            self.store.finish(
+                key, fingerprint, (response["status"], response["headers"], response["body"])
+            )
+
+
+# Responses of reservation writes, shared by all requests of this process
+idempotency_store = IdempotencyStore(
+    settings.IDEMPOTENCY_MAX_ENTRIES, settings.IDEMPOTENCY_TTL_SECONDS
+)
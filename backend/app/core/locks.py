@@ -0,0 +1,44 @@
+"""
+In-process lock striping.
+
+A fixed pool of locks is shared by an unbounded key space: a key always maps
+to the same stripe, so writers on the same key serialize while writers on
+keys in different stripes run in parallel. Multi-key holders acquire their
+stripes in ascending stripe order, which rules out lock-order deadlocks.
+"""
+import threading
+from contextlib import contextmanager
+from typing import Hashable, Iterator
+
+from app.core.config import settings
+
+
+class LockStripes:
+    """A fixed-size pool of locks addressed by key."""
+
+    def __init__(self, stripes: int):
+        if stripes < 1:
+            raise ValueError("At least one lock stripe is required")
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def stripe(self, key: Hashable) -> int:
+        """Index of the stripe guarding a key."""
+        return hash(key) % len(self._locks)
+
+    @contextmanager
+    def hold(self, *keys: Hashable) -> Iterator[None]:
+        """Hold the stripes of all given keys, acquired in stripe order."""
+        locks = [self._locks[i] for i in sorted({self.stripe(key) for key in keys})]
+        acquired = []
+        try:
+            for lock in locks:
+                lock.acquire()
+                acquired.append(lock)
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+
+
+# Serializes reservation writes per node within this process
+node_write_locks = LockStripes(settings.NODE_LOCK_STRIPES)
@@ -0,0 +1,48 @@
+"""
+Wake-ups for long-polling requests.
+
+Waiters are asyncio events subscribed under a key; notify() may be called
+from any thread (typically a threadpool request that just committed) and
+sets the events on their own loops. A waiter subscribes before it checks for
+news, so a change that lands between the check and the wait still wakes it.
+"""
+import asyncio
+import threading
+from typing import Hashable, Optional
+
+
+class ChangeNotifier:
+    """Keyed, thread-safe wake-ups for asyncio waiters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters: dict[asyncio.Event, tuple[Hashable, asyncio.AbstractEventLoop]] = {}
+
+    def subscribe(self, key: Hashable) -> asyncio.Event:
+        """Register an event set by the next notify(key). Must run on a loop."""
+        event = asyncio.Event()
+        with self._lock:
+            self._waiters[event] = (key, asyncio.get_running_loop())
+        return event
+
+    def unsubscribe(self, event: asyncio.Event) -> None:
+        with self._lock:
+            self._waiters.pop(event, None)
+
+    def notify(self, key: Optional[Hashable] = None) -> None:
+        """Wake the waiters of a key, or every waiter if key is None."""
+        with self._lock:
+            targets = [
+                (event, loop)
+                for event, (waiter_key, loop) in self._waiters.items()
+                if key is None or waiter_key == key
+            ]
+        for event, loop in targets:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The waiter's loop is closed; it will never wait again
+                self.unsubscribe(event)
+
+    def __len__(self) -> int:
+        return len(self._waiters)
@@ -0,0 +1,70 @@
+"""
+Keyset (cursor) pagination helpers.
+
+Listings ordered by (start_time DESC, id DESC), or by another timestamp and
+id the same way, are paged by remembering the last row of a page and asking
+for rows strictly after it, so every page is an index seek plus `limit` rows
+regardless of how deep it is. The position is handed to clients as an opaque
+URL-safe token.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Sequence
+
+from sqlalchemy import and_, or_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+Cursor = tuple[datetime, int]
+
+
+def encode_cursor(start_time: datetime, row_id: int) -> str:
+    """Encode a (start_time, id) position as an opaque token."""
+    raw = json.dumps([start_time.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Cursor:
+    """
+    Decode a token produced by encode_cursor.
+
+    Raises:
+        ValueError: If the token is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        start_time, row_id = json.loads(raw)
+        return datetime.fromisoformat(start_time), int(row_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def after_cursor(start_column, id_column, cursor: Cursor):
+    """
+    Filter selecting rows after a position in (start_time DESC, id DESC) order.
+
+    Spelled out with AND/OR instead of a row-value comparison so it runs on
+    every backend and still uses a (..., start_time) index.
+    """
+    start_time, row_id = cursor
+    # The redundant upper bound gives planners a plain index range to seek on
+    return and_(
+        start_column <= start_time,
+        or_(start_column < start_time, id_column < row_id),
+    )
+
+
+def split_page(
+    rows: Sequence, limit: int, time_field: str = "start_time"
+) -> tuple[list, Optional[str]]:
+    """
+    Split `limit + 1` fetched rows into the page and the cursor of the next one.
+
+    Rows must expose id and the timestamp they are ordered by (time_field).
+    The cursor is None on the last page.
+    """
+    page = list(rows[:limit])
+    if len(rows) <= limit or not page:
+        return page, None
+    return page, encode_cursor(getattr(page[-1], time_field), page[-1].id)
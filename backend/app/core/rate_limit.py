@@ -0,0 +1,152 @@
+"""
+In-memory rate limiting for the login endpoint.
+
+Each key (a username or a client IP) owns a token bucket stored as a single
+(tokens, updated_at) tuple. Buckets refill continuously, so a burst is
+allowed up to the bucket capacity and the sustained rate is capped at the
+refill rate, which behaves like a sliding window without keeping a log of
+timestamps. The number of tracked keys is bounded; the least recently used
+key is evicted first, which at worst hands an idle client a full bucket.
+
+A login takes its tokens from the IP and username buckets together
+(acquire_all): if either is empty, neither is charged. The username bucket is
+much looser than the IP bucket, so a single address spraying passwords at an
+account runs out of IP tokens long before it could lock the owner out.
+
+Failed and throttled attempts are not audited one row each. They are
+counted here per (username, IP) and drained into one summary entry per
+username every LOGIN_FAILURE_AUDIT_INTERVAL_SECONDS.
+"""
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from typing import Hashable, Optional
+
+from app.core.config import settings
+
+
+class TokenBucketLimiter:
+    """Token buckets for an unbounded key space in bounded memory."""
+
+    def __init__(self, capacity: float, per_minute: float, max_keys: int):
+        self._capacity = capacity
+        self._rate = per_minute / 60.0
+        self._max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets: OrderedDict[Hashable, tuple[float, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def acquire(self, key: Hashable, now: Optional[float] = None) -> float:
+        """
+        Take a token for a key.
+
+        Returns:
+            0.0 if the request may proceed, otherwise the number of seconds
+            until a token will be available (nothing is taken in that case)
+        """
+        return acquire_all((self, key), now=now)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+    def _wait(self, key: Hashable, now: float) -> float:
+        # Seconds until the key has a token; the caller holds the lock
+        tokens, updated_at = self._buckets.get(key, (self._capacity, now))
+        tokens = min(self._capacity, tokens + (now - updated_at) * self._rate)
+        return 0.0 if tokens >= 1 else (1 - tokens) / self._rate
+
+    def _take(self, key: Hashable, now: float) -> None:
+        # The caller holds the lock and has checked _wait
+        tokens, updated_at = self._buckets.pop(key, (self._capacity, now))
+        tokens = min(self._capacity, tokens + (now - updated_at) * self._rate)
+        self._buckets[key] = (tokens - 1, now)
+        if len(self._buckets) > self._max_keys:
+            self._buckets.popitem(last=False)
+
+
+def acquire_all(*buckets: tuple[TokenBucketLimiter, Hashable], now: Optional[float] = None) -> float:
+    """
+    Take a token from every (limiter, key) bucket, or from none of them.
+
+    A refused attempt costs nothing, so being throttled by one bucket never
+    drains another.
+
+    Returns:
+        0.0 if the request may proceed, otherwise the number of seconds until
+        every bucket will have a token
+    """
+    now = time.monotonic() if now is None else now
+    limiters = sorted({id(limiter): limiter for limiter, _ in buckets}.items())
+    with ExitStack() as stack:
+        for _, limiter in limiters:
+            stack.enter_context(limiter._lock)
+        retry_after = max(limiter._wait(key, now) for limiter, key in buckets)
+        if retry_after:
+            return retry_after
+        for limiter, key in buckets:
+            limiter._take(key, now)
+        return 0.0
+
+
+class WindowCounter:
+    """Event counts per key, drained once per interval."""
+
+    # Key that absorbs new keys once max_keys distinct keys are counted
+    OVERFLOW = ("*", "*")
+
+    def __init__(self, interval_seconds: float, max_keys: int):
+        self._interval = interval_seconds
+        self._max_keys = max_keys
+        self._lock = threading.Lock()
+        self._counts: Counter = Counter()
+        self._window_start = datetime.now(timezone.utc)
+
+    def add(self, key: tuple, kind: str) -> None:
+        with self._lock:
+            if (*key, kind) not in self._counts and len(self._counts) >= self._max_keys:
+                key = self.OVERFLOW
+            self._counts[(*key, kind)] += 1
+
+    def drain(self, force: bool = False) -> Optional[tuple[datetime, datetime, Counter]]:
+        """
+        Take the counts of the current window if it is over (or if forced).
+
+        Returns:
+            (window_start, window_end, counts keyed by (*key, kind)), or None
+            if the window is still open or nothing was counted
+        """
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            if not force and (now - self._window_start).total_seconds() < self._interval:
+                return None
+            counts, window_start = self._counts, self._window_start
+            self._counts, self._window_start = Counter(), now
+        if not counts:
+            return None
+        return window_start, now, counts
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counts.clear()
+            self._window_start = datetime.now(timezone.utc)
+
+
+login_username_limiter = TokenBucketLimiter(
+    settings.LOGIN_USERNAME_BURST,
+    settings.LOGIN_USERNAME_PER_MINUTE,
+    settings.LOGIN_LIMITER_MAX_KEYS,
+)
+login_ip_limiter = TokenBucketLimiter(
+    settings.LOGIN_IP_BURST,
+    settings.LOGIN_IP_PER_MINUTE,
+    settings.LOGIN_LIMITER_MAX_KEYS,
+)
+# (username, ip, "failed" | "throttled") -> attempts in the current window
+failed_logins = WindowCounter(
+    settings.LOGIN_FAILURE_AUDIT_INTERVAL_SECONDS, settings.LOGIN_LIMITER_MAX_KEYS
+)
@@ -1,13 +1,89 @@
+import asyncio
+import hashlib
+import hmac
+import secrets
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Callable, Optional, TypeVar
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
 from app.core.config import settings
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+T = TypeVar("T")
+
+# Password hashing context. Hashes made with a different cost report
+# needs_update and are upgraded on the next successful login.
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS
+)
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many password hashes are already running or queued."""
+
+
+class PasswordHasher:
+    """
+    Dedicated, bounded thread pool for bcrypt work.
+
+    bcrypt releases the GIL, so hashes run in parallel on the pool's threads
+    while the event loop and the request threadpool stay free for other
+    endpoints. At most max_pending hashes may be running or queued; further
+    callers are refused right away instead of piling up.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password-hash"
+        )
+        self._workers = workers
+        self._max_pending = max_pending
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._rejected = 0
+
+    def submit(self, fn: Callable[..., T], *args) -> "Future[T]":
+        """
+        Run fn(*args) on the pool.
+
+        Raises:
+            PasswordHasherBusy: If max_pending hashes are already in flight
+        """
+        with self._lock:
+            if self._pending >= self._max_pending:
+                self._rejected += 1
+                raise PasswordHasherBusy()
+            self._pending += 1
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._done)
+        return future
+
+    async def run(self, fn: Callable[..., T], *args) -> T:
+        """Await fn(*args) on the pool without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def stats(self) -> dict:
+        """Pool size and load, for sizing PASSWORD_HASH_WORKERS."""
+        with self._lock:
+            return {
+                "workers": self._workers,
+                "in_flight": self._pending,
+                "queue_depth": max(0, self._pending - self._workers),
+                "max_pending": self._max_pending,
+                "rejected": self._rejected,
+            }
+
+    def _done(self, _future: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+
+
+password_hasher = PasswordHasher(
+    settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_PENDING
+)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -15,6 +91,24 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+async def verify_password_async(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, Optional[str]]:
+    """
+    Verify a password on the hashing pool.
+
+    Returns:
+        (valid, new_hash); new_hash is set when the password is valid but the
+        stored hash uses outdated settings such as another bcrypt cost
+
+    Raises:
+        PasswordHasherBusy: If the hashing pool is saturated
+    """
+    return await password_hasher.run(
+        pwd_context.verify_and_update, plain_password, hashed_password
+    )
+
+
 def get_password_hash(password: str) -> str:
     """Hash a password."""
     return pwd_context.hash(password)
@@ -25,9 +119,15 @@ def hash_password(password: str) -> str:
     return get_password_hash(password)
 
 
+# Values of the "typ" claim. Tokens issued before refresh tokens existed
+# carry no "typ" and are treated as access tokens.
+ACCESS_TOKEN_TYPE = "access"
+REFRESH_TOKEN_TYPE = "refresh"
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token."""
-    to_encode = data.copy()
+    to_encode = {"typ": ACCESS_TOKEN_TYPE, **data}
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
     else:
@@ -39,10 +139,65 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-def decode_access_token(token: str) -> Optional[dict]:
-    """Decode and verify a JWT access token."""
+def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+    """Create a JWT refresh token, only accepted by the refresh endpoint."""
+    expire = datetime.now(timezone.utc) + (
+        expires_delta or timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    )
+    to_encode = {**data, "typ": REFRESH_TOKEN_TYPE, "exp": expire}
+    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+
+def decode_token(token: str, token_type: str) -> Optional[dict]:
+    """Decode and verify a JWT of the given type."""
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
     except JWTError:
         return None
+    if payload.get("typ", ACCESS_TOKEN_TYPE) != token_type:
+        return None
+    return payload
+
+
+def decode_access_token(token: str) -> Optional[dict]:
+    """Decode and verify a JWT access token."""
+    return decode_token(token, ACCESS_TOKEN_TYPE)
+
+
+# API keys look like "ssk_<prefix>_<secret>". The prefix is stored in clear
+# for the lookup; the whole key is only stored as a keyed digest.
+API_KEY_MARKER = "ssk_"
+
+
+def generate_api_key() -> tuple[str, str]:
+    """
+    Create a new random API key.
+
+    Returns:
+        (key, prefix)
+    """
+    prefix = secrets.token_hex(6)
+    return f"{API_KEY_MARKER}{prefix}_{secrets.token_urlsafe(32)}", prefix
+
+
+def parse_api_key_prefix(key: str) -> Optional[str]:
+    """The lookup prefix of a well-formed API key, else None."""
+    if not key.startswith(API_KEY_MARKER):
+        return None
+    prefix, separator, secret = key[len(API_KEY_MARKER):].partition("_")
+    if not separator or len(prefix) != 12 or not secret:
+        return None
+    return prefix
+
+
+def api_key_digest(key: str) -> str:
+    """
+    Keyed digest of an API key. Keys carry 256 random bits, so a single
+    HMAC is enough; unlike passwords they need no deliberately slow hash.
+    """
+    return hmac.new(settings.SECRET_KEY.encode(), key.encode(), hashlib.sha256).hexdigest()
+
+
+def verify_api_key(key: str, key_digest: str) -> bool:
+    """Compare an API key with a stored digest in constant time."""
+    return hmac.compare_digest(api_key_digest(key), key_digest)
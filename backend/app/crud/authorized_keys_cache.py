@@ -0,0 +1,124 @@
+"""
+Cache of generated authorized_keys files, one entry per node.
+
+An entry is valid until the next reservation on its node starts or ends, and
+never longer than AUTHORIZED_KEYS_MAX_AGE_SECONDS, which bounds how long a
+change made by another process can go unnoticed. Changes committed by this
+process drop entries right away (ORM events below): reservations and
+recurring series drop their node, while SSH keys, cancelled occurrences and
+user changes drop every node.
+
+A build that overlaps an invalidation is returned but not stored, so a file
+computed from data that was changed meanwhile is never cached. Every
+invalidation also wakes the SSH access feed's long-polls for the node
+(access_changes).
+"""
+import threading
+from datetime import datetime
+from typing import Callable, NamedTuple, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.notifier import ChangeNotifier
+from app.models.reservation import (
+    RecurringReservation,
+    RecurringReservationException,
+    Reservation,
+)
+from app.models.user import SSHKey, User
+
+_PENDING_KEY = "authorized_keys_invalidate"
+# Pending marker for "every node"
+_ALL_NODES = None
+
+
+class AuthorizedKeys(NamedTuple):
+    body: str
+    etag: str
+    valid_until: datetime  # Naive UTC
+    keys: tuple[tuple[str, str, str], ...]  # (username, public_key, fingerprint)
+
+
+class AuthorizedKeysCache:
+    """Per-node authorized_keys files with generation-checked invalidation."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: dict[int, AuthorizedKeys] = {}
+        self._generation = 0
+
+    def get(
+        self, node_id: int, now: datetime, build: Callable[[], Optional[AuthorizedKeys]]
+    ) -> Optional[AuthorizedKeys]:
+        """The node's entry if still valid, otherwise the result of build()."""
+        with self._lock:
+            entry = self._entries.get(node_id)
+            if entry is not None and now < entry.valid_until:
+                return entry
+            generation = self._generation
+        entry = build()
+        if entry is not None:
+            with self._lock:
+                if generation == self._generation:
+                    self._entries[node_id] = entry
+        return entry
+
+    def invalidate(self, node_id: Optional[int] = _ALL_NODES) -> None:
+        with self._lock:
+            self._generation += 1
+            if node_id is _ALL_NODES:
+                self._entries.clear()
+            else:
+                self._entries.pop(node_id, None)
+        access_changes.notify(node_id)
+
+    def clear(self) -> None:
+        self.invalidate(_ALL_NODES)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Long-polls of the SSH access feed, keyed by node ID
+access_changes = ChangeNotifier()
+authorized_keys_cache = AuthorizedKeysCache()
+
+
+def _invalidate(target, node_id: Optional[int]) -> None:
+    # Drop now, and again after commit in case a concurrent build read the
+    # old rows in between
+    authorized_keys_cache.invalidate(node_id)
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault(_PENDING_KEY, set()).add(node_id)
+
+
+@event.listens_for(Reservation, "after_insert")
+@event.listens_for(Reservation, "after_update")
+@event.listens_for(Reservation, "after_delete")
+@event.listens_for(RecurringReservation, "after_insert")
+@event.listens_for(RecurringReservation, "after_delete")
+def _node_changed(mapper, connection, target) -> None:
+    _invalidate(target, target.node_id)
+
+
+@event.listens_for(RecurringReservationException, "after_insert")
+@event.listens_for(SSHKey, "after_insert")
+@event.listens_for(SSHKey, "after_update")
+@event.listens_for(SSHKey, "after_delete")
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _everything_changed(mapper, connection, target) -> None:
+    _invalidate(target, _ALL_NODES)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session) -> None:
+    for node_id in session.info.pop(_PENDING_KEY, ()):
+        authorized_keys_cache.invalidate(node_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
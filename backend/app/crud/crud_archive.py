@@ -0,0 +1,81 @@
+from datetime import datetime
+
+from sqlalchemy import delete, insert, literal, select
+from sqlalchemy.orm import Session
+
+from app.models import reservation as models
+
+
+def get_archivable_reservations(
+    db: Session, cutoff: datetime, limit: int
+) -> list:
+    """
+    Get (id, node_id) of reservations that ended before the cutoff, oldest ID
+    first.
+
+    Any of them may go, the newest included: reservation IDs are never
+    reused, so a new reservation can't collide with an archived one.
+    """
+    return (
+        db.query(models.Reservation.id, models.Reservation.node_id)
+        .filter(models.Reservation.end_time < cutoff)
+        .order_by(models.Reservation.id)
+        .limit(limit)
+        .all()
+    )
+
+
+def move_to_archive(
+    db: Session, reservation_ids: list[int], archived_at: datetime
+) -> None:
+    """
+    Move reservations and their device associations to the archive tables.
+
+    Four set-based statements (two INSERT ... SELECT, two DELETE) in one
+    transaction, committed before returning.
+    """
+    reservation = models.Reservation
+    link = models.ReservationDevice
+    db.execute(
+        insert(models.ArchivedReservation).from_select(
+            [
+                "id",
+                "start_time",
+                "end_time",
+                "type",
+                "created_at",
+                "updated_at",
+                "user_id",
+                "node_id",
+                "archived_at",
+            ],
+            select(
+                reservation.id,
+                reservation.start_time,
+                reservation.end_time,
+                reservation.type,
+                reservation.created_at,
+                reservation.updated_at,
+                reservation.user_id,
+                reservation.node_id,
+                literal(archived_at),
+            ).where(reservation.id.in_(reservation_ids)),
+        )
+    )
+    db.execute(
+        insert(models.ArchivedReservationDevice).from_select(
+            ["reservation_id", "device_id"],
+            select(link.reservation_id, link.device_id).where(
+                link.reservation_id.in_(reservation_ids)
+            ),
+        )
+    )
+    db.execute(
+        delete(link).where(link.reservation_id.in_(reservation_ids)),
+        execution_options={"synchronize_session": False},
+    )
+    db.execute(
+        delete(reservation).where(reservation.id.in_(reservation_ids)),
+        execution_options={"synchronize_session": False},
+    )
+    db.commit()
@@ -0,0 +1,122 @@
+from datetime import datetime
+from typing import Iterator, Optional
+
+from sqlalchemy import and_, delete, func, or_, select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from app.core.pagination import Cursor, after_cursor
+from app.models.audit_log import AuditLog
+
+
+def _filtered(
+    query: Select,
+    user_id: Optional[int] = None,
+    action: Optional[str] = None,
+    resource_type: Optional[str] = None,
+    resource_id: Optional[int] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> Select:
+    if user_id is not None:
+        query = query.where(AuditLog.user_id == user_id)
+    if action is not None:
+        query = query.where(AuditLog.action == action)
+    if resource_type is not None:
+        query = query.where(AuditLog.resource_type == resource_type)
+    if resource_id is not None:
+        query = query.where(AuditLog.resource_id == resource_id)
+    if start_time is not None:
+        query = query.where(AuditLog.created_at >= start_time)
+    if end_time is not None:
+        query = query.where(AuditLog.created_at < end_time)
+    return query
+
+
+def get_audit_logs(
+    db: Session,
+    limit: int = 100,
+    after: Optional[Cursor] = None,
+    **filters,
+) -> list[AuditLog]:
+    """
+    Get audit entries matching the filters, newest first.
+
+    Ordered by (created_at DESC, id DESC); with `after` (keyset pagination)
+    the query seeks straight to the position through the composite index
+    that starts with the filtered column.
+    """
+    query = _filtered(select(AuditLog), **filters)
+    if after is not None:
+        query = query.where(after_cursor(AuditLog.created_at, AuditLog.id, after))
+    query = query.order_by(AuditLog.created_at.desc(), AuditLog.id.desc()).limit(limit)
+    return list(db.scalars(query))
+
+
+def iter_audit_logs(db: Session, batch_size: int = 1000, **filters) -> Iterator[AuditLog]:
+    """
+    Stream every audit entry matching the filters, oldest first.
+
+    Rows are fetched batch_size at a time from a server-side cursor where the
+    database supports one (yield_per), so memory stays flat however many rows
+    match.
+    """
+    query = (
+        _filtered(select(AuditLog), **filters)
+        .order_by(AuditLog.created_at, AuditLog.id)
+        .execution_options(yield_per=batch_size)
+    )
+    yield from db.scalars(query)
+
+
+def get_archivable_audit_logs(db: Session, cutoff: datetime, limit: int) -> list[AuditLog]:
+    """
+    Get up to `limit` audit entries created before the cutoff, oldest first.
+
+    Stops before the entry with the highest ID, which must stay: SQLite
+    derives the next ID from the current maximum, so archiving it could make
+    a new entry reuse an archived ID.
+    """
+    newest_id = db.query(func.max(AuditLog.id)).scalar()
+    if newest_id is None:
+        return []
+    rows = list(
+        db.scalars(
+            select(AuditLog)
+            .where(AuditLog.created_at < cutoff)
+            .order_by(AuditLog.created_at, AuditLog.id)
+            .limit(limit)
+        )
+    )
+    # Cut rather than skip it, so entries are archived in order
+    for position, row in enumerate(rows):
+        if row.id == newest_id:
+            return rows[:position]
+    return rows
+
+
+def delete_audit_logs(db: Session, entry_ids: list[int]) -> None:
+    """Delete audit entries by ID and commit."""
+    db.execute(delete(AuditLog).where(AuditLog.id.in_(entry_ids)))
+    db.commit()
+
+
+def delete_audit_logs_through(db: Session, position: Cursor) -> int:
+    """
+    Delete the audit entries at or before a (created_at, id) position, and commit.
+
+    Returns:
+        Number of entries deleted
+    """
+    created_at, entry_id = position
+    result = db.execute(
+        delete(AuditLog).where(
+            AuditLog.created_at <= created_at,
+            or_(
+                AuditLog.created_at < created_at,
+                and_(AuditLog.created_at == created_at, AuditLog.id <= entry_id),
+            ),
+        )
+    )
+    db.commit()
+    return result.rowcount
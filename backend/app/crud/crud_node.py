@@ -21,6 +21,34 @@ def get_nodes(db: Session, skip: int = 0, limit: int = 100) -> list[Node]:
     return db.query(Node).offset(skip).limit(limit).all()
 
 
+def get_nodes_by_ids(db: Session, node_ids: list[int]) -> list[Node]:
+    """Get several nodes by ID in one query."""
+    return db.query(Node).filter(Node.id.in_(node_ids)).all()
+
+
+def lock_nodes_for_update(db: Session, node_ids: list[int]) -> None:
+    """
+    Take the database write guard for reservations on the given nodes.
+
+    On SQLite this starts a BEGIN IMMEDIATE transaction, which holds the
+    database's single write lock until commit or rollback. Elsewhere the node
+    rows are locked with SELECT ... FOR UPDATE in ascending ID order.
+    Raises OperationalError when the lock can't be obtained in time.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        connection = db.connection()
+        if not connection.connection.driver_connection.in_transaction:
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+        return
+    (
+        db.query(Node.id)
+        .filter(Node.id.in_(node_ids))
+        .order_by(Node.id)
+        .with_for_update()
+        .all()
+    )
+
+
 def create_node(db: Session, node: NodeCreate) -> Node:
     """Create a new node."""
     db_node = Node(
@@ -66,3 +94,29 @@ def create_device(db: Session, device: DeviceCreate, node_id: int) -> Device:
 def get_node_devices(db: Session, node_id: int) -> list[Device]:
     """Get all devices for a node."""
     return db.query(Device).filter(Device.node_id == node_id).all()
+
+
+def get_devices_for_nodes(db: Session, node_ids: list[int]) -> list[Device]:
+    """Get all devices of several nodes in one query."""
+    return db.query(Device).filter(Device.node_id.in_(node_ids)).all()
+
+
+def get_device_inventory(db: Session, model_name: Optional[str] = None) -> list:
+    """
+    Get every device with its node in one query, ordered by node and index.
+
+    Returns:
+        Rows with id, device_index, model_name, node_id and node_name
+    """
+    query = db.query(
+        Device.id,
+        Device.device_index,
+        Device.model_name,
+        Device.node_id,
+        Node.name.label("node_name"),
+    ).join(Node, Device.node_id == Node.id)
+
+    if model_name is not None:
+        query = query.filter(Device.model_name == model_name)
+
+    return query.order_by(Device.node_id, Device.device_index).all()
@@ -0,0 +1,244 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.crud.recurrence import Recurrence, format_weekdays
+from app.crud.reservation_index import as_naive_utc
+from app.models import node as node_models
+from app.models import reservation as models
+from app.schemas import reservation as schemas
+
+
+def create_recurring_reservation(
+    db: Session,
+    series: schemas.RecurringReservationCreate,
+    user_id: int,
+    recurrence: Recurrence,
+    devices: list[node_models.Device],
+) -> models.RecurringReservation:
+    """Store an already-validated recurring reservation."""
+    _, last_start = recurrence.last()
+    db_series = models.RecurringReservation(
+        start_time=recurrence.start,
+        end_time=recurrence.start + recurrence.duration,
+        type=series.type,
+        frequency=series.frequency,
+        interval=series.interval,
+        by_weekday=format_weekdays(series.by_weekday),
+        until=recurrence.until,
+        count=series.count,
+        series_end=last_start + recurrence.duration,
+        node_id=series.node_id,
+        user_id=user_id,
+    )
+    if series.type == models.ReservationType.DEVICE:
+        db_series.reserved_devices.extend(devices)
+
+    db.add(db_series)
+    db.commit()
+    db.refresh(db_series)
+    return db_series
+
+
+def get_recurring_reservation(
+    db: Session, series_id: int
+) -> Optional[models.RecurringReservation]:
+    """Get a single recurring reservation by ID."""
+    return (
+        db.query(models.RecurringReservation)
+        .filter(models.RecurringReservation.id == series_id)
+        .first()
+    )
+
+
+def get_recurring_reservations(
+    db: Session,
+    user_id: Optional[int] = None,
+    node_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 100,
+) -> list[models.RecurringReservation]:
+    """Get recurring reservations with optional filters, newest first."""
+    query = db.query(models.RecurringReservation)
+
+    if user_id is not None:
+        query = query.filter(models.RecurringReservation.user_id == user_id)
+
+    if node_id is not None:
+        query = query.filter(models.RecurringReservation.node_id == node_id)
+
+    return (
+        query.order_by(models.RecurringReservation.start_time.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+
+
+def delete_recurring_reservation(db: Session, series_id: int) -> bool:
+    """Delete a recurring reservation with all its exceptions."""
+    series = get_recurring_reservation(db, series_id)
+    if series is None:
+        return False
+    db.delete(series)
+    db.commit()
+    return True
+
+
+def get_cancelled_occurrences(
+    db: Session,
+    series_id: int,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> set[datetime]:
+    """Start times of the cancelled occurrences of a series, optionally in a range."""
+    query = db.query(models.RecurringReservationException.occurrence_start).filter(
+        models.RecurringReservationException.series_id == series_id
+    )
+    if start_time is not None:
+        query = query.filter(models.RecurringReservationException.occurrence_start >= start_time)
+    if end_time is not None:
+        query = query.filter(models.RecurringReservationException.occurrence_start < end_time)
+    return {as_naive_utc(row[0]) for row in query}
+
+
+def cancel_occurrence(
+    db: Session, series_id: int, occurrence_start: datetime
+) -> bool:
+    """
+    Record a cancelled occurrence.
+
+    Returns:
+        False if the occurrence was already cancelled
+    """
+    occurrence_start = as_naive_utc(occurrence_start)
+    exists = (
+        db.query(models.RecurringReservationException)
+        .filter(
+            models.RecurringReservationException.series_id == series_id,
+            models.RecurringReservationException.occurrence_start == occurrence_start,
+        )
+        .first()
+    )
+    if exists is not None:
+        return False
+    db.add(
+        models.RecurringReservationException(
+            series_id=series_id, occurrence_start=occurrence_start
+        )
+    )
+    db.commit()
+    return True
+
+
+def get_occurrence_intervals(
+    db: Session,
+    node_ids: list[int],
+    start_time: datetime,
+    end_time: datetime,
+) -> dict[int, list[tuple[datetime, datetime, Optional[int], int]]]:
+    """
+    Get (start, end, device_id, series_id) intervals of recurring reservation
+    occurrences overlapping a window, per node.
+
+    Only series whose span touches the window are read, and only their
+    occurrences inside the window are expanded. Cancelled occurrences are
+    skipped and machine-level series are reported with device_id None, as in
+    crud_reservation.get_node_intervals. Three queries regardless of the
+    number of series.
+    """
+    start, end = as_naive_utc(start_time), as_naive_utc(end_time)
+    intervals = {node_id: [] for node_id in node_ids}
+    series_list = (
+        db.query(models.RecurringReservation)
+        .filter(
+            models.RecurringReservation.node_id.in_(node_ids),
+            models.RecurringReservation.start_time < end,
+            models.RecurringReservation.series_end > start,
+        )
+        .all()
+    )
+    if not series_list:
+        return intervals
+
+    series_ids = [series.id for series in series_list]
+    devices = defaultdict(list)
+    for series_id, device_id in db.query(
+        models.RecurringReservationDevice.series_id,
+        models.RecurringReservationDevice.device_id,
+    ).filter(models.RecurringReservationDevice.series_id.in_(series_ids)):
+        devices[series_id].append(device_id)
+
+    rules = {series.id: Recurrence.of(series) for series in series_list}
+    longest = max(rule.duration for rule in rules.values())
+    cancelled = defaultdict(set)
+    for series_id, occurrence_start in db.query(
+        models.RecurringReservationException.series_id,
+        models.RecurringReservationException.occurrence_start,
+    ).filter(
+        models.RecurringReservationException.series_id.in_(series_ids),
+        models.RecurringReservationException.occurrence_start > start - longest,
+        models.RecurringReservationException.occurrence_start < end,
+    ):
+        cancelled[series_id].add(as_naive_utc(occurrence_start))
+
+    for series in series_list:
+        rule = rules[series.id]
+        for occurrence in rule.occurrences(start, end):
+            if occurrence in cancelled[series.id]:
+                continue
+            occurrence_end = occurrence + rule.duration
+            if series.type == models.ReservationType.MACHINE:
+                intervals[series.node_id].append((occurrence, occurrence_end, None, series.id))
+            else:
+                intervals[series.node_id].extend(
+                    (occurrence, occurrence_end, device_id, series.id)
+                    for device_id in devices[series.id]
+                )
+    return intervals
+
+
+def get_occurrence_user_windows(
+    db: Session, node_id: int, start_time: datetime, end_time: datetime
+) -> list[tuple[int, datetime, datetime]]:
+    """(user_id, start, end) of the occurrences on a node overlapping a window."""
+    occurrences = {
+        (series_id, start, end)
+        for start, end, _, series_id in get_occurrence_intervals(
+            db, [node_id], start_time, end_time
+        )[node_id]
+    }
+    if not occurrences:
+        return []
+    users = dict(
+        db.query(models.RecurringReservation.id, models.RecurringReservation.user_id).filter(
+            models.RecurringReservation.id.in_({series_id for series_id, _, _ in occurrences})
+        )
+    )
+    return [(users[series_id], start, end) for series_id, start, end in occurrences]
+
+
+def find_conflicting_series_id(
+    db: Session,
+    node_id: int,
+    start_time: datetime,
+    end_time: datetime,
+    device_ids: Optional[list[int]] = None,
+) -> Optional[int]:
+    """
+    Find a recurring reservation with an occurrence conflicting with a window.
+
+    Uses the same rules as crud_reservation.find_conflicting_reservation_id.
+
+    Returns:
+        ID of the series with the earliest conflicting occurrence, or None
+    """
+    wanted = set(device_ids or [])
+    intervals = get_occurrence_intervals(db, [node_id], start_time, end_time)[node_id]
+    for _start, _end, device_id, series_id in sorted(intervals):
+        if not wanted or device_id is None or device_id in wanted:
+            return series_id
+    return None
+
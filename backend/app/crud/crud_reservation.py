@@ -1,78 +1,214 @@
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 
 from sqlalchemy import and_, or_
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 
+from app.core.config import settings
+from app.core.pagination import Cursor, after_cursor
+from app.crud import crud_recurring
+from app.crud.reservation_index import as_naive_utc, reservation_index
 from app.models import node as node_models
 from app.models import reservation as models
 from app.schemas import reservation as schemas
 
 
+class ReservationConflictError(ValueError):
+    """Raised when a reservation overlaps existing reservations or occurrences."""
+
+    def __init__(
+        self,
+        message: str,
+        conflicts: list[dict],
+        next_available_start: Optional[datetime],
+    ):
+        super().__init__(message)
+        self.conflicts = conflicts
+        self.next_available_start = next_available_start
+
+
 def check_conflict(
     db: Session,
     node_id: int,
     start_time: datetime,
     end_time: datetime,
     device_ids: list[int] = None,
-):
+) -> Optional[int]:
     """
     Checks for reservation conflicts.
+
+    Answers from the in-memory interval index when its entry for the node is
+    up to date, otherwise falls back to a single SQL query.
+
+    Returns:
+        ID of the first (earliest-starting) conflicting reservation, or None
     """
-    # Check for overlapping time range
-    time_overlap_filter = or_(
-        and_(
-            models.Reservation.start_time < end_time,
-            models.Reservation.end_time > start_time,
+    if reservation_index.ensure_node(db, node_id):
+        conflict_ids = reservation_index.find_conflicts(
+            node_id, start_time, end_time, device_ids
         )
+        return conflict_ids[0] if conflict_ids else None
+
+    return find_conflicting_reservation_id(db, node_id, start_time, end_time, device_ids)
+
+
+def find_conflicting_reservation_id(
+    db: Session,
+    node_id: int,
+    start_time: datetime,
+    end_time: datetime,
+    device_ids: Optional[list[int]] = None,
+) -> Optional[int]:
+    """
+    Find a conflicting reservation with one set-based query.
+
+    Conflict rules:
+    - An existing machine-level reservation conflicts with anything.
+    - A new machine-level request (no device_ids) conflicts with anything.
+    - Two device-level reservations conflict if their device sets intersect,
+      which is tested by joining reservation_devices on the requested IDs.
+
+    Uses only portable SQL (outer join, IN, ORDER BY/LIMIT), so it runs
+    unchanged on SQLite and MySQL.
+
+    Returns:
+        ID of the earliest-starting conflicting reservation, or None
+    """
+    query = db.query(models.Reservation.id).filter(
+        models.Reservation.node_id == node_id,
+        models.Reservation.start_time < end_time,
+        models.Reservation.end_time > start_time,
     )
 
-    # Find all reservations for the given node within the time window
-    conflicting_reservations = (
-        db.query(models.Reservation)
-        .filter(models.Reservation.node_id == node_id, time_overlap_filter)
-        .all()
+    if device_ids:
+        query = query.outerjoin(
+            models.ReservationDevice,
+            and_(
+                models.ReservationDevice.reservation_id == models.Reservation.id,
+                models.ReservationDevice.device_id.in_(device_ids),
+            ),
+        ).filter(
+            or_(
+                models.Reservation.type == models.ReservationType.MACHINE,
+                models.ReservationDevice.device_id.isnot(None),
+            )
+        )
+
+    return (
+        query.order_by(models.Reservation.start_time, models.Reservation.id)
+        .limit(1)
+        .scalar()
     )
 
-    if not conflicting_reservations:
-        return None  # No conflict
 
-    for conflict in conflicting_reservations:
-        # Case 1: Existing reservation is for the whole machine
-        if conflict.type == models.ReservationType.MACHINE:
-            return conflict  # Any new reservation conflicts with a full machine reservation
+def get_conflict_report(
+    db: Session,
+    node_id: int,
+    start_time: datetime,
+    end_time: datetime,
+    device_ids: Optional[list[int]] = None,
+) -> tuple[list[dict], Optional[datetime]]:
+    """
+    Describe everything a request collides with and when it would fit instead.
 
-        # Case 2: New reservation is for the whole machine
-        if not device_ids:
-            return conflict  # A new full machine reservation conflicts with any existing reservation
+    The busy intervals of the requested devices (all devices for a
+    machine-level request, plus machine-level reservations in either case)
+    are walked once in start order from start_time on. The same pass collects
+    every conflicting reservation and recurring occurrence and finds the first
+    gap long enough for the requested duration, stopping as soon as both are
+    known. Gaps are searched up to CONFLICT_SUGGESTION_HORIZON_DAYS ahead.
 
-        # Case 3: Both are device-level reservations, check for device ID intersection
+    Returns:
+        (conflicts, next_available_start). Conflicts are ordered by start time
+        and hold reservation_id or recurring_reservation_id, start_time,
+        end_time and the clashing device_ids (empty for a machine-level
+        reservation, which blocks the whole node). next_available_start is
+        None if nothing fits within the horizon.
+    """
+    start, end = as_naive_utc(start_time), as_naive_utc(end_time)
+    duration = end - start
+    horizon_end = end + timedelta(days=settings.CONFLICT_SUGGESTION_HORIZON_DAYS)
 
-        # Get device ids for the conflicting reservation
-        conflicting_device_ids = {dev.id for dev in conflict.reserved_devices}
+    busy = [
+        (s, e, device_id, reservation_id, None)
+        for s, e, device_id, reservation_id in get_node_intervals(
+            db, [node_id], start, horizon_end
+        )[node_id]
+    ]
+    busy.extend(
+        (s, e, device_id, None, series_id)
+        for s, e, device_id, series_id in crud_recurring.get_occurrence_intervals(
+            db, [node_id], start, horizon_end
+        )[node_id]
+    )
+    busy.sort(key=lambda interval: interval[0])
 
-        if conflicting_device_ids.intersection(set(device_ids)):
-            return conflict  # Found an overlapping device reservation
+    wanted = set(device_ids or [])
+    conflicts: dict[tuple, dict] = {}
+    cursor, next_start = start, None
+    for s, e, device_id, reservation_id, series_id in busy:
+        if wanted and device_id is not None and device_id not in wanted:
+            continue
+        if next_start is None:
+            if s - cursor >= duration:
+                next_start = cursor
+            else:
+                cursor = max(cursor, e)
+        if s < end:
+            conflict = conflicts.setdefault(
+                (reservation_id, series_id, s),
+                {
+                    "reservation_id": reservation_id,
+                    "recurring_reservation_id": series_id,
+                    "start_time": s,
+                    "end_time": e,
+                    "device_ids": [],
+                },
+            )
+            if device_id is not None:
+                conflict["device_ids"].append(device_id)
+        elif next_start is not None:
+            break
+    if next_start is None and horizon_end - cursor >= duration:
+        next_start = cursor
 
-    return None
+    return list(conflicts.values()), next_start
 
 
 def create_reservation(
     db: Session, reservation: schemas.ReservationCreate, user_id: int
 ):
     # First, check for conflicts
-    conflict = check_conflict(
+    conflict_id = check_conflict(
         db,
         node_id=reservation.node_id,
         start_time=reservation.start_time,
         end_time=reservation.end_time,
         device_ids=reservation.device_ids,
     )
-    if conflict:
-        # A more specific error could be raised here
-        raise ValueError(
-            f"Reservation conflict with existing reservation ID: {conflict.id}"
+    series_id = None
+    if conflict_id is None:
+        series_id = crud_recurring.find_conflicting_series_id(
+            db,
+            node_id=reservation.node_id,
+            start_time=reservation.start_time,
+            end_time=reservation.end_time,
+            device_ids=reservation.device_ids,
         )
+    if conflict_id is not None or series_id is not None:
+        # Only rejected requests pay for the full report
+        conflicts, next_start = get_conflict_report(
+            db,
+            node_id=reservation.node_id,
+            start_time=reservation.start_time,
+            end_time=reservation.end_time,
+            device_ids=reservation.device_ids,
+        )
+        if conflict_id is not None:
+            message = f"Reservation conflict with existing reservation ID: {conflict_id}"
+        else:
+            message = f"Reservation conflict with recurring reservation ID: {series_id}"
+        raise ReservationConflictError(message, conflicts, next_start)
 
     # Create the base reservation object
     db_reservation = models.Reservation(
@@ -102,9 +238,138 @@ def create_reservation(
     db.add(db_reservation)
     db.commit()
     db.refresh(db_reservation)
+    reservation_index.add(db_reservation)
     return db_reservation
 
 
+def update_reservation(
+    db: Session,
+    reservation: models.Reservation,
+    start_time: datetime,
+    end_time: datetime,
+    device_ids: Optional[list[int]] = None,
+) -> models.Reservation:
+    """
+    Change the time range and/or devices of a reservation in place.
+
+    Only what the change adds is conflict-checked: the time gained at either
+    end (for the new device set, or the whole node for machine-level
+    reservations) and the devices gained over the time that is kept. What the
+    reservation already holds can't conflict. reservation_devices is updated
+    as a diff, and updated_at is always bumped so other processes notice that
+    their index entry for the node is stale.
+
+    Args:
+        device_ids: New device set; None keeps the current one
+
+    Raises:
+        ReservationConflictError: If an added range clashes with a reservation
+            or a recurring occurrence. next_available_start is not set.
+    """
+    old_start = as_naive_utc(reservation.start_time)
+    old_end = as_naive_utc(reservation.end_time)
+    start, end = as_naive_utc(start_time), as_naive_utc(end_time)
+    old_devices = {device.id for device in reservation.reserved_devices}
+    new_devices = old_devices if device_ids is None else set(device_ids)
+    wanted = (
+        None if reservation.type == models.ReservationType.MACHINE else sorted(new_devices)
+    )
+
+    # (start, end, devices) of everything the reservation would newly hold
+    added_ranges = []
+    if start < old_start:
+        added_ranges.append((start, min(end, old_start), wanted))
+    if end > old_end:
+        added_ranges.append((max(start, old_end), end, wanted))
+    added_devices = sorted(new_devices - old_devices)
+    if added_devices and max(start, old_start) < min(end, old_end):
+        added_ranges.append((max(start, old_start), min(end, old_end), added_devices))
+
+    for range_start, range_end, range_devices in added_ranges:
+        conflict_id = check_conflict(
+            db, reservation.node_id, range_start, range_end, range_devices
+        )
+        series_id = None
+        if conflict_id is None:
+            series_id = crud_recurring.find_conflicting_series_id(
+                db, reservation.node_id, range_start, range_end, range_devices
+            )
+        if conflict_id is not None or series_id is not None:
+            conflicts, _ = get_conflict_report(
+                db, reservation.node_id, range_start, range_end, range_devices
+            )
+            if conflict_id is not None:
+                message = f"Reservation conflict with existing reservation ID: {conflict_id}"
+            else:
+                message = f"Reservation conflict with recurring reservation ID: {series_id}"
+            raise ReservationConflictError(message, conflicts, None)
+
+    dropped_devices = old_devices - new_devices
+    if dropped_devices:
+        db.query(models.ReservationDevice).filter(
+            models.ReservationDevice.reservation_id == reservation.id,
+            models.ReservationDevice.device_id.in_(dropped_devices),
+        ).delete(synchronize_session=False)
+    db.add_all(
+        models.ReservationDevice(reservation_id=reservation.id, device_id=device_id)
+        for device_id in added_devices
+    )
+    reservation.start_time = start
+    reservation.end_time = end
+    reservation.updated_at = datetime.now(timezone.utc)
+    db.commit()
+    db.refresh(reservation)
+
+    reservation_index.remove(reservation.node_id, reservation.id)
+    reservation_index.add(reservation)
+    return reservation
+
+
+def add_reservations_bulk(
+    db: Session,
+    reservations: list[schemas.ReservationCreate],
+    user_id: int,
+    devices_by_id: dict[int, node_models.Device],
+) -> list[models.Reservation]:
+    """
+    Stage many already-validated reservations in the current transaction.
+
+    The flush needs each generated ID, so reservations are inserted row by row,
+    but their device associations go out as a single executemany. Nothing is
+    committed here, so the caller can add related rows (e.g. audit entries)
+    and commit everything at once.
+    """
+    db_reservations = []
+    for reservation in reservations:
+        db_reservation = models.Reservation(
+            start_time=reservation.start_time,
+            end_time=reservation.end_time,
+            type=reservation.type,
+            node_id=reservation.node_id,
+            user_id=user_id,
+        )
+        if reservation.type == models.ReservationType.DEVICE and reservation.device_ids:
+            db_reservation.reserved_devices.extend(
+                devices_by_id[device_id] for device_id in dict.fromkeys(reservation.device_ids)
+            )
+        db_reservations.append(db_reservation)
+
+    db.add_all(db_reservations)
+    db.flush()
+    return db_reservations
+
+
+def get_reservations_by_ids(db: Session, reservation_ids: list[int]) -> list[models.Reservation]:
+    """Load several reservations with their devices in two queries, ordered by ID."""
+    return (
+        db.query(models.Reservation)
+        .options(selectinload(models.Reservation.reserved_devices))
+        .filter(models.Reservation.id.in_(reservation_ids))
+        .order_by(models.Reservation.id)
+        .all()
+    )
+
+
 def get_reservations(
     db: Session,
     user_id: Optional[int] = None,
@@ -113,9 +378,10 @@ def get_reservations(
     end_date: Optional[datetime] = None,
     skip: int = 0,
     limit: int = 100,
+    after: Optional[Cursor] = None,
 ) -> list[models.Reservation]:
     """
-    Get reservations with optional filters.
+    Get reservations with optional filters, newest start first.
     
     Args:
         db: Database session
@@ -123,8 +389,10 @@ def get_reservations(
         node_id: Filter by node ID
         start_date: Filter reservations that end after this date
         end_date: Filter reservations that start before this date
-        skip: Number of records to skip (pagination)
+        skip: Number of records to skip (offset pagination)
         limit: Maximum number of records to return
+        after: (start_time, id) of the last row already seen (keyset
+            pagination); replaces skip
     
     Returns:
         List of Reservation objects
@@ -145,7 +413,18 @@ def get_reservations(
         # Get reservations that start before end_date
         query = query.filter(models.Reservation.start_time < end_date)
     
-    return query.order_by(models.Reservation.start_time.desc()).offset(skip).limit(limit).all()
+    if after is not None:
+        query = query.filter(
+            after_cursor(models.Reservation.start_time, models.Reservation.id, after)
+        )
+        skip = 0
+    
+    return (
+        query.order_by(models.Reservation.start_time.desc(), models.Reservation.id.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
 
 
 def get_reservation(db: Session, reservation_id: int) -> Optional[models.Reservation]:
@@ -173,8 +452,10 @@ def delete_reservation(db: Session, reservation_id: int, user_id: Optional[int]
     reservation = query.first()
     
     if reservation:
+        node_id = reservation.node_id
         db.delete(reservation)
         db.commit()
+        reservation_index.remove(node_id, reservation_id)
         return True
     
     return False
@@ -204,3 +485,95 @@ def get_active_reservations(
         query = query.filter(models.Reservation.node_id == node_id)
     
     return query.all()
+
+
+def get_user_windows(
+    db: Session, node_id: int, start_time: datetime, end_time: datetime
+) -> list[tuple[int, datetime, datetime]]:
+    """(user_id, start, end) of the reservations on a node overlapping a window."""
+    return [
+        tuple(row)
+        for row in db.query(
+            models.Reservation.user_id,
+            models.Reservation.start_time,
+            models.Reservation.end_time,
+        ).filter(
+            models.Reservation.node_id == node_id,
+            models.Reservation.start_time < as_naive_utc(end_time),
+            models.Reservation.end_time > as_naive_utc(start_time),
+        )
+    ]
+
+
+def get_reservation_intervals(
+    db: Session,
+    start_time: datetime,
+    end_time: datetime,
+    node_ids: Optional[list[int]] = None,
+) -> list:
+    """
+    Get flat (reservation, device) rows overlapping a time window.
+
+    One row is returned per reserved device; machine-level reservations yield a
+    single row with device_id set to None. This is a single query, intended for
+    fleet-wide views that rasterize or sweep over the intervals.
+
+    Returns:
+        Rows with id, node_id, type, start_time, end_time and device_id
+    """
+    query = (
+        db.query(
+            models.Reservation.id,
+            models.Reservation.node_id,
+            models.Reservation.type,
+            models.Reservation.start_time,
+            models.Reservation.end_time,
+            models.ReservationDevice.device_id,
+        )
+        .outerjoin(
+            models.ReservationDevice,
+            models.ReservationDevice.reservation_id == models.Reservation.id,
+        )
+        .filter(
+            models.Reservation.start_time < end_time,
+            models.Reservation.end_time > start_time,
+        )
+    )
+
+    if node_ids is not None:
+        query = query.filter(models.Reservation.node_id.in_(node_ids))
+
+    return query.order_by(models.Reservation.start_time).all()
+
+
+def get_node_intervals(
+    db: Session,
+    node_ids: list[int],
+    start_time: datetime,
+    end_time: datetime,
+) -> dict[int, list[tuple[datetime, datetime, Optional[int], int]]]:
+    """
+    Get (start, end, device_id, reservation_id) intervals overlapping a window,
+    per node.
+
+    Machine-level reservations are reported with device_id None. Nodes whose
+    interval index entry is fresh are answered from memory; the remainder are
+    read with a single SQL query. Times are naive UTC.
+    """
+    intervals = {node_id: [] for node_id in node_ids}
+    indexed = reservation_index.ensure_nodes(db, node_ids)
+    for node_id in indexed:
+        intervals[node_id] = reservation_index.intervals(node_id, start_time, end_time)
+
+    unindexed = [node_id for node_id in node_ids if node_id not in indexed]
+    if unindexed:
+        for row in get_reservation_intervals(db, start_time, end_time, node_ids=unindexed):
+            intervals[row.node_id].append(
+                (
+                    as_naive_utc(row.start_time),
+                    as_naive_utc(row.end_time),
+                    None if row.type == models.ReservationType.MACHINE else row.device_id,
+                    row.id,
+                )
+            )
+    return intervals
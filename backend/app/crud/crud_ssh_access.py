@@ -0,0 +1,91 @@
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.ssh_access import SSHAccessAction, SSHAccessEvent, SSHAccessGrant
+
+
+def get_grants(db: Session, node_id: int) -> list[SSHAccessGrant]:
+    """The keys currently granted on a node, oldest grant first."""
+    return (
+        db.query(SSHAccessGrant)
+        .filter(SSHAccessGrant.node_id == node_id)
+        .order_by(SSHAccessGrant.version)
+        .all()
+    )
+
+
+def get_latest_version(db: Session, node_id: int) -> int:
+    """ID of the node's newest event, or 0 if it has none."""
+    return (
+        db.query(func.max(SSHAccessEvent.id))
+        .filter(SSHAccessEvent.node_id == node_id)
+        .scalar()
+        or 0
+    )
+
+
+def get_events(
+    db: Session, node_id: int, since: int, limit: Optional[int] = None
+) -> list[SSHAccessEvent]:
+    """A node's events after version `since`, oldest first."""
+    query = (
+        db.query(SSHAccessEvent)
+        .filter(SSHAccessEvent.node_id == node_id, SSHAccessEvent.id > since)
+        .order_by(SSHAccessEvent.id)
+    )
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+
+def record_changes(
+    db: Session,
+    node_id: int,
+    granted: list[tuple[str, str, str]],
+    revoked: list[SSHAccessGrant],
+) -> int:
+    """
+    Publish grants of (username, public_key, fingerprint) and revocations of
+    existing grants on a node, and commit.
+
+    Revocations are written first, so a key that is replaced within one
+    change is never reported as removed after its new grant.
+
+    Returns:
+        Number of events written
+    """
+    for grant in revoked:
+        db.add(
+            SSHAccessEvent(
+                node_id=node_id,
+                action=SSHAccessAction.REVOKE,
+                fingerprint=grant.fingerprint,
+                username=grant.username,
+                public_key=grant.public_key,
+            )
+        )
+        db.delete(grant)
+    db.flush()
+    for username, public_key, fingerprint in granted:
+        event = SSHAccessEvent(
+            node_id=node_id,
+            action=SSHAccessAction.GRANT,
+            fingerprint=fingerprint,
+            username=username,
+            public_key=public_key,
+        )
+        db.add(event)
+        db.flush()
+        db.add(
+            SSHAccessGrant(
+                node_id=node_id,
+                fingerprint=fingerprint,
+                username=username,
+                public_key=public_key,
+                version=event.id,
+            )
+        )
+    db.commit()
+    return len(granted) + len(revoked)
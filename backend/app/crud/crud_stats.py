@@ -1,13 +1,33 @@
-from datetime import datetime, timedelta
+from datetime import datetime
+from typing import Optional
 
-from sqlalchemy import func, text
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import false, func, literal_column, select, true, union_all
+from sqlalchemy.orm import Session
 
+from app.core.pagination import Cursor, after_cursor
 from app.models import node as node_models
 from app.models import reservation as reservation_models
 from app.models import user as user_models
 
 
+def _reservation_tables():
+    """The live reservations table and its archive, with an 'archived' flag."""
+    return (
+        (reservation_models.Reservation, false()),
+        (reservation_models.ArchivedReservation, true()),
+    )
+
+
+def _hours(db: Session, start, end):
+    """Portable SQL expression for the length of [start, end) in hours."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        return (func.julianday(end) - func.julianday(start)) * 24
+    if dialect == "mysql":
+        return func.timestampdiff(literal_column("SECOND"), start, end) / 3600.0
+    return func.extract("epoch", end - start) / 3600
+
+
 def get_reservation_history(
     db: Session,
     skip: int = 0,
@@ -16,29 +36,56 @@ def get_reservation_history(
     node_id: int = None,
     start_time: datetime = None,
     end_time: datetime = None,
+    after: Optional[Cursor] = None,
 ):
     """
     Get all reservation history with optional filters.
+
+    Reads live and archived reservations as one result set (UNION ALL); the
+    filters are applied inside each branch so both can use their indexes.
+    With `after` (keyset pagination, replaces skip) each branch seeks straight
+    to the position, so deep pages cost the same as the first one.
     """
-    query = (
-        db.query(reservation_models.Reservation)
-        .options(
-            joinedload(reservation_models.Reservation.user),
-            joinedload(reservation_models.Reservation.node),
+    if after is not None:
+        skip = 0
+    branches = []
+    for table, archived in _reservation_tables():
+        query = (
+            select(
+                table.id,
+                table.start_time,
+                table.end_time,
+                table.node_id,
+                table.user_id,
+                user_models.User.email.label("user_email"),
+                node_models.Node.name.label("node_name"),
+                archived.label("archived"),
+            )
+            .join(user_models.User, table.user_id == user_models.User.id)
+            .join(node_models.Node, table.node_id == node_models.Node.id)
+        )
+        if user_id:
+            query = query.where(table.user_id == user_id)
+        if node_id:
+            query = query.where(table.node_id == node_id)
+        if start_time:
+            query = query.where(table.start_time >= start_time)
+        if end_time:
+            query = query.where(table.end_time <= end_time)
+        if after is not None:
+            query = query.where(after_cursor(table.start_time, table.id, after))
+        # Each branch only needs its first skip + limit rows
+        branches.append(
+            query.order_by(table.start_time.desc(), table.id.desc()).limit(skip + limit)
         )
-        .order_by(reservation_models.Reservation.start_time.desc())
-    )
-
-    if user_id:
-        query = query.filter(reservation_models.Reservation.user_id == user_id)
-    if node_id:
-        query = query.filter(reservation_models.Reservation.node_id == node_id)
-    if start_time:
-        query = query.filter(reservation_models.Reservation.start_time >= start_time)
-    if end_time:
-        query = query.filter(reservation_models.Reservation.end_time <= end_time)
 
-    return query.offset(skip).limit(limit).all()
+    history = union_all(*(branch.subquery().select() for branch in branches)).subquery()
+    return db.execute(
+        select(history)
+        .order_by(history.c.start_time.desc(), history.c.id.desc())
+        .offset(skip)
+        .limit(limit)
+    ).all()
 
 
 def get_utilization_stats(db: Session, period: str, node_id: int = None):
@@ -62,24 +109,26 @@ def get_utilization_stats(db: Session, period: str, node_id: int = None):
 
 def get_user_stats(db: Session):
     """
-    Get stats for each user.
+    Get stats for each user, over live and archived reservations.
     """
+    reservations = union_all(
+        *(
+            select(table.user_id, table.start_time, table.end_time)
+            for table, _ in _reservation_tables()
+        )
+    ).subquery()
+
     query = (
         db.query(
             user_models.User.id,
             user_models.User.email,
-            func.count(reservation_models.Reservation.id).label("total_reservations"),
+            func.count().label("total_reservations"),
             func.sum(
-                func.extract(
-                    "epoch",
-                    reservation_models.Reservation.end_time
-                    - reservation_models.Reservation.start_time,
-                )
-                / 3600
+                _hours(db, reservations.c.start_time, reservations.c.end_time)
             ).label("total_usage_hours"),
         )
-        .join(reservation_models.Reservation)
-        .group_by(user_models.User.id)
+        .join(reservations, reservations.c.user_id == user_models.User.id)
+        .group_by(user_models.User.id, user_models.User.email)
     )
 
     results = query.all()
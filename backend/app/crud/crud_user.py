@@ -1,8 +1,9 @@
 from typing import Optional
 
-from sqlalchemy.orm import Session
+from sqlalchemy import func
+from sqlalchemy.orm import Session, contains_eager
 
-from app.models.user import SSHKey, User
+from app.models.user import ApiKey, SSHKey, User
 from app.schemas.user import SSHKeyCreate, UserCreate
 
 
@@ -36,11 +37,51 @@ def create_user(db: Session, user: UserCreate, hashed_password: str) -> User:
     return db_user
 
 
+def update_password_hash(db: Session, user: User, hashed_password: str) -> User:
+    """Replace a user's password hash, e.g. after a bcrypt cost change."""
+    user.hashed_password = hashed_password
+    db.commit()
+    db.refresh(user)
+    return user
+
+
 def get_user_ssh_keys(db: Session, user_id: int) -> list[SSHKey]:
     """Get all SSH keys for a user."""
     return db.query(SSHKey).filter(SSHKey.user_id == user_id).all()
 
 
+def get_ssh_key_by_fingerprint(db: Session, fingerprint: str) -> Optional[SSHKey]:
+    """Get the SSH key with a fingerprint, of any user (unique index lookup)."""
+    return db.query(SSHKey).filter(SSHKey.fingerprint == fingerprint).first()
+
+
+def get_existing_fingerprints(db: Session, fingerprints: list[str]) -> set[str]:
+    """Which of the given fingerprints are already registered, in one query."""
+    if not fingerprints:
+        return set()
+    return {
+        row[0]
+        for row in db.query(SSHKey.fingerprint).filter(SSHKey.fingerprint.in_(fingerprints))
+    }
+
+
+def add_ssh_keys_bulk(
+    db: Session, keys: list[tuple[str, str]], user_id: int
+) -> list[SSHKey]:
+    """
+    Stage many (public_key, fingerprint) pairs for a user in the current
+    transaction. The rows go out as one batched INSERT on flush; nothing is
+    committed, so the caller can add audit entries and commit once.
+    """
+    db_keys = [
+        SSHKey(public_key=public_key, fingerprint=fingerprint, user_id=user_id)
+        for public_key, fingerprint in keys
+    ]
+    db.add_all(db_keys)
+    db.flush()
+    return db_keys
+
+
 def create_ssh_key(
     db: Session, key: SSHKeyCreate, user_id: int, fingerprint: str
 ) -> SSHKey:
@@ -64,3 +105,71 @@ def delete_ssh_key(db: Session, key_id: int, user_id: int) -> bool:
         db.commit()
         return True
     return False
+
+
+def get_authorized_ssh_keys(
+    db: Session, user_ids: set[int]
+) -> list[tuple[str, str, str]]:
+    """(username, public_key, fingerprint) of the active users among user_ids, by username."""
+    if not user_ids:
+        return []
+    return [
+        tuple(row)
+        for row in db.query(User.username, SSHKey.public_key, SSHKey.fingerprint)
+        .join(SSHKey, SSHKey.user_id == User.id)
+        .filter(User.id.in_(user_ids), User.is_active.is_(True))
+        .order_by(User.username, SSHKey.id)
+    ]
+
+
+def get_user_api_keys(db: Session, user_id: int) -> list[ApiKey]:
+    """Get all API keys of a user."""
+    return db.query(ApiKey).filter(ApiKey.user_id == user_id).order_by(ApiKey.id).all()
+
+
+def count_api_keys(db: Session, user_id: int) -> int:
+    """Number of API keys a user has."""
+    return db.query(func.count(ApiKey.id)).filter(ApiKey.user_id == user_id).scalar()
+
+
+def get_api_key_by_prefix(db: Session, prefix: str) -> Optional[ApiKey]:
+    """An API key together with its active owner, in one indexed query."""
+    return (
+        db.query(ApiKey)
+        .join(ApiKey.owner)
+        .options(contains_eager(ApiKey.owner))
+        .filter(ApiKey.prefix == prefix, User.is_active.is_(True))
+        .first()
+    )
+
+
+def create_api_key(
+    db: Session,
+    user_id: int,
+    name: str,
+    prefix: str,
+    key_digest: str,
+    scopes: Optional[list[str]] = None,
+) -> ApiKey:
+    """Store a new API key digest for a user."""
+    db_key = ApiKey(
+        name=name,
+        prefix=prefix,
+        key_digest=key_digest,
+        scopes=scopes,
+        user_id=user_id,
+    )
+    db.add(db_key)
+    db.commit()
+    db.refresh(db_key)
+    return db_key
+
+
+def delete_api_key(db: Session, key_id: int, user_id: int) -> bool:
+    """Delete an API key. Returns True if deleted, False if not found."""
+    key = db.query(ApiKey).filter(ApiKey.id == key_id, ApiKey.user_id == user_id).first()
+    if key:
+        db.delete(key)
+        db.commit()
+        return True
+    return False
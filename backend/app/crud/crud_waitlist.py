@@ -0,0 +1,133 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.orm import Session
+
+from app.crud.reservation_index import as_naive_utc
+from app.models.waitlist import WaitlistEntry, WaitlistStatus
+from app.schemas import reservation as schemas
+
+
+def create_entry(
+    db: Session, request: schemas.ReservationCreate, user_id: int, priority: int = 0
+) -> WaitlistEntry:
+    """Queue a reservation request."""
+    entry = WaitlistEntry(
+        node_id=request.node_id,
+        start_time=as_naive_utc(request.start_time),
+        end_time=as_naive_utc(request.end_time),
+        type=request.type,
+        device_ids=list(dict.fromkeys(request.device_ids)) if request.device_ids else None,
+        priority=priority,
+        user_id=user_id,
+    )
+    db.add(entry)
+    db.commit()
+    db.refresh(entry)
+    return entry
+
+
+def get_entry(db: Session, entry_id: int) -> Optional[WaitlistEntry]:
+    """Get a single waitlist entry by ID."""
+    return db.query(WaitlistEntry).filter(WaitlistEntry.id == entry_id).first()
+
+
+def get_user_entries(
+    db: Session, user_id: int, status: Optional[WaitlistStatus] = None
+) -> list[WaitlistEntry]:
+    """Get a user's waitlist entries, newest first."""
+    query = db.query(WaitlistEntry).filter(WaitlistEntry.user_id == user_id)
+    if status is not None:
+        query = query.filter(WaitlistEntry.status == status)
+    return query.order_by(WaitlistEntry.id.desc()).all()
+
+
+def count_waiting(db: Session, user_id: int) -> int:
+    """Number of entries a user has waiting."""
+    return (
+        db.query(func.count(WaitlistEntry.id))
+        .filter(
+            WaitlistEntry.user_id == user_id,
+            WaitlistEntry.status == WaitlistStatus.WAITING,
+        )
+        .scalar()
+    )
+
+
+def get_waiting_entries(
+    db: Session, node_id: int, start_time: datetime, end_time: datetime
+) -> list[WaitlistEntry]:
+    """
+    Waiting entries on a node whose window overlaps [start_time, end_time),
+    in service order (priority DESC, id ASC).
+    """
+    return (
+        db.query(WaitlistEntry)
+        .filter(
+            WaitlistEntry.node_id == node_id,
+            WaitlistEntry.status == WaitlistStatus.WAITING,
+            WaitlistEntry.start_time < as_naive_utc(end_time),
+            WaitlistEntry.end_time > as_naive_utc(start_time),
+        )
+        .order_by(WaitlistEntry.priority.desc(), WaitlistEntry.id)
+        .all()
+    )
+
+
+def get_queue_position(db: Session, entry: WaitlistEntry) -> int:
+    """
+    1-based position of a waiting entry among the waiting entries competing
+    for the same node and an overlapping window.
+    """
+    ahead = (
+        db.query(func.count(WaitlistEntry.id))
+        .filter(
+            WaitlistEntry.node_id == entry.node_id,
+            WaitlistEntry.status == WaitlistStatus.WAITING,
+            WaitlistEntry.start_time < entry.end_time,
+            WaitlistEntry.end_time > entry.start_time,
+            or_(
+                WaitlistEntry.priority > entry.priority,
+                and_(
+                    WaitlistEntry.priority == entry.priority,
+                    WaitlistEntry.id < entry.id,
+                ),
+            ),
+        )
+        .scalar()
+    )
+    return ahead + 1
+
+
+def resolve_entry(
+    db: Session,
+    entry: WaitlistEntry,
+    status: WaitlistStatus,
+    reservation_id: Optional[int] = None,
+    commit: bool = True,
+) -> WaitlistEntry:
+    """Move an entry out of the waiting state; commit=False joins the caller's transaction."""
+    entry.status = status
+    entry.reservation_id = reservation_id
+    entry.resolved_at = datetime.now(timezone.utc)
+    if commit:
+        db.commit()
+        db.refresh(entry)
+    return entry
+
+
+def expire_entries(db: Session, now: datetime, user_id: Optional[int] = None) -> int:
+    """Expire waiting entries whose window has already started."""
+    query = update(WaitlistEntry).where(
+        WaitlistEntry.status == WaitlistStatus.WAITING,
+        WaitlistEntry.start_time <= as_naive_utc(now),
+    )
+    if user_id is not None:
+        query = query.where(WaitlistEntry.user_id == user_id)
+    result = db.execute(
+        query.values(status=WaitlistStatus.EXPIRED, resolved_at=now),
+        execution_options={"synchronize_session": False},
+    )
+    db.commit()
+    return result.rowcount
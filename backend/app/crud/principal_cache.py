@@ -0,0 +1,111 @@
+"""
+Cache of authenticated principals, keyed by token subject (username).
+
+get_current_user would otherwise load the user row on every authenticated
+request. Entries are detached copies of the row's columns; a hit is attached
+to the request's session with merge(load=False), which issues no SQL and
+still lets relationships such as ssh_keys lazy-load as usual.
+
+Entries are dropped when this process commits a change to, or deletes, the
+user (ORM events below), and expire after PRINCIPAL_CACHE_TTL_SECONDS, which
+bounds how long a change made by another process can go unnoticed. The cache
+holds at most PRINCIPAL_CACHE_MAX_ENTRIES users, least recently used first
+out.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.core.config import settings
+from app.models.user import User
+
+_PENDING_KEY = "principal_cache_invalidate"
+
+
+class PrincipalCache:
+    """Bounded LRU of user rows with a TTL, plus hit/miss counters."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[float, User]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, db: Session, username: str) -> Optional[User]:
+        """The user attached to `db`, or None on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[username]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(username)
+            self.hits += 1
+            cached = entry[1]
+        return db.merge(cached, load=False)
+
+    def put(self, user: User) -> None:
+        """Remember a user loaded from the database."""
+        snapshot = User(
+            **{column.key: getattr(user, column.key) for column in User.__table__.columns}
+        )
+        make_transient_to_detached(snapshot)
+        with self._lock:
+            self._entries[user.username] = (time.monotonic() + self._ttl, snapshot)
+            self._entries.move_to_end(user.username)
+            if len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, username: str) -> None:
+        with self._lock:
+            self._entries.pop(username, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+principal_cache = PrincipalCache(
+    settings.PRINCIPAL_CACHE_MAX_ENTRIES, settings.PRINCIPAL_CACHE_TTL_SECONDS
+)
+
+
+def _changed_usernames(user: User) -> set[str]:
+    history = inspect(user).attrs.username.history
+    return {name for name in (*history.unchanged, *history.added, *history.deleted) if name}
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, user: User) -> None:
+    # Drop now so this process stops serving the old row, and again after
+    # commit in case a concurrent request re-cached it in between
+    session = Session.object_session(user)
+    for username in _changed_usernames(user):
+        principal_cache.invalidate(username)
+        if session is not None:
+            session.info.setdefault(_PENDING_KEY, set()).add(username)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session) -> None:
+    for username in session.info.pop(_PENDING_KEY, ()):
+        principal_cache.invalidate(username)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
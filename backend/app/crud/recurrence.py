@@ -0,0 +1,151 @@
+"""
+Lazy expansion of recurring reservation rules.
+
+A rule is reduced to an anchor, a period and a sorted list of offsets inside
+one period: DAILY repeats one offset every `interval` days, WEEKLY repeats one
+offset per weekday every `interval` weeks, anchored on the Monday of the first
+occurrence's week. Occurrence k of period w therefore starts at
+anchor + w * period + offsets[k], so any window can be entered directly by
+integer division; nothing before the window is ever generated.
+"""
+import bisect
+from datetime import datetime, timedelta
+from typing import Iterator, Optional
+
+from app.crud.reservation_index import as_naive_utc
+from app.models.reservation import RecurrenceFrequency
+
+
+class Recurrence:
+    """Occurrence arithmetic for one recurring reservation rule."""
+
+    __slots__ = (
+        "start", "duration", "until", "count", "_anchor", "_period", "_offsets", "_skipped"
+    )
+
+    def __init__(
+        self,
+        start: datetime,
+        end: datetime,
+        frequency: RecurrenceFrequency,
+        interval: int = 1,
+        weekdays: Optional[list[int]] = None,
+        until: Optional[datetime] = None,
+        count: Optional[int] = None,
+    ):
+        self.start = as_naive_utc(start)
+        self.duration = as_naive_utc(end) - self.start
+        self.until = as_naive_utc(until) if until is not None else None
+        self.count = count
+        if self.duration <= timedelta(0):
+            raise ValueError("end_time must be after start_time")
+        if interval < 1:
+            raise ValueError("interval must be at least 1")
+        if until is None and count is None:
+            raise ValueError("A recurring reservation needs 'until' or 'count'")
+        if count is not None and count < 1:
+            raise ValueError("count must be at least 1")
+
+        if frequency == RecurrenceFrequency.DAILY:
+            if weekdays:
+                raise ValueError("by_weekday is only supported for weekly recurrences")
+            self._anchor = self.start
+            self._period = timedelta(days=interval)
+            self._offsets = [timedelta(0)]
+        else:
+            days = sorted(set(weekdays)) if weekdays else [self.start.weekday()]
+            if days[0] < 0 or days[-1] > 6:
+                raise ValueError("by_weekday values must be between 0 (Monday) and 6 (Sunday)")
+            self._anchor = self.start - timedelta(days=self.start.weekday())
+            self._period = timedelta(weeks=interval)
+            self._offsets = [timedelta(days=day) for day in days]
+        gaps = [b - a for a, b in zip(self._offsets, self._offsets[1:])]
+        gaps.append(self._period - self._offsets[-1] + self._offsets[0])
+        if self.duration > min(gaps):
+            raise ValueError("Occurrences of a recurring reservation may not overlap each other")
+        # Slots of the first period that fall before the first occurrence
+        self._skipped = bisect.bisect_left(self._offsets, self.start - self._anchor)
+
+    @classmethod
+    def of(cls, series) -> "Recurrence":
+        """Build the rule of a RecurringReservation row."""
+        return cls(
+            series.start_time,
+            series.end_time,
+            series.frequency,
+            series.interval,
+            parse_weekdays(series.by_weekday),
+            series.until,
+            series.count,
+        )
+
+    def _slot(self, ordinal: int) -> datetime:
+        period, offset = divmod(ordinal + self._skipped, len(self._offsets))
+        return self._anchor + period * self._period + self._offsets[offset]
+
+    def _ordinal(self, period: int, offset: int) -> int:
+        return period * len(self._offsets) + offset - self._skipped
+
+    def last(self) -> Optional[tuple[int, datetime]]:
+        """(ordinal, start) of the final occurrence, or None if there is none."""
+        candidates = []
+        if self.count is not None:
+            candidates.append((self.count - 1, self._slot(self.count - 1)))
+        if self.until is not None:
+            period = max(0, (self.until - self._anchor) // self._period)
+            found = None
+            while found is None and period >= 0:
+                for offset in reversed(range(len(self._offsets))):
+                    ordinal = self._ordinal(period, offset)
+                    moment = self._slot(ordinal) if ordinal >= 0 else None
+                    if moment is not None and moment <= self.until:
+                        found = (ordinal, moment)
+                        break
+                period -= 1
+            if found is None:
+                return None
+            candidates.append(found)
+        return min(candidates)
+
+    def occurrences(
+        self,
+        window_start: Optional[datetime] = None,
+        window_end: Optional[datetime] = None,
+    ) -> Iterator[datetime]:
+        """
+        Start times of the occurrences overlapping [window_start, window_end),
+        in order. Without a window the whole (finite) series is produced.
+        """
+        last = self.last()
+        if last is None:
+            return
+        last_ordinal = last[0]
+        lower = as_naive_utc(window_start) - self.duration if window_start else None
+        upper = as_naive_utc(window_end) if window_end else None
+
+        period = 0
+        if lower is not None:
+            period = max(0, (lower - self._anchor - self._offsets[-1]) // self._period)
+        while True:
+            for offset in range(len(self._offsets)):
+                ordinal = self._ordinal(period, offset)
+                if ordinal < 0:
+                    continue
+                if ordinal > last_ordinal:
+                    return
+                moment = self._slot(ordinal)
+                if upper is not None and moment >= upper:
+                    return
+                if lower is None or moment > lower:
+                    yield moment
+            period += 1
+
+
+def parse_weekdays(value: Optional[str]) -> list[int]:
+    """Parse the stored by_weekday column ('0,2,4') into a list of ints."""
+    return [int(day) for day in value.split(",")] if value else []
+
+
+def format_weekdays(weekdays: Optional[list[int]]) -> Optional[str]:
+    """Format weekdays for the by_weekday column."""
+    return ",".join(str(day) for day in sorted(set(weekdays))) if weekdays else None
@@ -0,0 +1,376 @@
+"""
+In-memory interval index for reservation conflict detection.
+
+Reservations are kept per node in sorted, non-overlapping interval lists: one
+list for machine-level reservations and one per reserved device. Because the
+conflict rules never allow two reservations to overlap on the same list, the
+start and end arrays are both sorted and an overlap query is two bisects plus
+a walk over the k matching intervals (O(log n + k)).
+
+The index is only an accelerator. Every node entry carries a signature
+(reservation count, max ID, max updated_at) that is compared against the
+database before the entry is trusted; on mismatch the entry is dropped and the
+caller falls back to the SQL conflict check.
+"""
+import bisect
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.reservation import Reservation, ReservationDevice, ReservationType
+
+logger = logging.getLogger(__name__)
+
+
+def as_naive_utc(value: datetime) -> datetime:
+    """Normalize a datetime to naive UTC, the form stored in the database."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class _IntervalList:
+    """Disjoint [start, end) intervals sorted by start time."""
+
+    __slots__ = ("starts", "ends", "ids")
+
+    def __init__(self):
+        self.starts: list[datetime] = []
+        self.ends: list[datetime] = []
+        self.ids: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, start: datetime, end: datetime, reservation_id: int) -> bool:
+        """Insert an interval. Returns False if it would overlap a neighbour."""
+        if end <= start:
+            return False
+        i = bisect.bisect_left(self.starts, start)
+        if i > 0 and self.ends[i - 1] > start:
+            return False
+        if i < len(self.starts) and self.starts[i] < end:
+            return False
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.ids.insert(i, reservation_id)
+        return True
+
+    def remove(self, start: datetime, reservation_id: int) -> bool:
+        i = bisect.bisect_left(self.starts, start)
+        while i < len(self.starts) and self.starts[i] == start:
+            if self.ids[i] == reservation_id:
+                del self.starts[i], self.ends[i], self.ids[i]
+                return True
+            i += 1
+        return False
+
+    def overlapping(self, start: datetime, end: datetime) -> Iterable[tuple[datetime, datetime, int]]:
+        """Yield (start, end, id) for intervals overlapping [start, end)."""
+        i = bisect.bisect_right(self.ends, start)
+        while i < len(self.starts) and self.starts[i] < end:
+            yield self.starts[i], self.ends[i], self.ids[i]
+            i += 1
+
+
+class _NodeIntervals:
+    """All indexed reservations of a single node."""
+
+    def __init__(self):
+        self.machine = _IntervalList()
+        self.devices: dict[int, _IntervalList] = {}
+        # reservation_id -> (start, end, type, device_ids, updated_at)
+        self.reservations: dict[int, tuple] = {}
+        self.signature: tuple = (0, None, None)
+
+    def add(
+        self,
+        reservation_id: int,
+        start: datetime,
+        end: datetime,
+        reservation_type: ReservationType,
+        device_ids: list[int],
+        updated_at: Optional[datetime],
+    ) -> bool:
+        if reservation_type == ReservationType.MACHINE:
+            if not self.machine.add(start, end, reservation_id):
+                return False
+        else:
+            added = []
+            for device_id in device_ids:
+                intervals = self.devices.setdefault(device_id, _IntervalList())
+                if not intervals.add(start, end, reservation_id):
+                    for done in added:
+                        self.devices[done].remove(start, reservation_id)
+                    return False
+                added.append(device_id)
+        self.reservations[reservation_id] = (
+            start, end, reservation_type, list(device_ids), updated_at
+        )
+        count, max_id, max_updated = self.signature
+        self.signature = (
+            count + 1,
+            reservation_id if max_id is None else max(max_id, reservation_id),
+            updated_at if max_updated is None or (updated_at and updated_at > max_updated)
+            else max_updated,
+        )
+        return True
+
+    def remove(self, reservation_id: int) -> bool:
+        entry = self.reservations.pop(reservation_id, None)
+        if entry is None:
+            return False
+        start, _end, reservation_type, device_ids, _updated = entry
+        if reservation_type == ReservationType.MACHINE:
+            self.machine.remove(start, reservation_id)
+        else:
+            for device_id in device_ids:
+                intervals = self.devices.get(device_id)
+                if intervals is not None:
+                    intervals.remove(start, reservation_id)
+        self._recompute_signature()
+        return True
+
+    def _recompute_signature(self) -> None:
+        if not self.reservations:
+            self.signature = (0, None, None)
+            return
+        updated = [e[4] for e in self.reservations.values() if e[4] is not None]
+        self.signature = (
+            len(self.reservations),
+            max(self.reservations),
+            max(updated) if updated else None,
+        )
+
+    def conflicting(
+        self, start: datetime, end: datetime, device_ids: Optional[list[int]]
+    ) -> list[tuple[datetime, datetime, int]]:
+        lists = [self.machine]
+        if device_ids:
+            lists.extend(self.devices[d] for d in device_ids if d in self.devices)
+        else:
+            lists.extend(self.devices.values())
+        hits = {}
+        for intervals in lists:
+            for hit in intervals.overlapping(start, end):
+                hits[hit[2]] = hit
+        return sorted(hits.values())
+
+
+class ReservationIndex:
+    """Process-wide, thread-safe reservation interval index."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._nodes: dict[int, _NodeIntervals] = {}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._nodes.clear()
+
+    def load(self, db: Session) -> int:
+        """(Re)build the index for every node from the database."""
+        nodes = self._build(db)
+        with self._lock:
+            self._nodes = nodes
+        total = sum(len(n.reservations) for n in nodes.values())
+        logger.info("Reservation index loaded: %d reservations on %d nodes", total, len(nodes))
+        return total
+
+    def ensure_node(self, db: Session, node_id: int) -> bool:
+        """
+        Make sure the entry for a node matches the database.
+
+        Loads the node if it is not indexed yet. Returns False (and drops the
+        entry) when the indexed data looks stale, in which case callers must use
+        the SQL path.
+        """
+        signature = _db_signature(db, node_id)
+        with self._lock:
+            entry = self._nodes.get(node_id)
+        if entry is not None:
+            if entry.signature == signature:
+                return True
+            logger.warning("Reservation index stale for node %s; using SQL path", node_id)
+            with self._lock:
+                self._nodes.pop(node_id, None)
+            return False
+
+        entry = self._build(db, node_id).get(node_id, _NodeIntervals())
+        if entry.signature != signature:
+            return False
+        with self._lock:
+            self._nodes[node_id] = entry
+        return True
+
+    def ensure_nodes(self, db: Session, node_ids: Iterable[int]) -> set[int]:
+        """
+        Bulk variant of ensure_node: one grouped signature query for all nodes
+        and one load query for the ones missing from the index.
+
+        Returns the subset of node IDs whose entries can be trusted.
+        """
+        node_ids = set(node_ids)
+        if not node_ids:
+            return set()
+        signatures = {node_id: (0, None, None) for node_id in node_ids}
+        for row in (
+            db.query(
+                Reservation.node_id,
+                func.count(Reservation.id),
+                func.max(Reservation.id),
+                func.max(Reservation.updated_at),
+            )
+            .filter(Reservation.node_id.in_(node_ids))
+            .group_by(Reservation.node_id)
+        ):
+            signatures[row[0]] = tuple(row[1:])
+
+        fresh, missing = set(), set()
+        with self._lock:
+            for node_id, signature in signatures.items():
+                entry = self._nodes.get(node_id)
+                if entry is None:
+                    missing.add(node_id)
+                elif entry.signature == signature:
+                    fresh.add(node_id)
+                else:
+                    self._nodes.pop(node_id)
+        if missing:
+            loaded = self._build(db, node_ids=missing)
+            with self._lock:
+                for node_id in missing:
+                    entry = loaded.get(node_id, _NodeIntervals())
+                    if entry.signature == signatures[node_id]:
+                        self._nodes[node_id] = entry
+                        fresh.add(node_id)
+        return fresh
+
+    def intervals(
+        self, node_id: int, start_time: datetime, end_time: datetime
+    ) -> list[tuple[datetime, datetime, Optional[int], int]]:
+        """
+        (start, end, device_id, reservation_id) for indexed reservations
+        overlapping a window.
+
+        Machine-level reservations are reported once with device_id None.
+        """
+        start, end = as_naive_utc(start_time), as_naive_utc(end_time)
+        with self._lock:
+            entry = self._nodes.get(node_id)
+            if entry is None:
+                return []
+            result = [(s, e, None, rid) for s, e, rid in entry.machine.overlapping(start, end)]
+            for device_id, intervals in entry.devices.items():
+                result.extend(
+                    (s, e, device_id, rid) for s, e, rid in intervals.overlapping(start, end)
+                )
+            return result
+
+    def find_conflicts(
+        self,
+        node_id: int,
+        start_time: datetime,
+        end_time: datetime,
+        device_ids: Optional[list[int]] = None,
+    ) -> list[int]:
+        """IDs of indexed reservations that conflict, ordered by start time."""
+        start, end = as_naive_utc(start_time), as_naive_utc(end_time)
+        with self._lock:
+            entry = self._nodes.get(node_id)
+            if entry is None:
+                return []
+            return [hit[2] for hit in entry.conflicting(start, end, device_ids)]
+
+    def add(self, reservation: Reservation) -> None:
+        """Record a committed reservation."""
+        device_ids = [device.id for device in reservation.reserved_devices]
+        with self._lock:
+            entry = self._nodes.get(reservation.node_id)
+            if entry is None:
+                return
+            if not entry.add(
+                reservation.id,
+                as_naive_utc(reservation.start_time),
+                as_naive_utc(reservation.end_time),
+                reservation.type,
+                device_ids,
+                reservation.updated_at,
+            ):
+                # Overlapping or degenerate data can't be indexed; let the next
+                # lookup reload the node or fall back to SQL.
+                self._nodes.pop(reservation.node_id, None)
+
+    def remove(self, node_id: int, reservation_id: int) -> None:
+        """Forget a deleted reservation."""
+        with self._lock:
+            entry = self._nodes.get(node_id)
+            if entry is not None and not entry.remove(reservation_id):
+                self._nodes.pop(node_id, None)
+
+    def _build(
+        self,
+        db: Session,
+        node_id: Optional[int] = None,
+        node_ids: Optional[set[int]] = None,
+    ) -> dict[int, _NodeIntervals]:
+        query = db.query(
+            Reservation.id,
+            Reservation.node_id,
+            Reservation.start_time,
+            Reservation.end_time,
+            Reservation.type,
+            Reservation.updated_at,
+            ReservationDevice.device_id,
+        ).outerjoin(ReservationDevice, ReservationDevice.reservation_id == Reservation.id)
+        if node_id is not None:
+            query = query.filter(Reservation.node_id == node_id)
+        if node_ids is not None:
+            query = query.filter(Reservation.node_id.in_(node_ids))
+
+        grouped: dict[int, list] = {}
+        for row in query.order_by(Reservation.id):
+            item = grouped.get(row.id)
+            if item is None:
+                item = grouped[row.id] = [row, []]
+            if row.device_id is not None:
+                item[1].append(row.device_id)
+
+        nodes: dict[int, _NodeIntervals] = {}
+        broken: set[int] = set()
+        for row, device_ids in grouped.values():
+            if row.node_id in broken:
+                continue
+            entry = nodes.setdefault(row.node_id, _NodeIntervals())
+            if not entry.add(
+                row.id,
+                as_naive_utc(row.start_time),
+                as_naive_utc(row.end_time),
+                row.type,
+                device_ids,
+                row.updated_at,
+            ):
+                logger.warning("Node %s has overlapping reservations; not indexed", row.node_id)
+                broken.add(row.node_id)
+                nodes.pop(row.node_id, None)
+        return nodes
+
+
+def _db_signature(db: Session, node_id: int) -> tuple:
+    count, max_id, max_updated = (
+        db.query(
+            func.count(Reservation.id),
+            func.max(Reservation.id),
+            func.max(Reservation.updated_at),
+        )
+        .filter(Reservation.node_id == node_id)
+        .one()
+    )
+    return (count, max_id, max_updated)
+
+
+reservation_index = ReservationIndex()
@@ -0,0 +1,171 @@
+"""
+Access token revocation without a database read per request.
+
+Tokens carry the user's token_version. Deactivating a user, changing their
+admin flag or signing out everywhere bumps token_version and records the
+(user_id, old version) pair in token_revocations; deleting a user records
+their current version. A Bloom filter over the recorded pairs answers
+"certainly not revoked" for almost every token without SQL; only possible
+hits are checked against the users table.
+
+Revocations committed by this process enter the filter on commit; those made
+by other processes are read incrementally every
+TOKEN_REVOCATION_REFRESH_SECONDS. A revoked access token can't outlive
+ACCESS_TOKEN_EXPIRE_MINUTES anyway, so older rows are pruned and the filter
+is rebuilt without them once per token lifetime.
+"""
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.token_revocation import TokenRevocation
+from app.models.user import User
+
+_PENDING_KEY = "token_revocations_pending"
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing on blake2b)."""
+
+    def __init__(self, bits: int, hashes: int):
+        self._bits = bits
+        self._hashes = hashes
+        self._array = bytearray((bits + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self._bits for i in range(self._hashes))
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self._array[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(
+            self._array[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+
+class RevocationFilter:
+    """Bloom filter of revoked (user_id, token_version) pairs, kept in sync with the table."""
+
+    def __init__(self, bits: int, hashes: int, refresh_seconds: float, retention: timedelta):
+        self._bits = bits
+        self._hashes = hashes
+        self._refresh_seconds = refresh_seconds
+        self._retention = retention
+        self._lock = threading.Lock()
+        self._filter = BloomFilter(bits, hashes)
+        self._last_id = 0
+        self._next_refresh = 0.0
+        self._next_rebuild = 0.0
+
+    @staticmethod
+    def _key(user_id: int, token_version: int) -> str:
+        return f"{user_id}:{token_version}"
+
+    def might_be_revoked(self, user_id: int, token_version: int) -> bool:
+        """False means the token version is certainly not revoked."""
+        return self._key(user_id, token_version) in self._filter
+
+    def add(self, user_id: int, token_version: int) -> None:
+        with self._lock:
+            self._filter.add(self._key(user_id, token_version))
+
+    def refresh(self, db: Session, force: bool = False) -> None:
+        """
+        Pick up revocations made by other processes, at most once per
+        TOKEN_REVOCATION_REFRESH_SECONDS unless forced. Once per retention
+        period, expired rows are pruned and the filter is rebuilt.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if not force and now < self._next_refresh:
+                return
+            self._next_refresh = now + self._refresh_seconds
+            rebuild = now >= self._next_rebuild
+            if rebuild:
+                self._next_rebuild = now + self._retention.total_seconds()
+            last_id = 0 if rebuild else self._last_id
+
+        if rebuild:
+            cutoff = datetime.now(timezone.utc) - self._retention
+            db.query(TokenRevocation).filter(TokenRevocation.revoked_at < cutoff).delete(
+                synchronize_session=False
+            )
+            db.commit()
+        rows = (
+            db.query(TokenRevocation.id, TokenRevocation.user_id, TokenRevocation.token_version)
+            .filter(TokenRevocation.id > last_id)
+            .order_by(TokenRevocation.id)
+            .all()
+        )
+
+        with self._lock:
+            if rebuild:
+                self._filter = BloomFilter(self._bits, self._hashes)
+                self._last_id = 0
+            for _, user_id, token_version in rows:
+                self._filter.add(self._key(user_id, token_version))
+            if rows:
+                self._last_id = max(self._last_id, rows[-1][0])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._filter = BloomFilter(self._bits, self._hashes)
+            self._last_id = 0
+            self._next_refresh = self._next_rebuild = 0.0
+
+
+revocation_filter = RevocationFilter(
+    settings.TOKEN_REVOCATION_FILTER_BITS,
+    settings.TOKEN_REVOCATION_FILTER_HASHES,
+    settings.TOKEN_REVOCATION_REFRESH_SECONDS,
+    timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
+)
+
+
+def _record(db: Session, user_id: int, token_version: int) -> None:
+    db.add(TokenRevocation(user_id=user_id, token_version=token_version))
+    db.info.setdefault(_PENDING_KEY, []).append((user_id, token_version))
+
+
+def revoke_tokens(db: Session, user: User) -> None:
+    """Invalidate every token issued to a user so far (applied on commit)."""
+    version = user.token_version or 0
+    _record(db, user.id, version)
+    user.token_version = version + 1
+
+
+@event.listens_for(Session, "before_flush")
+def _revoke_on_privilege_change(session: Session, flush_context, instances) -> None:
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            _record(session, obj.id, obj.token_version or 0)
+    for obj in session.dirty:
+        if not isinstance(obj, User):
+            continue
+        attrs = inspect(obj).attrs
+        if attrs.token_version.history.has_changes():
+            continue
+        if attrs.is_active.history.has_changes() or attrs.is_admin.history.has_changes():
+            revoke_tokens(session, obj)
+
+
+@event.listens_for(Session, "after_commit")
+def _add_committed(session: Session) -> None:
+    for user_id, token_version in session.info.pop(_PENDING_KEY, ()):
+        revocation_filter.add(user_id, token_version)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -3,14 +3,33 @@ import sys
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.api.v1.endpoints import auth, nodes, reservations, users
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.api.v1.endpoints import audit, auth, nodes, reservations, stats, users
+from app.core.audit_writer import audit_writer
 from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.idempotency import IdempotencyMiddleware, idempotency_store
+from app.core.security import password_hasher
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.crud.principal_cache import principal_cache
+from app.crud.reservation_index import reservation_index
+from app.services import auth_service
 
 app = FastAPI(
     title="ServerSentinel API",
     description="Backend service for ServerSentinel, managing NPU server reservations.",
     version="0.1.0",
 )
+# Sessions for work outside requests (startup preload, audit writer, shutdown
+# flush); tests point it at their own database
+app.state.session_factory = SessionLocal
+
+# Replay stored responses for retried reservation writes (added first so CORS
+# still wraps replayed responses)
+app.add_middleware(
+    IdempotencyMiddleware, store=idempotency_store, path_prefix="/api/v1/reservations"
+)
 
 # CORS: allow local frontend dev server
 app.add_middleware(
@@ -22,6 +41,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Include all API routers
@@ -31,6 +51,8 @@ app.include_router(nodes.router, prefix="/api/v1/nodes", tags=["nodes"])
 app.include_router(
     reservations.router, prefix="/api/v1/reservations", tags=["reservations"]
 )
+app.include_router(stats.router, prefix="/api/v1", tags=["stats"])
+app.include_router(audit.router, prefix="/api/v1/audit-logs", tags=["audit"])
 
 
 @app.get("/")
@@ -51,6 +73,9 @@ def health_check():
         "version": "0.1.0",
         "database": "sqlite",
         "python_version": f"{sys.version_info.major}.{sys.version_info.minor}.{sys.version_info.micro}",
+        "principal_cache": principal_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "audit_writer": audit_writer.stats(),
     }
 
 
@@ -58,5 +83,30 @@ def health_check():
 def on_startup():
     # This is a good place to initialize DB, etc. if needed
     # For now, we rely on Alembic for DB setup.
+    if settings.RESERVATION_INDEX_PRELOAD:
+        db = app.state.session_factory()
+        try:
+            count = reservation_index.load(db)
+            print(f"Reservation index loaded ({count} reservations).")
+        except SQLAlchemyError as e:
+            # Nodes are then indexed lazily on their first conflict check
+            print(f"Reservation index preload skipped: {e}")
+        finally:
+            db.close()
+    if settings.AUDIT_ASYNC:
+        audit_writer.start(app.state.session_factory)
     print("ServerSentinel API startup complete.")
     print(f"Python version: {sys.version}")
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    audit_writer.stop(flush=settings.AUDIT_FLUSH_ON_SHUTDOWN)
+    # Don't lose the failed-login counts of the current window
+    db = app.state.session_factory()
+    try:
+        auth_service.flush_failed_logins(db, force=True)
+    except SQLAlchemyError as e:
+        print(f"Failed-login audit flush skipped: {e}")
+    finally:
+        db.close()
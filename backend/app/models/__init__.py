@@ -3,5 +3,16 @@
 
 from app.models.audit_log import AuditLog
 from app.models.node import Device, Node
-from app.models.reservation import Reservation, ReservationDevice
-from app.models.user import SSHKey, User
+from app.models.reservation import (
+    ArchivedReservation,
+    ArchivedReservationDevice,
+    RecurringReservation,
+    RecurringReservationDevice,
+    RecurringReservationException,
+    Reservation,
+    ReservationDevice,
+)
+from app.models.ssh_access import SSHAccessEvent, SSHAccessGrant
+from app.models.token_revocation import TokenRevocation
+from app.models.user import ApiKey, SSHKey, User
+from app.models.waitlist import WaitlistEntry
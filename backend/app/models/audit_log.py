@@ -1,7 +1,7 @@
 from datetime import datetime, timezone
 from typing import Optional
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text
 from sqlalchemy.dialects.sqlite import JSON
 from sqlalchemy.orm import relationship
 
@@ -14,6 +14,15 @@ class AuditLog(Base):
     符合 design.md 第 3.2 节的要求
     """
     __tablename__ = "audit_logs"
+    # 按 (created_at, id) 做 keyset 分页；每个过滤条件配一个以它开头的复合索引
+    __table_args__ = (
+        Index("ix_audit_logs_created_at_id", "created_at", "id"),
+        Index("ix_audit_logs_user_id_created_at", "user_id", "created_at"),
+        Index("ix_audit_logs_action_created_at", "action", "created_at"),
+        Index(
+            "ix_audit_logs_resource_created_at", "resource_type", "resource_id", "created_at"
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # 可为NULL，用于系统操作
@@ -1,7 +1,7 @@
 import enum
 from datetime import datetime, timezone
 
-from sqlalchemy import Column, DateTime, Enum, ForeignKey, Integer, String
+from sqlalchemy import Column, DateTime, Enum, ForeignKey, Index, Integer, String
 from sqlalchemy.orm import relationship
 
 from app.core.database import Base
@@ -14,6 +14,15 @@ class ReservationType(str, enum.Enum):
 
 class Reservation(Base):
     __tablename__ = "reservations"
+    # Serves per-node overlap queries and the interval index freshness check,
+    # plus keyset-paginated listings ordered by (start_time, id). IDs are
+    # never reused (AUTOINCREMENT on SQLite), as archived rows keep theirs.
+    __table_args__ = (
+        Index("ix_reservations_node_id_start_time", "node_id", "start_time"),
+        Index("ix_reservations_start_time", "start_time"),
+        Index("ix_reservations_user_id_start_time", "user_id", "start_time"),
+        {"sqlite_autoincrement": True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     start_time = Column(DateTime, nullable=False)
@@ -37,3 +46,96 @@ class ReservationDevice(Base):
     __tablename__ = "reservation_devices"
     reservation_id = Column(Integer, ForeignKey("reservations.id"), primary_key=True)
     device_id = Column(Integer, ForeignKey("devices.id"), primary_key=True)
+
+
+class ArchivedReservation(Base):
+    """
+    A finished reservation moved out of the hot table by archive_service.
+
+    Rows keep their original ID, so history can refer to them the same way.
+    """
+    __tablename__ = "reservations_archive"
+    __table_args__ = (
+        Index("ix_reservations_archive_start_time", "start_time"),
+        Index("ix_reservations_archive_user_id_start_time", "user_id", "start_time"),
+        Index("ix_reservations_archive_node_id_start_time", "node_id", "start_time"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    start_time = Column(DateTime, nullable=False)
+    end_time = Column(DateTime, nullable=False)
+    type = Column(Enum(ReservationType), nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+    archived_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+
+    user_id = Column(Integer, ForeignKey("users.id"))
+    node_id = Column(Integer, ForeignKey("nodes.id"))
+
+    user = relationship("User")
+    node = relationship("Node")
+
+    reserved_devices = relationship("Device", secondary="reservation_devices_archive")
+
+
+class ArchivedReservationDevice(Base):
+    __tablename__ = "reservation_devices_archive"
+    reservation_id = Column(Integer, ForeignKey("reservations_archive.id"), primary_key=True)
+    device_id = Column(Integer, ForeignKey("devices.id"), primary_key=True)
+
+
+class RecurrenceFrequency(str, enum.Enum):
+    DAILY = "daily"
+    WEEKLY = "weekly"
+
+
+class RecurringReservation(Base):
+    """
+    A reservation repeated by a compact RRULE-like rule.
+
+    Occurrences are not stored; they are expanded on demand inside the window
+    being queried (see app.crud.recurrence). start_time/end_time describe the
+    first occurrence, series_end is the end of the last one.
+    """
+    __tablename__ = "recurring_reservations"
+    __table_args__ = (
+        Index("ix_recurring_reservations_node_id_start_time", "node_id", "start_time"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    start_time = Column(DateTime, nullable=False)
+    end_time = Column(DateTime, nullable=False)
+    type = Column(Enum(ReservationType), nullable=False)
+    frequency = Column(Enum(RecurrenceFrequency), nullable=False)
+    interval = Column(Integer, default=1, nullable=False)
+    by_weekday = Column(String(20), nullable=True)  # Comma-separated, 0 = Monday (weekly only)
+    until = Column(DateTime, nullable=True)  # Latest allowed occurrence start
+    count = Column(Integer, nullable=True)  # Number of occurrences
+    series_end = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc),
+                       onupdate=lambda: datetime.now(timezone.utc), nullable=False)
+
+    user_id = Column(Integer, ForeignKey("users.id"))
+    node_id = Column(Integer, ForeignKey("nodes.id"))
+
+    user = relationship("User")
+    node = relationship("Node")
+
+    reserved_devices = relationship("Device", secondary="recurring_reservation_devices")
+    cancelled_occurrences = relationship(
+        "RecurringReservationException", cascade="all, delete-orphan"
+    )
+
+
+class RecurringReservationDevice(Base):
+    __tablename__ = "recurring_reservation_devices"
+    series_id = Column(Integer, ForeignKey("recurring_reservations.id"), primary_key=True)
+    device_id = Column(Integer, ForeignKey("devices.id"), primary_key=True)
+
+
+class RecurringReservationException(Base):
+    """A single cancelled occurrence of a recurring reservation."""
+    __tablename__ = "recurring_reservation_exceptions"
+    series_id = Column(Integer, ForeignKey("recurring_reservations.id"), primary_key=True)
+    occurrence_start = Column(DateTime, primary_key=True)
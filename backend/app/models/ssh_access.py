@@ -0,0 +1,41 @@
+import enum
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, DateTime, Enum, ForeignKey, Index, Integer, String
+
+from app.core.database import Base
+
+
+class SSHAccessAction(str, enum.Enum):
+    GRANT = "grant"
+    REVOKE = "revoke"
+
+
+class SSHAccessEvent(Base):
+    """
+    One published change of who may log in to a node.
+
+    The ID doubles as the feed version: it only grows, and the events of a
+    node are written under the node's write guard, so they commit in ID order.
+    """
+    __tablename__ = "ssh_access_events"
+    __table_args__ = (Index("ix_ssh_access_events_node_id_id", "node_id", "id"),)
+
+    id = Column(Integer, primary_key=True)
+    node_id = Column(Integer, ForeignKey("nodes.id"), nullable=False)
+    action = Column(Enum(SSHAccessAction), nullable=False)
+    fingerprint = Column(String(255), nullable=False)
+    username = Column(String(50), nullable=False)
+    public_key = Column(String(1024), nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+
+
+class SSHAccessGrant(Base):
+    """A key currently granted on a node, as last published to the feed."""
+    __tablename__ = "ssh_access_grants"
+
+    node_id = Column(Integer, ForeignKey("nodes.id"), primary_key=True)
+    fingerprint = Column(String(255), primary_key=True)
+    username = Column(String(50), nullable=False)
+    public_key = Column(String(1024), nullable=False)
+    version = Column(Integer, nullable=False)  # ID of the granting event
@@ -0,0 +1,23 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, DateTime, Integer
+
+from app.core.database import Base
+
+
+class TokenRevocation(Base):
+    """
+    A token version of a user that is no longer accepted.
+
+    Rows only matter while access tokens of that version can still be
+    unexpired, so they are pruned after ACCESS_TOKEN_EXPIRE_MINUTES. No
+    foreign key: the revocation of a deleted user must outlive the user row.
+    """
+    __tablename__ = "token_revocations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, nullable=False)
+    token_version = Column(Integer, nullable=False)
+    revoked_at = Column(
+        DateTime, default=lambda: datetime.now(timezone.utc), nullable=False, index=True
+    )
@@ -1,6 +1,7 @@
+import enum
 from datetime import datetime, timezone
 
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy import JSON, Boolean, Column, DateTime, ForeignKey, Integer, String
 from sqlalchemy.orm import relationship
 
 from app.core.database import Base
@@ -14,12 +15,15 @@ class User(Base):
     hashed_password = Column(String(255), nullable=False)
     is_admin = Column(Boolean, default=False)
     is_active = Column(Boolean, default=True)
+    # Embedded in tokens; bumped to revoke every token issued so far
+    token_version = Column(Integer, default=0, nullable=False)
     # 使用 timezone-aware datetime (Python 3.13 推荐)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
     updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), 
                        onupdate=lambda: datetime.now(timezone.utc), nullable=False)
 
     ssh_keys = relationship("SSHKey", back_populates="owner")
+    api_keys = relationship("ApiKey", back_populates="owner", cascade="all, delete-orphan")
     reservations = relationship("Reservation", back_populates="user")
 
 class SSHKey(Base):
@@ -32,3 +36,30 @@ class SSHKey(Base):
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
 
     owner = relationship("User", back_populates="ssh_keys")
+
+
+class ApiKeyScope(str, enum.Enum):
+    READ = "read"  # Safe methods on any endpoint
+    RESERVATIONS = "reservations"  # Any method on reservation endpoints
+    NODE_ACCESS = "node_access"  # Node agents: GET a node's authorized_keys and ssh-access feed
+
+
+class ApiKey(Base):
+    """
+    A credential for automation clients.
+
+    Only an HMAC-SHA256 digest of the key is stored; the random prefix
+    embedded in the key finds the row through a unique index.
+    """
+    __tablename__ = "api_keys"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), nullable=False)
+    prefix = Column(String(16), unique=True, index=True, nullable=False)
+    key_digest = Column(String(64), nullable=False)
+    # None means the key may do anything its owner can
+    scopes = Column(JSON, nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+
+    owner = relationship("User", back_populates="api_keys")
@@ -0,0 +1,48 @@
+import enum
+from datetime import datetime, timezone
+
+from sqlalchemy import JSON, Column, DateTime, Enum, ForeignKey, Index, Integer
+from sqlalchemy.orm import relationship
+
+from app.core.database import Base
+from app.models.reservation import ReservationType
+
+
+class WaitlistStatus(str, enum.Enum):
+    WAITING = "waiting"
+    ALLOCATED = "allocated"
+    EXPIRED = "expired"
+    CANCELLED = "cancelled"
+
+
+class WaitlistEntry(Base):
+    """
+    A reservation request queued until its window becomes free.
+
+    Served in (priority DESC, id ASC) order among the waiting entries that
+    compete for the same node and time range.
+    """
+    __tablename__ = "waitlist_entries"
+    # Release events only look at waiting entries on one node and window
+    __table_args__ = (
+        Index("ix_waitlist_entries_node_id_status_start_time", "node_id", "status", "start_time"),
+        Index("ix_waitlist_entries_user_id_status", "user_id", "status"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    start_time = Column(DateTime, nullable=False)
+    end_time = Column(DateTime, nullable=False)
+    type = Column(Enum(ReservationType), nullable=False)
+    device_ids = Column(JSON, nullable=True)
+    priority = Column(Integer, default=0, nullable=False)
+    status = Column(Enum(WaitlistStatus), default=WaitlistStatus.WAITING, nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    resolved_at = Column(DateTime, nullable=True)
+
+    user_id = Column(Integer, ForeignKey("users.id"))
+    node_id = Column(Integer, ForeignKey("nodes.id"))
+    # Set once the entry has been turned into a reservation
+    reservation_id = Column(Integer, nullable=True)
+
+    user = relationship("User")
+    node = relationship("Node")
@@ -0,0 +1,19 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+# Schema for a single audit log entry
+class AuditLogEntry(BaseModel):
+    id: int
+    user_id: Optional[int] = None
+    action: str
+    resource_type: str
+    resource_id: Optional[int] = None
+    details: Optional[dict] = None
+    ip_address: Optional[str] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
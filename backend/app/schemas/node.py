@@ -56,3 +56,46 @@ class NodeWithDevices(Node):
 
     class Config:
         from_attributes = True
+
+
+# Availability Schemas
+class DeviceAvailability(BaseModel):
+    device_id: int
+    device_index: int
+    model_name: Optional[str] = None
+    # One character per slot: '1' reserved, '0' free
+    occupancy: str
+
+
+class NodeAvailability(BaseModel):
+    node_id: int
+    name: str
+    # Slots where the node has any reservation (not bookable as a whole machine)
+    occupancy: str
+    devices: List[DeviceAvailability] = []
+
+
+class AvailabilityMatrix(BaseModel):
+    start_time: datetime
+    end_time: datetime
+    step_minutes: int
+    slots: int
+    nodes: List[NodeAvailability]
+
+
+# SSH Access Feed Schemas
+class SSHAccessChange(BaseModel):
+    version: int
+    action: str  # "grant" or "revoke"
+    username: str
+    fingerprint: str
+    public_key: str
+
+
+class SSHAccessDelta(BaseModel):
+    node_id: int
+    # Pass back as `since` to get the changes after this response
+    version: int
+    # True if `changes` is the complete set of current grants
+    full: bool
+    changes: List[SSHAccessChange]
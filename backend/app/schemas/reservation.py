@@ -1,9 +1,10 @@
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator, model_validator
 
-from app.models.reservation import ReservationType
+from app.models.reservation import RecurrenceFrequency, ReservationType
+from app.models.waitlist import WaitlistStatus
 from app.schemas.node import Device
 
 
@@ -20,6 +21,18 @@ class ReservationCreate(ReservationBase):
     device_ids: Optional[List[int]] = None
 
 
+# Properties to receive on reservation update; omitted fields are kept
+class ReservationUpdate(BaseModel):
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    device_ids: Optional[List[int]] = None  # New device set (device reservations only)
+
+
+# Several reservations created atomically
+class ReservationBatchCreate(BaseModel):
+    reservations: List[ReservationCreate] = Field(..., min_length=1)
+
+
 # Properties to return to client
 class Reservation(ReservationBase):
     id: int
@@ -30,3 +43,119 @@ class Reservation(ReservationBase):
 
     class Config:
         from_attributes = True  # Changed from orm_mode for Pydantic v2
+
+
+# A free window proposed by the slot search
+class SlotCandidate(BaseModel):
+    node_id: int
+    node_name: str
+    type: ReservationType
+    start_time: datetime
+    end_time: datetime
+    device_ids: List[int] = []
+
+
+# One reservation or recurring occurrence a request collides with
+class ReservationConflict(BaseModel):
+    reservation_id: Optional[int] = None
+    recurring_reservation_id: Optional[int] = None
+    start_time: datetime
+    end_time: datetime
+    # Requested devices it holds; empty when it reserves the whole machine
+    device_ids: List[int] = []
+
+
+# Body of the 409 detail returned when a reservation can't be created
+class ReservationConflictDetail(BaseModel):
+    message: str
+    conflicts: List[ReservationConflict]
+    # Earliest start at which the same devices/machine are free for the same duration
+    next_available_start: Optional[datetime] = None
+
+
+# Reservation request where the server picks the node and devices
+class PlacementCreate(BaseModel):
+    start_time: datetime
+    end_time: datetime
+    type: ReservationType = ReservationType.DEVICE
+    device_count: int = Field(1, ge=1)  # Devices needed, or minimum node size for 'machine'
+    model_name: Optional[str] = None
+
+
+# Properties to receive on recurring reservation creation. start_time and
+# end_time describe the first occurrence; 'until' or 'count' is required.
+class RecurringReservationCreate(ReservationCreate):
+    frequency: RecurrenceFrequency
+    interval: int = Field(1, ge=1)
+    by_weekday: Optional[List[int]] = None  # 0 = Monday ... 6 = Sunday (weekly only)
+    until: Optional[datetime] = None
+    count: Optional[int] = Field(None, ge=1)
+
+    @model_validator(mode="after")
+    def start_is_first_occurrence(self):
+        # Weekly rules are expanded from the Monday of start_time's week, so a
+        # start_time on an unlisted weekday would not be an occurrence at all
+        if self.frequency == RecurrenceFrequency.WEEKLY and self.by_weekday:
+            start = self.start_time
+            if start.tzinfo is not None:
+                start = start.astimezone(timezone.utc)
+            if start.weekday() not in self.by_weekday:
+                raise ValueError(
+                    "start_time must fall on one of the by_weekday days (UTC), "
+                    "as it is the first occurrence"
+                )
+        return self
+
+
+# Recurring reservation returned to client
+class RecurringReservation(ReservationBase):
+    id: int
+    user_id: int
+    frequency: RecurrenceFrequency
+    interval: int
+    by_weekday: List[int] = []
+    until: Optional[datetime] = None
+    count: Optional[int] = None
+    series_end: datetime
+    created_at: datetime
+    updated_at: datetime
+    reserved_devices: List[Device] = []
+
+    @field_validator("by_weekday", mode="before")
+    @classmethod
+    def split_weekdays(cls, value):
+        if isinstance(value, str):
+            return [int(day) for day in value.split(",")]
+        return value or []
+
+    class Config:
+        from_attributes = True
+
+
+# A single expanded occurrence of a recurring reservation
+class ReservationOccurrence(BaseModel):
+    start_time: datetime
+    end_time: datetime
+    cancelled: bool = False
+
+
+# A reservation request to queue until its window is free
+class WaitlistCreate(ReservationCreate):
+    priority: int = 0  # Higher is served first; admins only
+
+
+# Waitlist entry returned to client
+class WaitlistEntry(ReservationBase):
+    id: int
+    user_id: int
+    device_ids: Optional[List[int]] = None
+    priority: int
+    status: WaitlistStatus
+    reservation_id: Optional[int] = None
+    # 1-based position among entries competing for the same window (waiting only)
+    position: Optional[int] = None
+    created_at: datetime
+    resolved_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel
 
 
 # Schema for a single reservation record in the history
@@ -12,8 +12,10 @@ class ReservationHistory(BaseModel):
     node_id: int
     user_id: int
     # Add user and node details for richer context
-    user_email: str = Field(..., alias="user.email")
-    node_name: str = Field(..., alias="node.name")
+    user_email: str
+    node_name: str
+    # True once the reservation has been moved to the archive tables
+    archived: bool = False
 
     class Config:
         from_attributes = True
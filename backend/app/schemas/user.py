@@ -1,7 +1,9 @@
 from datetime import datetime
 from typing import List, Optional
 
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
+
+from app.models.user import ApiKeyScope
 
 
 # Base User Schema
@@ -44,6 +46,43 @@ class SSHKey(SSHKeyBase):
         from_attributes = True
 
 
+class SSHKeyImport(BaseModel):
+    authorized_keys: str  # Contents of an authorized_keys file
+
+
+class SSHKeyImportSkipped(BaseModel):
+    line: int
+    reason: str
+
+
+class SSHKeyImportResult(BaseModel):
+    imported: List[SSHKey]
+    skipped: List[SSHKeyImportSkipped]
+
+
+# API Key Schemas
+class ApiKeyCreate(BaseModel):
+    name: str = Field(min_length=1, max_length=100)
+    # Omit for a key that may do anything its owner can
+    scopes: Optional[List[ApiKeyScope]] = Field(default=None, min_length=1)
+
+
+class ApiKey(BaseModel):
+    id: int
+    name: str
+    prefix: str
+    scopes: Optional[List[ApiKeyScope]] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class ApiKeyCreated(ApiKey):
+    # Only ever returned once, at creation
+    key: str
+
+
 # User with SSH Keys
 class UserWithKeys(User):
     ssh_keys: List[SSHKey] = []
@@ -1,4 +1,22 @@
 # Export all services for easy importing
-from app.services import audit_service, auth_service, node_service, reservation_service
+from app.services import (
+    archive_service,
+    audit_service,
+    auth_service,
+    availability_service,
+    node_service,
+    reservation_service,
+    scheduling_service,
+    waitlist_service,
+)
 
-__all__ = ["audit_service", "auth_service", "node_service", "reservation_service"]
+__all__ = [
+    "archive_service",
+    "audit_service",
+    "auth_service",
+    "availability_service",
+    "node_service",
+    "reservation_service",
+    "scheduling_service",
+    "waitlist_service",
+]
@@ -0,0 +1,94 @@
+"""
+Archive service - moves finished reservations out of the hot tables.
+
+Reservations that ended before a cutoff are copied to reservations_archive /
+reservation_devices_archive and deleted from the live tables in small
+batches. Each batch is its own short transaction, with a pause in between, so
+on SQLite the single write lock is only ever held for one batch and other
+writers (reservation creation in particular) interleave freely.
+"""
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud import crud_archive
+from app.crud.reservation_index import reservation_index
+from app.services import audit_service
+
+logger = logging.getLogger(__name__)
+
+
+def archive_reservations(
+    db: Session,
+    older_than_days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    pause_seconds: Optional[float] = None,
+) -> int:
+    """
+    Archive every reservation that ended more than `older_than_days` ago.
+
+    Args:
+        db: Database session
+        older_than_days: Age cutoff (default: RESERVATION_ARCHIVE_AFTER_DAYS)
+        batch_size: Reservations per transaction (default: RESERVATION_ARCHIVE_BATCH_SIZE)
+        pause_seconds: Sleep between batches (default: RESERVATION_ARCHIVE_PAUSE_MS)
+
+    Returns:
+        Number of reservations archived
+    """
+    if older_than_days is None:
+        older_than_days = settings.RESERVATION_ARCHIVE_AFTER_DAYS
+    if batch_size is None:
+        batch_size = settings.RESERVATION_ARCHIVE_BATCH_SIZE
+    if pause_seconds is None:
+        pause_seconds = settings.RESERVATION_ARCHIVE_PAUSE_MS / 1000
+    if older_than_days < 0:
+        # Only finished reservations may move; conflict checks never look at them
+        raise ValueError("older_than_days must not be negative")
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+
+    now = datetime.now(timezone.utc)
+    cutoff = (now - timedelta(days=older_than_days)).replace(tzinfo=None)
+    archived = 0
+    while True:
+        rows = crud_archive.get_archivable_reservations(db, cutoff, batch_size)
+        if not rows:
+            break
+        _move_batch(db, [row.id for row in rows], now)
+        for row in rows:
+            reservation_index.remove(row.node_id, row.id)
+        archived += len(rows)
+        logger.info("Archived %d reservations (%d so far)", len(rows), archived)
+        if len(rows) < batch_size:
+            break
+        time.sleep(pause_seconds)
+
+    if archived:
+        audit_service.log_action(
+            db=db,
+            user_id=None,
+            action="archive_reservations",
+            resource_type="reservation",
+            details={"archived": archived, "cutoff": cutoff.isoformat()},
+        )
+    return archived
+
+
+def _move_batch(db: Session, reservation_ids: list[int], archived_at: datetime) -> None:
+    """Move one batch, retrying when the database write lock is busy."""
+    retries = settings.RESERVATION_WRITE_RETRIES
+    for attempt in range(retries + 1):
+        try:
+            crud_archive.move_to_archive(db, reservation_ids, archived_at)
+            return
+        except OperationalError:
+            db.rollback()
+            if attempt == retries:
+                raise
+        time.sleep(settings.RESERVATION_WRITE_RETRY_BACKOFF_MS / 1000 * 2 ** attempt)
@@ -0,0 +1,108 @@
+"""
+Audit retention service - moves old audit entries out of the live table.
+
+Entries created more than AUDIT_RETENTION_DAYS ago are appended, oldest
+first, to the compressed monthly archive segments (audit_segments) and then
+deleted from audit_logs in small batches, each its own short transaction
+with a pause in between. Run regularly, this keeps the live table at the
+size of the retention window however long the deployment has existed, while
+the archived entries stay readable through the audit query API.
+
+A batch is on disk and indexed before its rows are deleted. If a run dies in
+between, the next run first deletes the live rows at or before the archive
+watermark instead of archiving them twice.
+"""
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.core.audit_segments import AuditSegmentStore, audit_archive
+from app.core.config import settings
+from app.crud import crud_audit
+from app.schemas.audit import AuditLogEntry
+from app.services import audit_service
+
+logger = logging.getLogger(__name__)
+
+
+def archive_audit_logs(
+    db: Session,
+    older_than_days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    pause_seconds: Optional[float] = None,
+    store: Optional[AuditSegmentStore] = None,
+) -> int:
+    """
+    Archive every audit entry created more than `older_than_days` ago.
+
+    Args:
+        db: Database session
+        older_than_days: Age cutoff (default: AUDIT_RETENTION_DAYS)
+        batch_size: Entries per transaction (default: AUDIT_ARCHIVE_BATCH_SIZE)
+        pause_seconds: Sleep between batches (default: AUDIT_ARCHIVE_PAUSE_MS)
+        store: Archive segments to append to (default: AUDIT_ARCHIVE_DIR)
+
+    Returns:
+        Number of entries archived
+    """
+    if older_than_days is None:
+        older_than_days = settings.AUDIT_RETENTION_DAYS
+    if batch_size is None:
+        batch_size = settings.AUDIT_ARCHIVE_BATCH_SIZE
+    if pause_seconds is None:
+        pause_seconds = settings.AUDIT_ARCHIVE_PAUSE_MS / 1000
+    if store is None:
+        store = audit_archive
+    if older_than_days < 0:
+        raise ValueError("older_than_days must not be negative")
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+
+    watermark = store.watermark()
+    if watermark is not None:
+        leftover = _retry(db, lambda: crud_audit.delete_audit_logs_through(db, watermark))
+        if leftover:
+            logger.info("Deleted %d audit entries archived by an earlier run", leftover)
+
+    now = datetime.now(timezone.utc)
+    cutoff = (now - timedelta(days=older_than_days)).replace(tzinfo=None)
+    archived = 0
+    while True:
+        rows = crud_audit.get_archivable_audit_logs(db, cutoff, batch_size)
+        if not rows:
+            break
+        store.append([AuditLogEntry.model_validate(row).model_dump(mode="json") for row in rows])
+        entry_ids = [row.id for row in rows]
+        _retry(db, lambda: crud_audit.delete_audit_logs(db, entry_ids))
+        archived += len(rows)
+        logger.info("Archived %d audit entries (%d so far)", len(rows), archived)
+        if len(rows) < batch_size:
+            break
+        time.sleep(pause_seconds)
+
+    if archived:
+        audit_service.log_action(
+            db=db,
+            user_id=None,
+            action="archive_audit_logs",
+            resource_type="audit_log",
+            details={"archived": archived, "cutoff": cutoff.isoformat()},
+        )
+    return archived
+
+
+def _retry(db: Session, operation):
+    """Run a delete, retrying when the database write lock is busy."""
+    retries = settings.RESERVATION_WRITE_RETRIES
+    for attempt in range(retries + 1):
+        try:
+            return operation()
+        except OperationalError:
+            db.rollback()
+            if attempt == retries:
+                raise
+        time.sleep(settings.RESERVATION_WRITE_RETRY_BACKOFF_MS / 1000 * 2 ** attempt)
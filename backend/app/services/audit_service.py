@@ -1,11 +1,33 @@
 """
 Audit logging service - handles audit log creation for all critical operations.
+
+Single entries go through the background audit_writer when it is running
+(AUDIT_ASYNC), so requests don't pay a second commit for them. Bulk entries
+written with log_actions(commit=False) stay in the caller's transaction.
+
+Queries and exports can include entries moved to the archive segments
+(audit_segments); those are all older than every live entry.
 """
-from typing import Optional
+import csv
+import io
+import json
+from datetime import datetime, timedelta, timezone
+from itertools import chain, islice
+from typing import Iterator, Optional, Union
 
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
+from app.core.audit_segments import audit_archive
+from app.core.audit_writer import audit_writer
+from app.core.config import settings
+from app.core.pagination import Cursor
+from app.crud import crud_audit
 from app.models.audit_log import AuditLog
+from app.schemas.audit import AuditLogEntry
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+EXPORT_COLUMNS = list(AuditLogEntry.model_fields)
 
 
 def log_action(
@@ -30,17 +52,23 @@ def log_action(
         ip_address: Client IP address
     
     Returns:
-        Created AuditLog instance
+        Created AuditLog instance; while the background writer is running the
+        entry is only queued, and the instance is not persisted (no id)
     """
-    audit_log = AuditLog(
-        user_id=user_id,
-        action=action,
-        resource_type=resource_type,
-        resource_id=resource_id,
-        details=details,
-        ip_address=ip_address,
-    )
+    entry = {
+        "user_id": user_id,
+        "action": action,
+        "resource_type": resource_type,
+        "resource_id": resource_id,
+        "details": details,
+        "ip_address": ip_address,
+    }
+    if audit_writer.running:
+        entry["created_at"] = datetime.now(timezone.utc)
+        audit_writer.enqueue(entry)
+        return AuditLog(**entry)
     
+    audit_log = AuditLog(**entry)
     db.add(audit_log)
     db.commit()
     db.refresh(audit_log)
@@ -48,6 +76,53 @@ def log_action(
     return audit_log
 
 
+def log_actions(db: Session, entries: list[dict], commit: bool = True) -> None:
+    """
+    Create many audit log entries with a single multi-row INSERT.
+    
+    Args:
+        db: Database session
+        entries: Dicts with the same keys as log_action's arguments (minus db)
+        commit: Commit immediately; pass False to join the caller's transaction
+    """
+    if not entries:
+        return
+    db.execute(insert(AuditLog), entries)
+    if commit:
+        db.commit()
+
+
+def reservation_created_entry(
+    user_id: int,
+    reservation_id: int,
+    node_id: int,
+    reservation_type: str,
+    start_time: str,
+    end_time: str,
+    device_ids: Optional[list] = None,
+    ip_address: Optional[str] = None,
+) -> dict:
+    """Build the audit entry recorded for a reservation creation."""
+    details = {
+        "node_id": node_id,
+        "type": reservation_type,
+        "start_time": start_time,
+        "end_time": end_time,
+    }
+    
+    if device_ids:
+        details["device_ids"] = device_ids
+    
+    return {
+        "user_id": user_id,
+        "action": "create_reservation",
+        "resource_type": "reservation",
+        "resource_id": reservation_id,
+        "details": details,
+        "ip_address": ip_address,
+    }
+
+
 def log_user_login(
     db: Session,
     user_id: int,
@@ -66,6 +141,62 @@ def log_user_login(
     )
 
 
+def log_failed_logins(
+    db: Session,
+    window_start: datetime,
+    window_end: datetime,
+    counts: dict,
+) -> int:
+    """
+    Record failed and throttled login attempts as one summary entry per
+    username for a time window.
+    
+    Args:
+        counts: Attempts keyed by (username, ip_address, "failed" | "throttled")
+    
+    Returns:
+        Number of entries written
+    """
+    summaries: dict[str, dict] = {}
+    for (username, ip_address, kind), attempts in counts.items():
+        summary = summaries.setdefault(
+            username,
+            {
+                "username": username,
+                "failed": 0,
+                "throttled": 0,
+                "ip_addresses": {},
+                "window_start": window_start.isoformat(),
+                "window_end": window_end.isoformat(),
+            },
+        )
+        summary[kind] += attempts
+        summary["ip_addresses"][ip_address] = (
+            summary["ip_addresses"].get(ip_address, 0) + attempts
+        )
+    
+    log_actions(
+        db,
+        [
+            {
+                "user_id": None,
+                "action": "failed_login_summary",
+                "resource_type": "user",
+                "resource_id": None,
+                "details": summary,
+                # Only meaningful when every attempt came from one address
+                "ip_address": (
+                    next(iter(summary["ip_addresses"]))
+                    if len(summary["ip_addresses"]) == 1
+                    else None
+                ),
+            }
+            for summary in summaries.values()
+        ],
+    )
+    return len(summaries)
+
+
 def log_reservation_created(
     db: Session,
     user_id: int,
@@ -78,44 +209,123 @@ def log_reservation_created(
     ip_address: Optional[str] = None,
 ) -> AuditLog:
     """Log reservation creation."""
-    details = {
-        "node_id": node_id,
-        "type": reservation_type,
-        "start_time": start_time,
-        "end_time": end_time,
-    }
-    
-    if device_ids:
-        details["device_ids"] = device_ids
-    
+    return log_action(
+        db=db,
+        **reservation_created_entry(
+            user_id=user_id,
+            reservation_id=reservation_id,
+            node_id=node_id,
+            reservation_type=reservation_type,
+            start_time=start_time,
+            end_time=end_time,
+            device_ids=device_ids,
+            ip_address=ip_address,
+        ),
+    )
+
+
+def log_reservation_deleted(
+    db: Session,
+    user_id: int,
+    reservation_id: int,
+    ip_address: Optional[str] = None,
+) -> AuditLog:
+    """Log reservation deletion/release."""
     return log_action(
         db=db,
         user_id=user_id,
-        action="create_reservation",
+        action="delete_reservation",
         resource_type="reservation",
         resource_id=reservation_id,
-        details=details,
         ip_address=ip_address,
     )
 
 
-def log_reservation_deleted(
+def log_reservation_updated(
     db: Session,
     user_id: int,
     reservation_id: int,
+    before: dict,
+    after: dict,
     ip_address: Optional[str] = None,
 ) -> AuditLog:
-    """Log reservation deletion/release."""
+    """Log an in-place change of a reservation's time range or devices."""
     return log_action(
         db=db,
         user_id=user_id,
-        action="delete_reservation",
+        action="update_reservation",
         resource_type="reservation",
         resource_id=reservation_id,
+        details={"before": before, "after": after},
         ip_address=ip_address,
     )
 
 
+def log_recurring_reservation_created(
+    db: Session,
+    user_id: int,
+    series_id: int,
+    node_id: int,
+    rule: dict,
+    ip_address: Optional[str] = None,
+) -> AuditLog:
+    """Log recurring reservation creation."""
+    return log_action(
+        db=db,
+        user_id=user_id,
+        action="create_recurring_reservation",
+        resource_type="recurring_reservation",
+        resource_id=series_id,
+        details={"node_id": node_id, **rule},
+        ip_address=ip_address,
+    )
+
+
+def log_recurring_reservation_deleted(
+    db: Session,
+    user_id: int,
+    series_id: int,
+    occurrence_start: Optional[str] = None,
+    ip_address: Optional[str] = None,
+) -> AuditLog:
+    """Log deletion of a recurring reservation, or cancellation of one occurrence."""
+    if occurrence_start is None:
+        return log_action(
+            db=db,
+            user_id=user_id,
+            action="delete_recurring_reservation",
+            resource_type="recurring_reservation",
+            resource_id=series_id,
+            ip_address=ip_address,
+        )
+    return log_action(
+        db=db,
+        user_id=user_id,
+        action="cancel_occurrence",
+        resource_type="recurring_reservation",
+        resource_id=series_id,
+        details={"occurrence_start": occurrence_start},
+        ip_address=ip_address,
+    )
+
+
+def ssh_key_created_entry(
+    user_id: int,
+    key_id: int,
+    fingerprint: str,
+    ip_address: Optional[str] = None,
+) -> dict:
+    """Build the audit entry recorded for an SSH key creation."""
+    return {
+        "user_id": user_id,
+        "action": "create_ssh_key",
+        "resource_type": "ssh_key",
+        "resource_id": key_id,
+        "details": {"fingerprint": fingerprint},
+        "ip_address": ip_address,
+    }
+
+
 def log_ssh_key_created(
     db: Session,
     user_id: int,
@@ -124,29 +334,58 @@ def log_ssh_key_created(
     ip_address: Optional[str] = None,
 ) -> AuditLog:
     """Log SSH key creation."""
+    return log_action(db=db, **ssh_key_created_entry(user_id, key_id, fingerprint, ip_address))
+
+
+def log_ssh_key_deleted(
+    db: Session,
+    user_id: int,
+    key_id: int,
+    ip_address: Optional[str] = None,
+) -> AuditLog:
+    """Log SSH key deletion."""
     return log_action(
         db=db,
         user_id=user_id,
-        action="create_ssh_key",
+        action="delete_ssh_key",
         resource_type="ssh_key",
         resource_id=key_id,
-        details={"fingerprint": fingerprint},
         ip_address=ip_address,
     )
 
 
-def log_ssh_key_deleted(
+def log_api_key_created(
     db: Session,
     user_id: int,
     key_id: int,
+    prefix: str,
+    scopes: Optional[list[str]],
     ip_address: Optional[str] = None,
 ) -> AuditLog:
-    """Log SSH key deletion."""
+    """Log API key creation."""
     return log_action(
         db=db,
         user_id=user_id,
-        action="delete_ssh_key",
-        resource_type="ssh_key",
+        action="create_api_key",
+        resource_type="api_key",
+        resource_id=key_id,
+        details={"prefix": prefix, "scopes": scopes},
+        ip_address=ip_address,
+    )
+
+
+def log_api_key_deleted(
+    db: Session,
+    user_id: int,
+    key_id: int,
+    ip_address: Optional[str] = None,
+) -> AuditLog:
+    """Log API key deletion."""
+    return log_action(
+        db=db,
+        user_id=user_id,
+        action="delete_api_key",
+        resource_type="api_key",
         resource_id=key_id,
         ip_address=ip_address,
     )
@@ -189,3 +428,111 @@ def log_device_created(
         details={"node_id": node_id, "device_index": device_index},
         ip_address=ip_address,
     )
+
+
+def _naive_utc(moment: Optional[datetime]) -> Optional[datetime]:
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _archived_entries(
+    filters: dict, after: Optional[Cursor] = None, reverse: bool = False
+) -> Iterator[AuditLogEntry]:
+    """Archived entries matching the filters, oldest first (newest with reverse)."""
+    start_time = filters.get("start_time")
+    end_time = filters.get("end_time")
+    # Members entirely after the cursor can be skipped too
+    bound = end_time
+    if after is not None:
+        after = (_naive_utc(after[0]), after[1])
+        bound = after[0] + timedelta(microseconds=1)
+        if end_time is not None:
+            bound = min(bound, end_time)
+    entries = audit_archive.iter_entries(
+        start_time=start_time,
+        end_time=bound,
+        user_id=filters.get("user_id"),
+        action=filters.get("action"),
+        reverse=reverse,
+    )
+    for raw in entries:
+        entry = AuditLogEntry(**raw)
+        created_at = _naive_utc(entry.created_at)
+        if (
+            any(
+                filters.get(field) is not None and getattr(entry, field) != filters[field]
+                for field in ("user_id", "action", "resource_type", "resource_id")
+            )
+            or (start_time is not None and created_at < start_time)
+            or (end_time is not None and created_at >= end_time)
+            or (after is not None and (created_at, entry.id) >= after)
+        ):
+            continue
+        yield entry
+
+
+def get_audit_logs(
+    db: Session,
+    limit: int = 100,
+    after: Optional[Cursor] = None,
+    include_archived: bool = False,
+    **filters,
+) -> list[Union[AuditLog, AuditLogEntry]]:
+    """
+    Get audit entries matching the filters, newest first.
+    
+    With include_archived, a page that runs out of live entries continues
+    into the archive segments, which hold only older entries, so the same
+    (created_at, id) cursor pages through both.
+    """
+    entries: list = crud_audit.get_audit_logs(db, limit=limit, after=after, **filters)
+    if include_archived and len(entries) < limit:
+        entries += islice(
+            _archived_entries(filters, after=after, reverse=True), limit - len(entries)
+        )
+    return entries
+
+
+def export_audit_logs(
+    db: Session, export_format: str, include_archived: bool = False, **filters
+) -> Iterator[str]:
+    """
+    Render the audit entries matching the filters, oldest first, as NDJSON
+    (one JSON object per line) or CSV (details as a JSON string).
+    
+    Rows are read in AUDIT_EXPORT_BATCH_SIZE batches and rendered one at a
+    time, so a caller streaming the result holds one batch in memory at most.
+    With include_archived, the archived entries come first, one segment
+    member at a time.
+    
+    Raises:
+        ValueError: If the format isn't "ndjson" or "csv"
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {export_format}")
+    rows = crud_audit.iter_audit_logs(
+        db, batch_size=settings.AUDIT_EXPORT_BATCH_SIZE, **filters
+    )
+    if include_archived:
+        rows = chain(_archived_entries(filters), rows)
+    if export_format == "ndjson":
+        return (
+            AuditLogEntry.model_validate(row).model_dump_json() + "\n" for row in rows
+        )
+    return _csv_lines(rows)
+
+
+def _csv_lines(rows: Iterator[Union[AuditLog, AuditLogEntry]]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue()
+    for row in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        entry = AuditLogEntry.model_validate(row).model_dump(mode="json")
+        if entry["details"] is not None:
+            entry["details"] = json.dumps(entry["details"], separators=(",", ":"))
+        writer.writerow(entry[column] for column in EXPORT_COLUMNS)
+        yield buffer.getvalue()
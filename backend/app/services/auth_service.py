@@ -4,74 +4,350 @@ Authentication and user management service.
 import base64
 import binascii
 import hashlib
-from typing import Optional
+import re
+from datetime import timedelta
+from typing import NamedTuple, Optional
 
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from app.core.security import get_password_hash, verify_password
-from app.crud import crud_user
-from app.models.user import User
-from app.schemas.user import SSHKeyCreate, UserCreate
+from app.core.config import settings
+from app.core.rate_limit import (
+    acquire_all,
+    failed_logins,
+    login_ip_limiter,
+    login_username_limiter,
+)
+from app.core.security import (
+    REFRESH_TOKEN_TYPE,
+    api_key_digest,
+    create_access_token,
+    create_refresh_token,
+    decode_token,
+    generate_api_key,
+    get_password_hash,
+    parse_api_key_prefix,
+    verify_api_key,
+    verify_password_async,
+)
+from app.crud import crud_user, token_revocation
+from app.models.user import ApiKey, ApiKeyScope, SSHKey, User
+from app.schemas.user import ApiKeyCreate, SSHKeyCreate, UserCreate
+from app.services import audit_service
 
+# Requests covered by the "reservations" API key scope
+RESERVATIONS_PATH_PREFIX = "/api/v1/reservations"
+# Requests covered by the "node_access" API key scope (GET only)
+NODE_ACCESS_PATH = re.compile(r"/api/v1/nodes/\d+/(authorized_keys|ssh-access)")
 
-def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
-    """Authenticate a user by username and password."""
-    user = crud_user.get_user_by_username(db, username)
+
+def check_login_rate(username: str, ip_address: str) -> float:
+    """
+    Take a login token from the client IP's bucket and the username's bucket,
+    only if both have one.
+
+    Returns:
+        0.0 if the attempt may proceed, otherwise seconds until it may
+    """
+    return acquire_all(
+        (login_ip_limiter, ip_address), (login_username_limiter, username)
+    )
+
+
+def record_failed_login(username: str, ip_address: str, throttled: bool = False) -> None:
+    """Count a failed or throttled attempt towards the next audit summary."""
+    failed_logins.add((username, ip_address), "throttled" if throttled else "failed")
+
+
+def flush_failed_logins(db: Session, force: bool = False) -> int:
+    """
+    Write the failed-login summaries of the last window once it is over.
+
+    Returns:
+        Number of audit entries written
+    """
+    drained = failed_logins.drain(force=force)
+    if drained is None:
+        return 0
+    return audit_service.log_failed_logins(db, *drained)
+
+
+async def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
+    """
+    Authenticate a user by username and password.
+
+    bcrypt runs on the dedicated password hashing pool and database access on
+    the regular threadpool, so a login never blocks the event loop. A hash
+    made with an outdated cost is upgraded after a successful login.
+
+    Raises:
+        PasswordHasherBusy: If the password hashing pool is saturated
+    """
+    user = await run_in_threadpool(crud_user.get_user_by_username, db, username)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = await verify_password_async(password, user.hashed_password)
+    if not valid:
         return None
     if not user.is_active:
         return None
+    if new_hash is not None:
+        await run_in_threadpool(crud_user.update_password_hash, db, user, new_hash)
     return user
 
 
+def issue_tokens(user: User) -> dict:
+    """
+    Create an access/refresh token pair for a user.
+
+    The access token carries the user ID, admin flag and token version, so
+    requests can be authorized from the token alone until it expires.
+    """
+    version = user.token_version or 0
+    access_token = create_access_token(
+        data={
+            "sub": user.username,
+            "uid": user.id,
+            "adm": bool(user.is_admin),
+            "ver": version,
+        },
+        expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
+    )
+    refresh_token = create_refresh_token(
+        data={"sub": user.username, "uid": user.id, "ver": version}
+    )
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }
+
+
+def get_refresh_token_user(db: Session, refresh_token: str) -> Optional[User]:
+    """
+    The user a refresh token was issued to, or None if the token is invalid,
+    expired or revoked, or the user is inactive. Always reads the user row.
+    """
+    payload = decode_token(refresh_token, REFRESH_TOKEN_TYPE)
+    if payload is None or payload.get("uid") is None:
+        return None
+    user = crud_user.get_user(db, payload["uid"])
+    if (
+        user is None
+        or not user.is_active
+        or (user.token_version or 0) != payload.get("ver")
+    ):
+        return None
+    return user
+
+
+def revoke_all_tokens(db: Session, user: User) -> None:
+    """Invalidate every access and refresh token issued to a user."""
+    token_revocation.revoke_tokens(db, user)
+    db.commit()
+
+
 def create_user(db: Session, user_data: UserCreate) -> User:
     """Create a new user with hashed password."""
     hashed_password = get_password_hash(user_data.password)
     return crud_user.create_user(db, user_data, hashed_password)
 
 
-def _is_valid_ssh_public_key(public_key: str) -> bool:
-    parts = public_key.strip().split()
-    if len(parts) < 2:
-        return False
-
-    key_type = parts[0]
-    allowed_types = {
-        "ssh-rsa",
-        "ssh-ed25519",
-        "ecdsa-sha2-nistp256",
-        "ecdsa-sha2-nistp384",
-        "ecdsa-sha2-nistp521",
-        "sk-ssh-ed25519@openssh.com",
-        "sk-ecdsa-sha2-nistp256@openssh.com",
-    }
-    if key_type not in allowed_types:
-        return False
+SSH_KEY_TYPES = {
+    "ssh-rsa",
+    "ssh-ed25519",
+    "ecdsa-sha2-nistp256",
+    "ecdsa-sha2-nistp384",
+    "ecdsa-sha2-nistp521",
+    "sk-ssh-ed25519@openssh.com",
+    "sk-ecdsa-sha2-nistp256@openssh.com",
+}
+
+
+class ParsedSSHKey(NamedTuple):
+    public_key: str  # "<type> <base64> [comment]", without authorized_keys options
+    fingerprint: str  # As printed by ssh-keygen -l, e.g. "SHA256:nThbg6kX..."
 
-    key_body = parts[1]
+
+def parse_ssh_public_key(line: str) -> Optional[ParsedSSHKey]:
+    """
+    Parse a public key or an authorized_keys line (leading options are
+    dropped). Returns None unless the base64 blob decodes and names the same
+    key type as the line.
+    """
+    parts = line.strip().split()
+    # Options such as from="10.0.0.0/8" come before the key type
+    index = next((i for i, part in enumerate(parts) if part in SSH_KEY_TYPES), None)
+    if index is None or index + 1 >= len(parts):
+        return None
+    key_type, key_body = parts[index], parts[index + 1]
     try:
-        padding = "=" * (-len(key_body) % 4)
-        base64.b64decode(key_body + padding, validate=True)
+        blob = base64.b64decode(key_body + "=" * (-len(key_body) % 4), validate=True)
     except (ValueError, binascii.Error, UnicodeEncodeError):
-        return False
+        return None
+    # The blob starts with the key type as a length-prefixed string
+    type_length = int.from_bytes(blob[:4], "big")
+    if blob[4:4 + type_length] != key_type.encode():
+        return None
 
-    return True
+    digest = base64.b64encode(hashlib.sha256(blob).digest()).decode().rstrip("=")
+    return ParsedSSHKey(
+        public_key=" ".join(parts[index:]),
+        fingerprint=f"SHA256:{digest}",
+    )
 
 
 def add_ssh_key(db: Session, user_id: int, key_data: SSHKeyCreate):
-    """Add an SSH key for a user."""
-    if not _is_valid_ssh_public_key(key_data.public_key):
+    """
+    Add an SSH key for a user.
+
+    A key is identified by the fingerprint of its blob, so the same key with
+    another comment is still a duplicate, for this user or any other.
+    """
+    parsed = parse_ssh_public_key(key_data.public_key)
+    if parsed is None:
         raise ValueError("Invalid SSH public key format")
+    if crud_user.get_ssh_key_by_fingerprint(db, parsed.fingerprint) is not None:
+        raise ValueError("SSH key already exists")
+    try:
+        return crud_user.create_ssh_key(
+            db, SSHKeyCreate(public_key=parsed.public_key), user_id, parsed.fingerprint
+        )
+    except IntegrityError:
+        # Registered concurrently; the unique fingerprint constraint caught it
+        db.rollback()
+        raise ValueError("SSH key already exists")
+
+
+def import_ssh_keys(
+    db: Session, user_id: int, authorized_keys: str, ip_address: Optional[str] = None
+) -> tuple[list[SSHKey], list[dict]]:
+    """
+    Add every new key of an authorized_keys file for a user.
+
+    Blank lines and comments are ignored. Invalid lines, repeated keys and
+    keys that are already registered are skipped and reported. The new keys
+    and their audit entries are inserted with batched statements in a single
+    transaction.
+
+    Raises:
+        ValueError: If the file has more than SSH_KEY_IMPORT_MAX_KEYS keys, or
+            a key was registered concurrently (nothing is imported then)
+
+    Returns:
+        (created keys, skipped lines as {"line", "reason"})
+    """
+    entries = [
+        (number, line)
+        for number, line in enumerate(authorized_keys.splitlines(), start=1)
+        if line.strip() and not line.lstrip().startswith("#")
+    ]
+    if len(entries) > settings.SSH_KEY_IMPORT_MAX_KEYS:
+        raise ValueError(f"At most {settings.SSH_KEY_IMPORT_MAX_KEYS} keys can be imported at once")
+
+    skipped = []
+    parsed: dict[str, tuple[int, ParsedSSHKey]] = {}
+    for number, line in entries:
+        key = parse_ssh_public_key(line)
+        if key is None:
+            skipped.append({"line": number, "reason": "Invalid SSH public key format"})
+        elif key.fingerprint in parsed:
+            skipped.append(
+                {"line": number, "reason": f"Same key as line {parsed[key.fingerprint][0]}"}
+            )
+        else:
+            parsed[key.fingerprint] = (number, key)
+
+    existing = crud_user.get_existing_fingerprints(db, list(parsed))
+    new_keys = []
+    for fingerprint, (number, key) in parsed.items():
+        if fingerprint in existing:
+            skipped.append({"line": number, "reason": "SSH key already exists"})
+        else:
+            new_keys.append(key)
+    skipped.sort(key=lambda item: item["line"])
+    if not new_keys:
+        return [], skipped
+
+    try:
+        created = crud_user.add_ssh_keys_bulk(
+            db, [(key.public_key, key.fingerprint) for key in new_keys], user_id
+        )
+        audit_service.log_actions(
+            db,
+            [
+                audit_service.ssh_key_created_entry(
+                    user_id=user_id,
+                    key_id=key.id,
+                    fingerprint=key.fingerprint,
+                    ip_address=ip_address,
+                )
+                for key in created
+            ],
+            commit=False,
+        )
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise ValueError("Some of these SSH keys were registered concurrently, please retry")
+    return created, skipped
+
+
+def create_api_key(db: Session, user_id: int, key_data: ApiKeyCreate) -> tuple[ApiKey, str]:
+    """
+    Create an API key for a user.
+
+    Raises:
+        ValueError: If the user already has API_KEY_MAX_PER_USER keys
+
+    Returns:
+        (stored key, plaintext key); the plaintext is not kept anywhere
+    """
+    if crud_user.count_api_keys(db, user_id) >= settings.API_KEY_MAX_PER_USER:
+        raise ValueError(f"At most {settings.API_KEY_MAX_PER_USER} API keys are allowed")
+    key, prefix = generate_api_key()
+    scopes = (
+        [scope.value for scope in dict.fromkeys(key_data.scopes)]
+        if key_data.scopes
+        else None
+    )
+    api_key = crud_user.create_api_key(
+        db, user_id, key_data.name, prefix, api_key_digest(key), scopes
+    )
+    return api_key, key
+
+
+def authenticate_api_key(db: Session, key: str) -> Optional[ApiKey]:
+    """
+    The API key matching a presented key, with its owner loaded, or None.
+
+    One indexed lookup by prefix and a constant-time digest comparison.
+    Keys of inactive users never match.
+    """
+    prefix = parse_api_key_prefix(key)
+    if prefix is None:
+        return None
+    api_key = crud_user.get_api_key_by_prefix(db, prefix)
+    if api_key is None or not verify_api_key(key, api_key.key_digest):
+        return None
+    return api_key
+
 
-    # Generate fingerprint from public key
-    fingerprint = hashlib.sha256(key_data.public_key.encode()).hexdigest()[:32]
-    
-    # Check if key already exists (by fingerprint)
-    existing_keys = crud_user.get_user_ssh_keys(db, user_id)
-    for key in existing_keys:
-        if key.fingerprint == fingerprint:
-            raise ValueError("SSH key already exists")
-    
-    return crud_user.create_ssh_key(db, key_data, user_id, fingerprint)
+def api_key_allows(api_key: ApiKey, method: str, path: str) -> bool:
+    """Whether an API key's scopes cover a request."""
+    if api_key.scopes is None:
+        return True
+    scopes = set(api_key.scopes)
+    if ApiKeyScope.READ.value in scopes and method in ("GET", "HEAD", "OPTIONS"):
+        return True
+    if (
+        ApiKeyScope.NODE_ACCESS.value in scopes
+        and method == "GET"
+        and NODE_ACCESS_PATH.fullmatch(path)
+    ):
+        return True
+    return ApiKeyScope.RESERVATIONS.value in scopes and path.startswith(
+        RESERVATIONS_PATH_PREFIX
+    )
@@ -0,0 +1,68 @@
+"""
+authorized_keys service - the SSH public keys that may log in to a node now.
+
+A node's file holds the keys of the active users with a reservation, or a
+recurring occurrence, on that node at this moment. Files are built once and
+served from authorized_keys_cache until the next reservation boundary, so
+nodes can poll often and revalidate with the content-derived ETag.
+"""
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud import crud_node, crud_recurring, crud_reservation, crud_user
+from app.crud.authorized_keys_cache import AuthorizedKeys, authorized_keys_cache
+
+
+def get_authorized_keys(db: Session, node_id: int) -> Optional[AuthorizedKeys]:
+    """The node's authorized_keys file, or None if the node doesn't exist."""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return authorized_keys_cache.get(
+        node_id, now, lambda: build_authorized_keys(db, node_id, now)
+    )
+
+
+def build_authorized_keys(
+    db: Session, node_id: int, now: datetime
+) -> Optional[AuthorizedKeys]:
+    """
+    Generate a node's authorized_keys file as of `now` (naive UTC).
+
+    The result is valid until the first reservation boundary after `now`, or
+    for AUTHORIZED_KEYS_MAX_AGE_SECONDS if there is none sooner.
+    """
+    if crud_node.get_node(db, node_id) is None:
+        return None
+    horizon = now + timedelta(seconds=settings.AUTHORIZED_KEYS_MAX_AGE_SECONDS)
+    windows = crud_reservation.get_user_windows(
+        db, node_id, now, horizon
+    ) + crud_recurring.get_occurrence_user_windows(db, node_id, now, horizon)
+
+    user_ids = {user_id for user_id, start, end in windows if start <= now < end}
+    boundaries = [
+        moment for _, start, end in windows for moment in (start, end) if moment > now
+    ]
+
+    # Collapsing whitespace keeps a stored key from spanning several lines
+    keys = tuple(
+        (username, " ".join(public_key.split()), fingerprint)
+        for username, public_key, fingerprint in crud_user.get_authorized_ssh_keys(db, user_ids)
+    )
+    lines = [f"# ServerSentinel authorized_keys for node {node_id}"]
+    previous = None
+    for username, public_key, _ in keys:
+        if username != previous:
+            previous = username
+            lines.append(f"# {username}")
+        lines.append(public_key)
+    body = "\n".join(lines) + "\n"
+
+    return AuthorizedKeys(
+        body=body,
+        etag=f'"{hashlib.sha256(body.encode()).hexdigest()[:32]}"',
+        valid_until=min(boundaries, default=horizon),
+        keys=keys,
+    )
@@ -1,26 +1,76 @@
 """
 Reservation service - handles business logic for resource reservations.
 """
+import bisect
+import time
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Callable, Iterable, Optional, TypeVar
 
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session
 
-from app.crud import crud_node, crud_reservation
+from app.core.config import settings
+from app.core.locks import node_write_locks
+from app.crud import crud_node, crud_recurring, crud_reservation
+from app.crud.recurrence import Recurrence
+from app.crud.reservation_index import as_naive_utc, reservation_index
 from app.models.reservation import ReservationType
-from app.schemas.reservation import ReservationCreate
+from app.schemas.reservation import (
+    PlacementCreate,
+    RecurringReservationCreate,
+    ReservationCreate,
+    ReservationUpdate,
+)
+from app.services import audit_service, scheduling_service
 
+T = TypeVar("T")
 
-def create_reservation(
-    db: Session, reservation_data: ReservationCreate, user_id: int
-):
+
+class ReservationBatchError(ValueError):
+    """Raised when any reservation of a batch cannot be created."""
+
+    def __init__(self, conflicts: list[dict]):
+        super().__init__(f"{len(conflicts)} problem(s) found; no reservations were created")
+        self.conflicts = conflicts
+
+
+def with_node_write_guard(
+    db: Session, node_ids: Iterable[int], operation: Callable[[], T]
+) -> T:
     """
-    Create a reservation with full validation.
-    
-    Validates:
-    - Node exists
-    - Device IDs are valid and belong to the node
-    - No time conflicts exist
+    Run a check-then-write operation while holding the write guard of every
+    given node.
+
+    The guard is the in-process lock stripe of each node plus the database
+    lock from crud_node.lock_nodes_for_update, so writers on the same node are
+    serialized across threads and processes while other nodes proceed in
+    parallel. The operation must commit; on any error the transaction is
+    rolled back. Lock timeouts are retried with exponential backoff.
+    """
+    node_ids = sorted(set(node_ids))
+    retries = settings.RESERVATION_WRITE_RETRIES
+    for attempt in range(retries + 1):
+        # Close any read transaction left open earlier in the request so the
+        # conflict check reads a snapshot taken after the lock is held
+        db.commit()
+        with node_write_locks.hold(*node_ids):
+            try:
+                crud_node.lock_nodes_for_update(db, node_ids)
+                return operation()
+            except OperationalError:
+                db.rollback()
+                if attempt == retries:
+                    raise
+            except BaseException:
+                db.rollback()
+                raise
+        time.sleep(settings.RESERVATION_WRITE_RETRY_BACKOFF_MS / 1000 * 2 ** attempt)
+
+
+def validate_target(db: Session, reservation_data: ReservationCreate) -> list:
+    """
+    Check that the node exists and, for device-level requests, that every
+    device belongs to it. Returns the node's devices.
     """
     # Validate node exists
     node = crud_node.get_node(db, reservation_data.node_id)
@@ -28,6 +78,7 @@ def create_reservation(
         raise ValueError(f"Node with ID {reservation_data.node_id} not found")
     
     # If device-level reservation, validate devices
+    node_devices = []
     if reservation_data.type == ReservationType.DEVICE:
         if not reservation_data.device_ids:
             raise ValueError("Device IDs must be provided for device-level reservations")
@@ -42,9 +93,256 @@ def create_reservation(
                 raise ValueError(
                     f"Device {device_id} does not belong to node {reservation_data.node_id}"
                 )
+    return node_devices
+
+
+def create_reservation(
+    db: Session, reservation_data: ReservationCreate, user_id: int
+):
+    """
+    Create a reservation with full validation.
+    
+    Validates:
+    - Node exists
+    - Device IDs are valid and belong to the node
+    - No time conflicts exist
+    """
+    validate_target(db, reservation_data)
+    
+    # Create the reservation (includes conflict checking) under the node's
+    # write guard so concurrent requests can't both pass the check
+    return with_node_write_guard(
+        db,
+        [reservation_data.node_id],
+        lambda: crud_reservation.create_reservation(db, reservation_data, user_id),
+    )
+
+
+def update_reservation(db: Session, reservation, changes: ReservationUpdate):
+    """
+    Extend, shrink or move a reservation, or add/drop devices, in place.
+    
+    Validates:
+    - The new range is not empty
+    - Devices are only given for device-level reservations, at least one,
+      and all belong to the reservation's node
+    - Ranges and devices the change adds don't conflict
+    """
+    if changes.device_ids is not None:
+        if reservation.type == ReservationType.MACHINE:
+            raise ValueError("Devices can't be changed on a machine-level reservation")
+        if not changes.device_ids:
+            raise ValueError("A device-level reservation needs at least one device")
+        node_device_ids = {
+            device.id for device in crud_node.get_node_devices(db, reservation.node_id)
+        }
+        for device_id in changes.device_ids:
+            if device_id not in node_device_ids:
+                raise ValueError(
+                    f"Device {device_id} does not belong to node {reservation.node_id}"
+                )
+    
+    def update():
+        # Unchanged bounds are read under the guard, after the row was reloaded
+        start_time = changes.start_time or reservation.start_time
+        end_time = changes.end_time or reservation.end_time
+        if as_naive_utc(end_time) <= as_naive_utc(start_time):
+            raise ValueError("end_time must be after start_time")
+        return crud_reservation.update_reservation(
+            db, reservation, start_time, end_time, changes.device_ids
+        )
+    
+    return with_node_write_guard(db, [reservation.node_id], update)
+
+
+def place_reservation(db: Session, placement: PlacementCreate, user_id: int):
+    """
+    Create a reservation on a node chosen by the server.
+    
+    The node and devices come from scheduling_service.choose_placement. The
+    choice is made without holding any lock, so a concurrent writer may take
+    the chosen devices first; in that case the placement is recomputed from
+    the updated occupancy, up to PLACEMENT_MAX_ATTEMPTS times.
+    
+    Raises:
+        ValueError: If no node can host the request
+    """
+    for attempt in range(settings.PLACEMENT_MAX_ATTEMPTS):
+        choice = scheduling_service.choose_placement(
+            db,
+            placement.start_time,
+            placement.end_time,
+            reservation_type=placement.type,
+            device_count=placement.device_count,
+            model_name=placement.model_name,
+        )
+        if choice is None:
+            raise ValueError("No node has enough free capacity for the requested window")
+        try:
+            return create_reservation(
+                db,
+                ReservationCreate(
+                    node_id=choice["node_id"],
+                    start_time=placement.start_time,
+                    end_time=placement.end_time,
+                    type=placement.type,
+                    device_ids=choice["device_ids"] or None,
+                ),
+                user_id,
+            )
+        except ValueError:
+            if attempt == settings.PLACEMENT_MAX_ATTEMPTS - 1:
+                raise
+
+
+def create_recurring_reservation(
+    db: Session, series_data: RecurringReservationCreate, user_id: int
+):
+    """
+    Create a recurring reservation.
+    
+    The series is checked as a unit: every occurrence is compared with the
+    existing reservations and the occurrences of other series on the node,
+    and the whole series is rejected if any occurrence conflicts.
+    """
+    node_devices = validate_target(db, series_data)
+    recurrence = Recurrence(
+        series_data.start_time,
+        series_data.end_time,
+        series_data.frequency,
+        series_data.interval,
+        series_data.by_weekday,
+        series_data.until,
+        series_data.count,
+    )
+    last = recurrence.last()
+    if last is None:
+        raise ValueError("The recurrence rule yields no occurrences")
+    if last[0] + 1 > settings.RECURRING_MAX_OCCURRENCES:
+        raise ValueError(
+            f"A recurring reservation may have at most "
+            f"{settings.RECURRING_MAX_OCCURRENCES} occurrences"
+        )
+    
+    wanted = set(series_data.device_ids or [])
+    devices = [device for device in node_devices if device.id in wanted]
+    
+    def insert():
+        conflict = _find_series_conflict(db, series_data, recurrence, last[1])
+        if conflict is not None:
+            raise ValueError(conflict)
+        return crud_recurring.create_recurring_reservation(
+            db, series_data, user_id, recurrence, devices
+        )
+    
+    return with_node_write_guard(db, [series_data.node_id], insert)
+
+
+def get_occurrences(
+    db: Session,
+    series,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> list[dict]:
+    """
+    Expand the occurrences of a series, optionally only inside a window.
+    
+    Cancelled occurrences are included and flagged.
+    
+    Returns:
+        List of dicts matching the ReservationOccurrence schema
+    """
+    recurrence = Recurrence.of(series)
+    cancelled = crud_recurring.get_cancelled_occurrences(db, series.id)
+    return [
+        {
+            "start_time": occurrence,
+            "end_time": occurrence + recurrence.duration,
+            "cancelled": occurrence in cancelled,
+        }
+        for occurrence in recurrence.occurrences(start_time, end_time)
+    ]
+
+
+def cancel_occurrence(db: Session, series, occurrence_start: datetime) -> bool:
+    """
+    Cancel a single occurrence of a series, freeing its time slot.
+    
+    Raises:
+        ValueError: If the series has no occurrence starting at that time
+    
+    Returns:
+        False if the occurrence was already cancelled
+    """
+    occurrence_start = as_naive_utc(occurrence_start)
+    recurrence = Recurrence.of(series)
+    window_end = occurrence_start + recurrence.duration
+    if occurrence_start not in recurrence.occurrences(occurrence_start, window_end):
+        raise ValueError(f"No occurrence starts at {occurrence_start.isoformat()}")
+    return crud_recurring.cancel_occurrence(db, series.id, occurrence_start)
+
+
+def _find_series_conflict(
+    db: Session,
+    series_data: RecurringReservationCreate,
+    recurrence: Recurrence,
+    last_start: datetime,
+) -> Optional[str]:
+    """
+    Describe the first occurrence of a new series that conflicts with the
+    node's reservations or other series, or return None.
+
+    Existing intervals in the series' span are read once and grouped per
+    (device | machine) key; each occurrence is then a bisect plus a prefix-max
+    lookup per key.
+    """
+    node_id = series_data.node_id
+    window_start, window_end = recurrence.start, last_start + recurrence.duration
+    existing = [
+        (start, end, key, ("reservation", ref))
+        for start, end, key, ref in crud_reservation.get_node_intervals(
+            db, [node_id], window_start, window_end
+        )[node_id]
+    ]
+    existing.extend(
+        (start, end, key, ("recurring reservation", ref))
+        for start, end, key, ref in crud_recurring.get_occurrence_intervals(
+            db, [node_id], window_start, window_end
+        )[node_id]
+    )
+    
+    by_key: dict[Optional[int], list] = {}
+    for item in sorted(existing, key=lambda item: item[0]):
+        by_key.setdefault(item[2], []).append(item)
+    if series_data.type == ReservationType.MACHINE:
+        keys = list(by_key)
+    else:
+        keys = [key for key in [None, *dict.fromkeys(series_data.device_ids)] if key in by_key]
+    
+    lookups = []
+    for key in keys:
+        items = by_key[key]
+        starts = [item[0] for item in items]
+        reach, furthest = [], None
+        for item in items:
+            furthest = item[1] if furthest is None or item[1] > furthest else furthest
+            reach.append(furthest)
+        lookups.append((items, starts, reach))
     
-    # Create the reservation (includes conflict checking)
-    return crud_reservation.create_reservation(db, reservation_data, user_id)
+    for occurrence in recurrence.occurrences():
+        occurrence_end = occurrence + recurrence.duration
+        for items, starts, reach in lookups:
+            i = bisect.bisect_left(starts, occurrence_end)
+            if i == 0 or reach[i - 1] <= occurrence:
+                continue
+            while items[i - 1][1] <= occurrence:
+                i -= 1
+            kind, ref = items[i - 1][3]
+            return (
+                f"Recurring reservation conflict: occurrence at {occurrence.isoformat()} "
+                f"overlaps existing {kind} ID: {ref}"
+            )
+    return None
 
 
 def get_active_reservations(db: Session, node_id: Optional[int] = None):
@@ -59,3 +357,159 @@ def get_active_reservations(db: Session, node_id: Optional[int] = None):
         List of active reservations
     """
     return crud_reservation.get_active_reservations(db, node_id)
+
+
+def _overlapping(intervals: list[tuple], start: datetime, end: datetime) -> list:
+    return [ref for s, e, ref in intervals if s < end and e > start]
+
+
+def create_reservations_batch(
+    db: Session,
+    reservations: list[ReservationCreate],
+    user_id: int,
+    ip_address: Optional[str] = None,
+):
+    """
+    Create many reservations atomically.
+    
+    Every request is validated against the store and against the other
+    requests of the batch before anything is written. If any problem is found,
+    ReservationBatchError lists all of them and nothing is created. Otherwise
+    reservations, device associations and audit entries are inserted with
+    batched statements in a single transaction. The write guards of all
+    involved nodes are held from the conflict check until the commit.
+    """
+    if len(reservations) > settings.RESERVATION_BATCH_MAX_SIZE:
+        raise ValueError(
+            f"A batch may contain at most {settings.RESERVATION_BATCH_MAX_SIZE} reservations"
+        )
+
+    created_ids = with_node_write_guard(
+        db,
+        {item.node_id for item in reservations},
+        lambda: _insert_batch(db, reservations, user_id, ip_address),
+    )
+
+    # Reload everything (with devices) in two queries instead of one refresh
+    # per expired instance
+    created = crud_reservation.get_reservations_by_ids(db, created_ids)
+    for reservation in created:
+        reservation_index.add(reservation)
+    return created
+
+
+def _insert_batch(
+    db: Session,
+    reservations: list[ReservationCreate],
+    user_id: int,
+    ip_address: Optional[str],
+) -> list[int]:
+    conflicts: list[dict] = []
+
+    def report(index: int, detail: str, reservation_id=None, batch_index=None):
+        conflicts.append(
+            {
+                "index": index,
+                "detail": detail,
+                "reservation_id": reservation_id,
+                "batch_index": batch_index,
+            }
+        )
+
+    node_ids = sorted({item.node_id for item in reservations})
+    known_nodes = {node.id for node in crud_node.get_nodes_by_ids(db, node_ids)}
+    devices_by_id = {
+        device.id: device for device in crud_node.get_devices_for_nodes(db, node_ids)
+    }
+
+    # Validate the shape of every request
+    valid = []
+    for index, item in enumerate(reservations):
+        if item.node_id not in known_nodes:
+            report(index, f"Node with ID {item.node_id} not found")
+            continue
+        if item.type == ReservationType.DEVICE:
+            if not item.device_ids:
+                report(index, "Device IDs must be provided for device-level reservations")
+                continue
+            foreign = [
+                device_id
+                for device_id in item.device_ids
+                if device_id not in devices_by_id
+                or devices_by_id[device_id].node_id != item.node_id
+            ]
+            if foreign:
+                report(index, f"Devices {foreign} do not belong to node {item.node_id}")
+                continue
+        valid.append(index)
+
+    # Check against the store and against each other, one interval list per
+    # (node, device) plus one per node for machine-level reservations
+    if valid:
+        window_start = min(as_naive_utc(reservations[i].start_time) for i in valid)
+        window_end = max(as_naive_utc(reservations[i].end_time) for i in valid)
+        stored = crud_reservation.get_node_intervals(
+            db, sorted({reservations[i].node_id for i in valid}), window_start, window_end
+        )
+        busy: dict[int, dict] = {}
+        for node_id, intervals in stored.items():
+            lists = busy[node_id] = {}
+            for start, end, device_id, reservation_id in intervals:
+                lists.setdefault(device_id, []).append((start, end, ("store", reservation_id)))
+        occurrences = crud_recurring.get_occurrence_intervals(
+            db, list(stored), window_start, window_end
+        )
+        for node_id, intervals in occurrences.items():
+            lists = busy[node_id]
+            for start, end, device_id, series_id in intervals:
+                lists.setdefault(device_id, []).append((start, end, ("series", series_id)))
+
+        for index in valid:
+            item = reservations[index]
+            start, end = as_naive_utc(item.start_time), as_naive_utc(item.end_time)
+            lists = busy[item.node_id]
+            if item.type == ReservationType.MACHINE:
+                keys = list(lists)
+            else:
+                keys = [None] + list(dict.fromkeys(item.device_ids))
+
+            hits = {}
+            for key in keys:
+                for ref in _overlapping(lists.get(key, []), start, end):
+                    hits[ref] = None
+            for kind, ref in hits:
+                if kind == "store":
+                    report(index, f"Conflicts with existing reservation ID: {ref}", reservation_id=ref)
+                elif kind == "series":
+                    report(index, f"Conflicts with recurring reservation ID: {ref}")
+                else:
+                    report(index, f"Conflicts with batch item {ref}", batch_index=ref)
+
+            own_key = [None] if item.type == ReservationType.MACHINE else keys[1:]
+            for key in own_key:
+                lists.setdefault(key, []).append((start, end, ("batch", index)))
+
+    if conflicts:
+        raise ReservationBatchError(conflicts)
+
+    created = crud_reservation.add_reservations_bulk(db, reservations, user_id, devices_by_id)
+    audit_service.log_actions(
+        db,
+        [
+            audit_service.reservation_created_entry(
+                user_id=user_id,
+                reservation_id=reservation.id,
+                node_id=reservation.node_id,
+                reservation_type=reservation.type.value,
+                start_time=item.start_time.isoformat(),
+                end_time=item.end_time.isoformat(),
+                device_ids=item.device_ids,
+                ip_address=ip_address,
+            )
+            for reservation, item in zip(created, reservations)
+        ],
+        commit=False,
+    )
+    created_ids = [reservation.id for reservation in created]
+    db.commit()
+    return created_ids
@@ -0,0 +1,285 @@
+"""
+Scheduling service - searches for free reservation windows across the fleet.
+
+All searches work on sorted reservation boundaries: busy intervals are merged
+per device, turned into ranges of feasible start times, and a single sweep
+over those range boundaries finds the earliest instant where enough devices
+are simultaneously free. No trial inserts or per-slot probing are involved.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Hashable, Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud import crud_node, crud_recurring, crud_reservation
+from app.crud.reservation_index import as_naive_utc
+from app.models.reservation import ReservationType
+
+Interval = tuple[datetime, datetime]
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> list[Interval]:
+    """Merge overlapping or touching intervals into a sorted, disjoint list."""
+    merged: list[list[datetime]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def feasible_starts(
+    busy: Iterable[Interval],
+    horizon_start: datetime,
+    horizon_end: datetime,
+    duration: timedelta,
+) -> list[Interval]:
+    """
+    Closed ranges [earliest, latest] of start times at which a window of the
+    given duration fits between busy intervals and inside the horizon.
+    """
+    ranges = []
+    cursor = horizon_start
+    for start, end in merge_intervals(busy):
+        if end <= cursor:
+            continue
+        if start - cursor >= duration:
+            ranges.append((cursor, start - duration))
+        cursor = max(cursor, end)
+        if cursor >= horizon_end:
+            return ranges
+    if horizon_end - cursor >= duration:
+        ranges.append((cursor, horizon_end - duration))
+    return ranges
+
+
+def earliest_common_start(
+    ranges_by_resource: dict[Hashable, list[Interval]], required: int
+) -> Optional[tuple[datetime, list[Hashable]]]:
+    """
+    Sweep over feasible-start ranges and return the earliest instant covered by
+    at least `required` resources, together with the resources covering it.
+    """
+    if required <= 0 or len(ranges_by_resource) < required:
+        return None
+    events = []
+    for resource, ranges in ranges_by_resource.items():
+        for earliest, latest in ranges:
+            # Opening events sort before closing ones at the same instant,
+            # because the ranges are closed on both ends.
+            events.append((earliest, 0, resource))
+            events.append((latest, 1, resource))
+    events.sort(key=lambda event: (event[0], event[1]))
+
+    active: dict[Hashable, None] = {}
+    for moment, kind, resource in events:
+        if kind == 0:
+            active[resource] = None
+            if len(active) >= required:
+                return moment, list(active)[:required]
+        else:
+            active.pop(resource, None)
+    return None
+
+
+def _inventory(db: Session, model_name: Optional[str]) -> dict[int, dict]:
+    """Devices per node from one inventory query; 'matching' honours model_name."""
+    nodes: dict[int, dict] = {}
+    for device in crud_node.get_device_inventory(db):
+        node = nodes.setdefault(
+            device.node_id, {"name": device.node_name, "devices": [], "matching": []}
+        )
+        node["devices"].append(device.id)
+        if model_name is None or device.model_name == model_name:
+            node["matching"].append(device.id)
+    return nodes
+
+
+def _busy_intervals(
+    db: Session, node_ids: list[int], start_time: datetime, end_time: datetime
+) -> dict[int, list[tuple[datetime, datetime, Optional[int], int]]]:
+    """Reservations and recurring occurrences overlapping a window, per node."""
+    node_intervals = crud_reservation.get_node_intervals(db, node_ids, start_time, end_time)
+    for node_id, items in crud_recurring.get_occurrence_intervals(
+        db, node_ids, start_time, end_time
+    ).items():
+        node_intervals[node_id].extend(items)
+    return node_intervals
+
+
+def find_free_slots(
+    db: Session,
+    duration: timedelta,
+    reservation_type: ReservationType = ReservationType.DEVICE,
+    device_count: int = 1,
+    model_name: Optional[str] = None,
+    earliest_start: Optional[datetime] = None,
+    horizon_days: int = 30,
+    limit: int = 5,
+) -> list[dict]:
+    """
+    Find the earliest windows where a reservation of the given shape fits.
+
+    Returns at most one candidate per node, ordered by start time.
+
+    Args:
+        db: Database session
+        duration: Length of the requested window
+        reservation_type: MACHINE for a whole node, DEVICE for device_count devices
+        device_count: Number of devices needed (device reservations only)
+        model_name: Only consider devices (or nodes having devices) of this model
+        earliest_start: Do not propose windows before this time (default: now)
+        horizon_days: How far ahead to search
+        limit: Maximum number of candidates to return
+
+    Returns:
+        List of dicts matching the SlotCandidate schema
+    """
+    if duration <= timedelta(0):
+        raise ValueError("Duration must be positive")
+    if horizon_days > settings.SLOT_SEARCH_MAX_HORIZON_DAYS:
+        raise ValueError(
+            f"Horizon may not exceed {settings.SLOT_SEARCH_MAX_HORIZON_DAYS} days"
+        )
+    if reservation_type == ReservationType.DEVICE and device_count < 1:
+        raise ValueError("device_count must be at least 1")
+
+    horizon_start = as_naive_utc(earliest_start or datetime.now(timezone.utc))
+    horizon_end = horizon_start + timedelta(days=horizon_days)
+
+    nodes = _inventory(db, model_name)
+    if reservation_type == ReservationType.MACHINE:
+        candidates_nodes = [node_id for node_id, node in nodes.items() if node["matching"]]
+    else:
+        candidates_nodes = [
+            node_id for node_id, node in nodes.items() if len(node["matching"]) >= device_count
+        ]
+
+    node_intervals = _busy_intervals(db, candidates_nodes, horizon_start, horizon_end)
+
+    candidates = []
+    for node_id in candidates_nodes:
+        node = nodes[node_id]
+        intervals = node_intervals[node_id]
+        if reservation_type == ReservationType.MACHINE:
+            ranges = feasible_starts(
+                ((start, end) for start, end, _, _ in intervals),
+                horizon_start,
+                horizon_end,
+                duration,
+            )
+            found = (ranges[0][0], node["devices"]) if ranges else None
+        else:
+            machine_busy = [
+                (start, end) for start, end, device_id, _ in intervals if device_id is None
+            ]
+            device_busy: dict[int, list[Interval]] = {
+                device_id: list(machine_busy) for device_id in node["matching"]
+            }
+            for start, end, device_id, _ in intervals:
+                if device_id in device_busy:
+                    device_busy[device_id].append((start, end))
+            found = earliest_common_start(
+                {
+                    device_id: feasible_starts(busy, horizon_start, horizon_end, duration)
+                    for device_id, busy in device_busy.items()
+                },
+                device_count,
+            )
+        if found is not None:
+            start, device_ids = found
+            candidates.append(
+                {
+                    "node_id": node_id,
+                    "node_name": node["name"],
+                    "type": reservation_type,
+                    "start_time": start,
+                    "end_time": start + duration,
+                    "device_ids": (
+                        sorted(device_ids) if reservation_type == ReservationType.DEVICE else []
+                    ),
+                }
+            )
+
+    candidates.sort(key=lambda candidate: (candidate["start_time"], candidate["node_id"]))
+    return candidates[:limit]
+
+
+def choose_placement(
+    db: Session,
+    start_time: datetime,
+    end_time: datetime,
+    reservation_type: ReservationType = ReservationType.DEVICE,
+    device_count: int = 1,
+    model_name: Optional[str] = None,
+) -> Optional[dict]:
+    """
+    Pick the node (and devices) for a reservation with a best-fit policy.
+
+    Occupancy of the window comes from one inventory query plus the bulk
+    interval lookup (in-memory index where fresh), so the cost does not grow
+    with one query per node.
+
+    Device requests go to the node that would have the fewest devices left
+    free afterwards, preferring nodes that are already partly in use, so
+    small jobs fill the gaps of busy nodes and whole nodes stay free for
+    large ones. The lowest-indexed free devices are taken. Machine requests
+    go to the smallest completely free node with at least device_count
+    devices.
+
+    Returns:
+        Dict matching the SlotCandidate schema, or None if nothing fits
+    """
+    start, end = as_naive_utc(start_time), as_naive_utc(end_time)
+    if end <= start:
+        raise ValueError("end_time must be after start_time")
+    if device_count < 1:
+        raise ValueError("device_count must be at least 1")
+
+    nodes = _inventory(db, model_name)
+    candidates_nodes = [
+        node_id
+        for node_id, node in nodes.items()
+        if node["matching"]
+        and len(node["matching" if reservation_type == ReservationType.DEVICE else "devices"])
+        >= device_count
+    ]
+    node_intervals = _busy_intervals(db, candidates_nodes, start, end)
+
+    best_key, best = None, None
+    for node_id in candidates_nodes:
+        node = nodes[node_id]
+        busy_devices = set()
+        for _, _, device_id, _ in node_intervals[node_id]:
+            if device_id is None:
+                busy_devices = set(node["devices"])
+                break
+            busy_devices.add(device_id)
+
+        if reservation_type == ReservationType.MACHINE:
+            if busy_devices:
+                continue
+            key = (len(node["devices"]), node_id)
+            device_ids = []
+        else:
+            free = [d for d in node["matching"] if d not in busy_devices]
+            if len(free) < device_count:
+                continue
+            left_free = len(node["devices"]) - len(busy_devices) - device_count
+            key = (left_free, not busy_devices, node_id)
+            device_ids = free[:device_count]
+
+        if best_key is None or key < best_key:
+            best_key = key
+            best = {
+                "node_id": node_id,
+                "node_name": node["name"],
+                "type": reservation_type,
+                "start_time": start,
+                "end_time": end,
+                "device_ids": device_ids,
+            }
+    return best
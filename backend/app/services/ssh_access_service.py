@@ -0,0 +1,169 @@
+"""
+SSH access feed - versioned grant/revoke deltas of who may log in to a node.
+
+The feed is derived from the node's authorized_keys set (see
+authorized_keys_service) rather than from each kind of write: whenever that
+set is rebuilt, it is compared with the grants last published for the node
+and the difference is written as events. Keys being added or removed, users
+being deactivated and reservations starting or ending all show up the same
+way. Event IDs are the versions node agents resume from.
+
+Long-polls wait for a local change of the node (access_changes), the next
+reservation boundary of the node or their timeout, whichever comes first.
+Changes made by other processes are picked up within
+AUTHORIZED_KEYS_MAX_AGE_SECONDS.
+"""
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.crud import crud_ssh_access
+from app.crud.authorized_keys_cache import AuthorizedKeys, access_changes
+from app.services import authorized_keys_service
+from app.services.reservation_service import with_node_write_guard
+
+# node_id -> the AuthorizedKeys entry last compared with the published grants.
+# Identity, not equality: every rebuilt entry is compared again, which also
+# catches grants published meanwhile by another process.
+_synced: dict[int, AuthorizedKeys] = {}
+_synced_lock = threading.Lock()
+
+
+def sync_node(db: Session, node_id: int) -> Optional[AuthorizedKeys]:
+    """
+    Publish the difference between a node's authorized keys and its grants.
+
+    Returns:
+        The node's current authorized keys, or None if the node doesn't exist
+    """
+    current = authorized_keys_service.get_authorized_keys(db, node_id)
+    if current is None:
+        return None
+    with _synced_lock:
+        if _synced.get(node_id) is current:
+            return current
+
+    # Most rebuilds change nothing the node sees; only take the write guard
+    # (on SQLite, the database-wide write lock) when there is something to append
+    if any(_diff(db, node_id, current)):
+
+        def publish() -> int:
+            granted, revoked = _diff(db, node_id, current)
+            if not granted and not revoked:
+                db.commit()
+                return 0
+            return crud_ssh_access.record_changes(db, node_id, granted, revoked)
+
+        with_node_write_guard(db, [node_id], publish)
+    with _synced_lock:
+        _synced[node_id] = current
+    return current
+
+
+def _diff(db: Session, node_id: int, current: AuthorizedKeys) -> tuple[list, list]:
+    """Keys to grant and grants to revoke so the grants match the authorized keys."""
+    grants = {grant.fingerprint: grant for grant in crud_ssh_access.get_grants(db, node_id)}
+    wanted = {key[2]: key for key in current.keys}
+    revoked = [
+        grant
+        for fingerprint, grant in grants.items()
+        if fingerprint not in wanted
+        or (grant.username, grant.public_key) != wanted[fingerprint][:2]
+    ]
+    revoked_fingerprints = {grant.fingerprint for grant in revoked}
+    granted = [
+        key
+        for fingerprint, key in wanted.items()
+        if fingerprint not in grants or fingerprint in revoked_fingerprints
+    ]
+    return granted, revoked
+
+
+def clear_sync_state() -> None:
+    """Forget which authorized keys were compared, so the next poll re-checks."""
+    with _synced_lock:
+        _synced.clear()
+
+
+def get_changes(db: Session, node_id: int, since: Optional[int]) -> Optional[dict]:
+    """
+    The node's changes after version `since`, or the full set of current
+    grants if since is None. Ends the session's transaction, so a waiting
+    long-poll holds no database connection.
+
+    Returns:
+        None if the node doesn't exist, otherwise a dict with node_id,
+        version, full, changes and valid_until (when to look again)
+    """
+    try:
+        current = sync_node(db, node_id)
+        if current is None:
+            return None
+        if since is None:
+            changes = [
+                {
+                    "version": grant.version,
+                    "action": "grant",
+                    "username": grant.username,
+                    "fingerprint": grant.fingerprint,
+                    "public_key": grant.public_key,
+                }
+                for grant in crud_ssh_access.get_grants(db, node_id)
+            ]
+            version = crud_ssh_access.get_latest_version(db, node_id)
+        else:
+            changes = [
+                {
+                    "version": event.id,
+                    "action": event.action.value,
+                    "username": event.username,
+                    "fingerprint": event.fingerprint,
+                    "public_key": event.public_key,
+                }
+                for event in crud_ssh_access.get_events(
+                    db, node_id, since, limit=settings.SSH_ACCESS_MAX_CHANGES
+                )
+            ]
+            version = changes[-1]["version"] if changes else since
+    finally:
+        db.commit()
+    return {
+        "node_id": node_id,
+        "version": version,
+        "full": since is None,
+        "changes": changes,
+        "valid_until": current.valid_until,
+    }
+
+
+async def wait_for_changes(
+    db: Session, node_id: int, since: Optional[int], timeout: float
+) -> Optional[dict]:
+    """
+    Long-poll: return as soon as the node has changes after `since`, or with
+    no changes once `timeout` seconds have passed. A full snapshot (since is
+    None) is returned right away.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        # Subscribe before looking, so a change in between still wakes us
+        woken = access_changes.subscribe(node_id)
+        try:
+            delta = await run_in_threadpool(get_changes, db, node_id, since)
+            remaining = deadline - time.monotonic()
+            if delta is None or delta["changes"] or delta["full"] or remaining <= 0:
+                return delta
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            boundary = (delta["valid_until"] - now).total_seconds()
+            try:
+                await asyncio.wait_for(woken.wait(), max(0.0, min(remaining, boundary)))
+            except asyncio.TimeoutError:
+                pass
+        finally:
+            access_changes.unsubscribe(woken)
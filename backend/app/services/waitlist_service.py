@@ -0,0 +1,193 @@
+"""
+Waitlist service - queues rejected reservation requests and allocates them
+when capacity is released.
+
+Allocation is event-driven: whenever a reservation, an occurrence or a series
+is released, on_capacity_released looks only at the waiting entries on that
+node whose window overlaps the freed range, in priority/FIFO order, and turns
+every one that now fits into a reservation.
+
+All entries of a release are decided in one pass under the node's write
+guard: each is checked with the cheap conflict lookups only (no conflict
+report), and the reservations are inserted in a single transaction. Entries
+that can never be placed - their window has started, or their node or one
+of their devices is gone - are expired instead of waiting forever.
+"""
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud import crud_node, crud_recurring, crud_reservation, crud_waitlist
+from app.crud.reservation_index import as_naive_utc, reservation_index
+from app.models.reservation import ReservationType
+from app.models.waitlist import WaitlistEntry, WaitlistStatus
+from app.schemas.reservation import ReservationCreate
+from app.services import audit_service, reservation_service
+
+
+def join_waitlist(
+    db: Session,
+    request: ReservationCreate,
+    user_id: int,
+    priority: int = 0,
+) -> WaitlistEntry:
+    """
+    Try to reserve right away and queue the request if the window is taken.
+
+    Raises:
+        ValueError: If the request itself is invalid (unknown node, foreign
+            devices, window in the past) or the user has too many entries
+
+    Returns:
+        The entry, already ALLOCATED if the reservation could be made
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    if as_naive_utc(request.end_time) <= as_naive_utc(request.start_time):
+        raise ValueError("end_time must be after start_time")
+    if as_naive_utc(request.start_time) <= now:
+        raise ValueError("Only future windows can be waitlisted")
+    if crud_waitlist.count_waiting(db, user_id) >= settings.WAITLIST_MAX_ENTRIES_PER_USER:
+        raise ValueError(
+            f"At most {settings.WAITLIST_MAX_ENTRIES_PER_USER} waitlist entries may be waiting"
+        )
+    # Anything that fails after this is a conflict, which is what the queue is for
+    reservation_service.validate_target(db, request)
+
+    entry = crud_waitlist.create_entry(db, request, user_id, priority)
+    _allocate(db, entry.node_id, lambda: [crud_waitlist.get_entry(db, entry.id)])
+    return entry
+
+
+def on_capacity_released(
+    db: Session, node_id: int, start_time: datetime, end_time: datetime
+) -> list[WaitlistEntry]:
+    """
+    Allocate waiting entries that may fit into a freed window.
+
+    Only entries on the node whose window overlaps [start_time, end_time) are
+    considered, highest priority first and FIFO within a priority. Entries
+    whose window has already started, or whose node or devices are gone, are
+    expired instead.
+
+    Returns:
+        Entries that were turned into reservations
+    """
+    # Most releases have nobody waiting; don't take the write guard for them
+    if not crud_waitlist.get_waiting_entries(db, node_id, start_time, end_time):
+        return []
+    return _allocate(
+        db,
+        node_id,
+        lambda: crud_waitlist.get_waiting_entries(db, node_id, start_time, end_time),
+    )
+
+
+def get_queue_position(db: Session, entry: WaitlistEntry) -> Optional[int]:
+    """Position of an entry in its queue, or None once it is no longer waiting."""
+    if entry.status != WaitlistStatus.WAITING:
+        return None
+    return crud_waitlist.get_queue_position(db, entry)
+
+
+def _allocate(db: Session, node_id: int, load_entries) -> list[WaitlistEntry]:
+    """
+    Turn the waiting entries returned by load_entries, in order, into
+    reservations where they fit, under the node's write guard.
+
+    Returns:
+        Entries that were turned into reservations
+    """
+    allocated = reservation_service.with_node_write_guard(
+        db, [node_id], lambda: _allocate_locked(db, node_id, load_entries())
+    )
+    # Index the new reservations once they are committed
+    for reservation in crud_reservation.get_reservations_by_ids(
+        db, [entry.reservation_id for entry in allocated]
+    ):
+        reservation_index.add(reservation)
+    return allocated
+
+
+def _allocate_locked(
+    db: Session, node_id: int, entries: list[WaitlistEntry]
+) -> list[WaitlistEntry]:
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    node = crud_node.get_node(db, node_id)
+    devices_by_id = (
+        {device.id: device for device in crud_node.get_node_devices(db, node_id)}
+        if node is not None
+        else {}
+    )
+
+    placed: list[tuple[WaitlistEntry, ReservationCreate]] = []
+    for entry in entries:
+        if entry is None or entry.status != WaitlistStatus.WAITING:
+            continue
+        unplaceable = (
+            entry.start_time <= now
+            or node is None
+            or (
+                entry.type == ReservationType.DEVICE
+                and (
+                    not entry.device_ids
+                    or any(device_id not in devices_by_id for device_id in entry.device_ids)
+                )
+            )
+        )
+        if unplaceable:
+            crud_waitlist.resolve_entry(db, entry, WaitlistStatus.EXPIRED, commit=False)
+            continue
+        request = ReservationCreate(
+            node_id=entry.node_id,
+            start_time=entry.start_time,
+            end_time=entry.end_time,
+            type=entry.type,
+            device_ids=entry.device_ids,
+        )
+        # Nothing is flushed before the end, so entries placed earlier in this
+        # pass are checked here rather than by the store lookups
+        if any(_overlaps(request, other) for _, other in placed):
+            continue
+        if crud_reservation.check_conflict(
+            db, node_id, request.start_time, request.end_time, request.device_ids
+        ) is not None:
+            continue
+        if crud_recurring.find_conflicting_series_id(
+            db, node_id, request.start_time, request.end_time, request.device_ids
+        ) is not None:
+            continue
+        placed.append((entry, request))
+
+    audit_entries = []
+    for entry, request in placed:
+        [reservation] = crud_reservation.add_reservations_bulk(
+            db, [request], entry.user_id, devices_by_id
+        )
+        crud_waitlist.resolve_entry(
+            db, entry, WaitlistStatus.ALLOCATED, reservation.id, commit=False
+        )
+        audit_entry = audit_service.reservation_created_entry(
+            user_id=entry.user_id,
+            reservation_id=reservation.id,
+            node_id=node_id,
+            reservation_type=request.type.value,
+            start_time=request.start_time.isoformat(),
+            end_time=request.end_time.isoformat(),
+            device_ids=request.device_ids,
+        )
+        audit_entry["details"]["waitlist_entry_id"] = entry.id
+        audit_entries.append(audit_entry)
+    audit_service.log_actions(db, audit_entries, commit=False)
+    db.commit()
+    return [entry for entry, _ in placed]
+
+
+def _overlaps(request: ReservationCreate, other: ReservationCreate) -> bool:
+    """Whether two requests on the same node would conflict with each other."""
+    if request.start_time >= other.end_time or other.start_time >= request.end_time:
+        return False
+    if ReservationType.MACHINE in (request.type, other.type):
+        return True
+    return not set(request.device_ids).isdisjoint(other.device_ids)
@@ -0,0 +1,62 @@
+"""
+Audit log retention script.
+
+Moves audit entries older than N days from the audit_logs table into
+compressed monthly archive segments (AUDIT_ARCHIVE_DIR), in small batches, so
+it can run while the API is serving requests. Schedule it (e.g. nightly with
+cron) to keep the live table at a fixed size; archived entries stay
+readable with include_archived=true on the audit log API.
+
+Usage:
+    python scripts/archive_audit_logs.py [--days 90] [--batch-size 1000]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.audit_segments import audit_archive
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services import audit_retention_service
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Archive old audit log entries.")
+    parser.add_argument(
+        "--days",
+        type=int,
+        default=settings.AUDIT_RETENTION_DAYS,
+        help="Archive entries created more than this many days ago",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=settings.AUDIT_ARCHIVE_BATCH_SIZE,
+        help="Entries moved per transaction",
+    )
+    args = parser.parse_args()
+
+    print(f"Archiving audit entries older than {args.days} days to {audit_archive.directory}...")
+    db = SessionLocal()
+    try:
+        archived = audit_retention_service.archive_audit_logs(
+            db, older_than_days=args.days, batch_size=args.batch_size
+        )
+        stats = audit_archive.stats()
+        print(
+            f"✓ Archived {archived} entries "
+            f"({stats['entries']} in {stats['segments']} segments, {stats['bytes']} bytes)"
+        )
+    except Exception as e:
+        print(f"✗ Error archiving audit entries: {e}")
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
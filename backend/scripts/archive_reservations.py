@@ -0,0 +1,55 @@
+"""
+Reservation archival script.
+
+Moves reservations that ended more than N days ago from the live tables into
+the archive tables, in small batches, so it can run while the API is serving
+requests. Schedule it (e.g. nightly with cron) after the first migration.
+
+Usage:
+    python scripts/archive_reservations.py [--days 90] [--batch-size 500]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services import archive_service
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Archive finished reservations.")
+    parser.add_argument(
+        "--days",
+        type=int,
+        default=settings.RESERVATION_ARCHIVE_AFTER_DAYS,
+        help="Archive reservations that ended more than this many days ago",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=settings.RESERVATION_ARCHIVE_BATCH_SIZE,
+        help="Reservations moved per transaction",
+    )
+    args = parser.parse_args()
+
+    print(f"Archiving reservations that ended more than {args.days} days ago...")
+    db = SessionLocal()
+    try:
+        archived = archive_service.archive_reservations(
+            db, older_than_days=args.days, batch_size=args.batch_size
+        )
+        print(f"✓ Archived {archived} reservations")
+    except Exception as e:
+        print(f"✗ Error archiving reservations: {e}")
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Reference node agent for the SSH access feed.
+
+Long-polls GET /api/v1/nodes/{node_id}/ssh-access and keeps a managed block of
+an authorized_keys file in sync with the node's grants. Lines outside the
+block are left alone. The block records the feed version it was built from,
+so a restarted agent resumes with the changes it missed instead of a full
+snapshot. Run it on the node as the account users log in to, with an
+admin's API key restricted to the node_access scope, which can read nothing
+but the nodes' authorized_keys and SSH access feeds.
+
+Usage:
+    python scripts/ssh_access_agent.py --url https://sentinel.example.com \\
+        --node-id 3 --api-key ssk_... [--file ~/.ssh/authorized_keys]
+"""
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+BLOCK_BEGIN = "# BEGIN ServerSentinel"
+BLOCK_END = "# END ServerSentinel"
+VERSION_PREFIX = "# version "
+
+
+class SSHAccessAgent:
+    """Applies SSH access deltas for one node to an authorized_keys file."""
+
+    def __init__(
+        self,
+        client: httpx.Client,
+        node_id: int,
+        path: Path,
+        headers: Optional[dict] = None,
+        timeout: float = 25,
+    ):
+        self.client = client
+        self.node_id = node_id
+        self.path = Path(path)
+        self.headers = headers or {}
+        self.timeout = timeout
+
+    def _read(self) -> tuple[list[str], list[str], Optional[int], dict[str, tuple[str, str]]]:
+        """
+        Split the file into the lines before and after the managed block, the
+        block's version and its keys by fingerprint.
+        """
+        try:
+            lines = self.path.read_text().splitlines()
+        except FileNotFoundError:
+            lines = []
+        if BLOCK_BEGIN not in lines or BLOCK_END not in lines:
+            return lines, [], None, {}
+        begin = lines.index(BLOCK_BEGIN)
+        end = lines.index(BLOCK_END, begin)
+        version = None
+        keys: dict[str, tuple[str, str]] = {}
+        comment = None
+        for line in lines[begin + 1:end]:
+            if line.startswith(VERSION_PREFIX):
+                version = int(line[len(VERSION_PREFIX):])
+            elif line.startswith("# "):
+                comment = line[2:].split(" ", 1)
+            elif line and comment is not None:
+                fingerprint, username = comment[0], comment[1] if len(comment) > 1 else ""
+                keys[fingerprint] = (username, line)
+                comment = None
+        return lines[:begin], lines[end + 1:], version, keys
+
+    def _write(
+        self,
+        before: list[str],
+        after: list[str],
+        version: int,
+        keys: dict[str, tuple[str, str]],
+    ) -> None:
+        """Replace the file atomically, so sshd never reads a partial one."""
+        block = [BLOCK_BEGIN, f"{VERSION_PREFIX}{version}"]
+        for fingerprint, (username, public_key) in keys.items():
+            block += [f"# {fingerprint} {username}", public_key]
+        block.append(BLOCK_END)
+        content = "\n".join(before + block + after) + "\n"
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=".authorized_keys.")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(content)
+            os.chmod(tmp, 0o600)
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def poll_once(self) -> int:
+        """
+        Wait for and apply one response of the feed.
+
+        Returns:
+            Number of changes applied
+        """
+        before, after, version, keys = self._read()
+        params = {"timeout": self.timeout}
+        if version is not None:
+            params["since"] = version
+        response = self.client.get(
+            f"/api/v1/nodes/{self.node_id}/ssh-access",
+            params=params,
+            headers=self.headers,
+            timeout=self.timeout + 10,
+        )
+        response.raise_for_status()
+        delta = response.json()
+
+        if delta["full"]:
+            keys = {}
+        elif not delta["changes"] and delta["version"] == version:
+            return 0
+        for change in delta["changes"]:
+            if change["action"] == "grant":
+                keys[change["fingerprint"]] = (change["username"], change["public_key"])
+            else:
+                keys.pop(change["fingerprint"], None)
+        self._write(before, after, delta["version"], keys)
+        return len(delta["changes"])
+
+    def run_forever(self, max_backoff: float = 60) -> None:
+        """Poll until interrupted, backing off while the server is unreachable."""
+        backoff = 1.0
+        while True:
+            try:
+                applied = self.poll_once()
+                if applied:
+                    print(f"Applied {applied} SSH access changes")
+                backoff = 1.0
+            except (httpx.HTTPError, ValueError) as e:
+                print(f"✗ Error polling SSH access feed: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, max_backoff)
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Sync authorized_keys with ServerSentinel.")
+    parser.add_argument("--url", required=True, help="ServerSentinel base URL")
+    parser.add_argument("--node-id", type=int, required=True, help="ID of this node")
+    parser.add_argument(
+        "--api-key",
+        default=os.environ.get("SERVERSENTINEL_API_KEY"),
+        help="Admin API key with the node_access scope (default: $SERVERSENTINEL_API_KEY)",
+    )
+    parser.add_argument(
+        "--file",
+        type=Path,
+        default=Path.home() / ".ssh" / "authorized_keys",
+        help="authorized_keys file to manage",
+    )
+    parser.add_argument("--timeout", type=float, default=25, help="Long-poll wait in seconds")
+    args = parser.parse_args()
+    if not args.api_key:
+        parser.error("--api-key or $SERVERSENTINEL_API_KEY is required")
+
+    print(f"Syncing {args.file} for node {args.node_id}...")
+    with httpx.Client(base_url=args.url) as client:
+        agent = SSHAccessAgent(
+            client,
+            args.node_id,
+            args.file,
+            headers={"Authorization": f"Bearer {args.api_key}"},
+            timeout=args.timeout,
+        )
+        try:
+            agent.run_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
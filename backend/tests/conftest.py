@@ -3,12 +3,27 @@ Test configuration and fixtures for ServerSentinel backend tests.
 """
 
 import asyncio
+import os
 from typing import AsyncGenerator, Generator
 
+# Cheap hashes keep the many test logins fast; must be set before app imports
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+# Audit entries are committed inline so tests can read them right away
+os.environ.setdefault("AUDIT_ASYNC", "false")
+
 import pytest
 import app.models  # Register models before creating tables.
+from app.core.audit_writer import audit_writer
+from app.core.config import settings
 from app.core.database import Base, get_db
+from app.core.idempotency import idempotency_store
+from app.core.rate_limit import failed_logins, login_ip_limiter, login_username_limiter
+from app.crud.authorized_keys_cache import authorized_keys_cache
+from app.crud.principal_cache import principal_cache
+from app.crud.reservation_index import reservation_index
+from app.crud.token_revocation import revocation_filter
 from app.main import app
+from app.services import ssh_access_service
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import Session, sessionmaker
@@ -24,6 +39,75 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# The startup preload would read the application database, not the test one
+settings.RESERVATION_INDEX_PRELOAD = False
+
+
+@pytest.fixture(autouse=True)
+def reset_reservation_index():
+    """
+    Start every test with an empty reservation index.
+    """
+    reservation_index.clear()
+    yield
+    reservation_index.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_audit_writer():
+    """
+    Stop a background audit writer a test started, without writing its queue.
+    """
+    yield
+    audit_writer.reset()
+
+
+@pytest.fixture(autouse=True)
+def reset_authorized_keys_cache():
+    """
+    Start every test without authorized_keys files built for earlier databases.
+    """
+    authorized_keys_cache.clear()
+    ssh_access_service.clear_sync_state()
+    yield
+    authorized_keys_cache.clear()
+    ssh_access_service.clear_sync_state()
+
+
+@pytest.fixture(autouse=True)
+def reset_idempotency_store():
+    """
+    Start every test without stored Idempotency-Key responses.
+    """
+    idempotency_store.clear()
+    yield
+    idempotency_store.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_principal_cache():
+    """
+    Start every test without cached users or token revocations from earlier
+    databases.
+    """
+    principal_cache.clear()
+    revocation_filter.clear()
+    yield
+    principal_cache.clear()
+    revocation_filter.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_login_limiters():
+    """
+    Start every test with full login token buckets and no failure counts.
+    """
+    for state in (login_ip_limiter, login_username_limiter, failed_logins):
+        state.clear()
+    yield
+    for state in (login_ip_limiter, login_username_limiter, failed_logins):
+        state.clear()
+
 
 @pytest.fixture(scope="function")
 def db_session() -> Generator[Session, None, None]:
@@ -52,6 +136,8 @@ def client(db_session: Session) -> Generator[TestClient, None, None]:
             pass
 
     app.dependency_overrides[get_db] = override_get_db
+    # Startup and shutdown hooks must not touch the application database
+    app.state.session_factory = TestingSessionLocal
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
@@ -125,3 +211,43 @@ def admin_headers(client: TestClient, db_session: Session, test_admin_data):
     )
     token = response.json()["access_token"]
     return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def real_admin_headers(client: TestClient, db_session: Session, admin_headers, test_admin_data):
+    """
+    Promote the admin_headers user to admin and return new authentication headers.
+    """
+    from app.crud import crud_user
+
+    crud_user.get_user_by_username(db_session, test_admin_data["username"]).is_admin = True
+    db_session.commit()
+    # The promotion revoked the old token; a new one carries the admin claim
+    response = client.post(
+        "/api/v1/auth/login",
+        data={
+            "username": test_admin_data["username"],
+            "password": test_admin_data["password"],
+        },
+    )
+    token = response.json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def node_with_devices(db_session: Session):
+    """
+    Create a node with four devices.
+    """
+    from app.crud import crud_node
+    from app.schemas.node import DeviceCreate, NodeCreate
+
+    node = crud_node.create_node(
+        db_session, NodeCreate(name="npu-node-01", ip_address="10.0.0.1")
+    )
+    for index in range(4):
+        crud_node.create_device(
+            db_session, DeviceCreate(device_index=index, model_name="Ascend910B"), node.id
+        )
+    db_session.refresh(node)
+    return node
@@ -0,0 +1,367 @@
+"""
+Unit tests for audit logging and the audit log query/export APIs.
+"""
+
+import csv
+import gzip
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+BASE_TIME = datetime(2030, 1, 1, 8, 0, 0)
+OLD_TIME = datetime(2020, 1, 1, 8, 0, 0)
+
+
+def _entry(action="user_login", user_id=None):
+    return {"user_id": user_id, "action": action, "resource_type": "user"}
+
+
+class TestAuditWriter:
+    """Tests for the background audit log writer"""
+
+    @pytest.fixture
+    def session_factory(self, db_session):
+        return sessionmaker(bind=db_session.get_bind())
+
+    def test_request_entries_written_in_background(
+        self, client: TestClient, db_session, auth_headers, session_factory
+    ):
+        """Test that a login's audit entry is queued and written by the writer."""
+        from app.core.audit_writer import audit_writer
+        from app.models.audit_log import AuditLog
+
+        audit_writer.start(session_factory)
+        response = client.post(
+            "/api/v1/auth/login", data={"username": "testuser", "password": "testpass123"}
+        )
+        assert response.status_code == 200
+        assert audit_writer.flush(timeout=5)
+
+        # The first login, by the auth_headers fixture, was committed inline
+        entries = db_session.query(AuditLog).filter(AuditLog.action == "user_login").all()
+        assert len(entries) == 2
+        assert entries[1].user_id == entries[0].user_id
+        assert entries[1].created_at is not None
+        stats = audit_writer.stats()
+        assert stats["written"] == 1 and stats["queue_depth"] == 0
+
+    def test_entries_batched(self, db_session, session_factory):
+        """Test that queued entries are written as multi-row batches."""
+        from app.core.audit_writer import AuditWriter
+        from app.models.audit_log import AuditLog
+
+        writer = AuditWriter(max_queue=100, batch_size=4, flush_interval_ms=10_000)
+        for i in range(10):
+            writer.enqueue(_entry(action=f"action_{i}"))
+        writer.start(session_factory)
+        try:
+            assert writer.flush(timeout=5)
+        finally:
+            writer.stop()
+
+        assert db_session.query(AuditLog).count() == 10
+        assert writer.stats()["batches"] == 3
+
+    def test_interval_flushes_partial_batch(self, db_session, session_factory):
+        """Test that a partial batch is written once its oldest entry has waited long enough."""
+        import time
+
+        from app.core.audit_writer import AuditWriter
+        from app.models.audit_log import AuditLog
+
+        writer = AuditWriter(max_queue=100, batch_size=100, flush_interval_ms=20)
+        writer.start(session_factory)
+        try:
+            writer.enqueue(_entry())
+            deadline = time.monotonic() + 5
+            while writer.stats()["written"] < 1 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            writer.stop(flush=False)
+
+        assert db_session.query(AuditLog).count() == 1
+
+    def test_full_queue_drops_and_counts(self, db_session, session_factory):
+        """Test that entries beyond the queue bound are dropped, not blocked on."""
+        from app.core.audit_writer import AuditWriter
+
+        writer = AuditWriter(max_queue=2, batch_size=10, flush_interval_ms=10)
+
+        assert [writer.enqueue(_entry()) for _ in range(3)] == [True, True, False]
+        stats = writer.stats()
+        assert stats["queue_depth"] == 2
+        assert stats["dropped"] == 1
+
+    def test_shutdown_flush_option(self, db_session, session_factory):
+        """Test that stop writes queued entries with flush and drops them without."""
+        from app.core.audit_writer import AuditWriter
+        from app.models.audit_log import AuditLog
+
+        durable = AuditWriter(max_queue=100, batch_size=100, flush_interval_ms=60_000)
+        durable.start(session_factory)
+        durable.enqueue(_entry())
+        durable.stop(flush=True)
+        assert db_session.query(AuditLog).count() == 1
+
+        lossy = AuditWriter(max_queue=100, batch_size=100, flush_interval_ms=60_000)
+        lossy.enqueue(_entry())
+        lossy.start(session_factory)
+        lossy.stop(flush=False)
+        assert db_session.query(AuditLog).count() == 1
+        assert lossy.stats()["dropped"] == 1
+
+
+@pytest.fixture
+def audit_entries(db_session, real_admin_headers):
+    """Six entries an hour apart, alternating between two actions, after the logins."""
+    from app.services import audit_service
+
+    audit_service.log_actions(
+        db_session,
+        [
+            {
+                "user_id": None,
+                "action": "create_node" if i % 2 else "delete_reservation",
+                "resource_type": "node" if i % 2 else "reservation",
+                "resource_id": i,
+                "details": {"n": i},
+                "ip_address": "10.0.0.1",
+                "created_at": BASE_TIME + timedelta(hours=i),
+            }
+            for i in range(6)
+        ],
+    )
+
+
+class TestAuditLogQuery:
+    """Tests for GET /api/v1/audit-logs and /api/v1/audit-logs/export"""
+
+    url = "/api/v1/audit-logs/"
+
+    def test_filters_and_keyset_pages(
+        self, client: TestClient, real_admin_headers, audit_entries
+    ):
+        """Test that filtered entries are paged newest first without gaps or repeats."""
+        seen = []
+        params = {"action": "delete_reservation", "limit": 2}
+        while True:
+            response = client.get(self.url, params=params, headers=real_admin_headers)
+            assert response.status_code == 200
+            seen += [entry["resource_id"] for entry in response.json()]
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+            params["cursor"] = cursor
+
+        assert seen == [4, 2, 0]
+
+    def test_time_range_and_resource(
+        self, client: TestClient, real_admin_headers, audit_entries
+    ):
+        """Test time range (end exclusive) and resource filters."""
+        response = client.get(
+            self.url,
+            params={
+                "resource_type": "node",
+                "start_time": (BASE_TIME + timedelta(hours=1)).isoformat(),
+                "end_time": (BASE_TIME + timedelta(hours=5)).isoformat(),
+            },
+            headers=real_admin_headers,
+        )
+
+        assert [entry["resource_id"] for entry in response.json()] == [3, 1]
+        assert response.json()[0]["details"] == {"n": 3}
+
+    def test_time_range_with_offset(
+        self, client: TestClient, real_admin_headers, audit_entries
+    ):
+        """Test that a time range given with a UTC offset is compared in UTC."""
+        response = client.get(
+            self.url,
+            params={
+                "resource_type": "node",
+                "start_time": "2030-01-01T17:00:00+08:00",
+                "end_time": "2030-01-01T21:00:00+08:00",
+            },
+            headers=real_admin_headers,
+        )
+
+        assert [entry["resource_id"] for entry in response.json()] == [3, 1]
+
+    def test_requires_admin(self, client: TestClient, auth_headers):
+        """Test that regular users get 403."""
+        assert client.get(self.url, headers=auth_headers).status_code == 403
+        assert client.get(self.url + "export", headers=auth_headers).status_code == 403
+
+    def test_export_ndjson(self, client: TestClient, real_admin_headers, audit_entries, monkeypatch):
+        """Test that the NDJSON export streams every matching entry, oldest first."""
+        from app.core.config import settings
+
+        # Several fetch batches
+        monkeypatch.setattr(settings, "AUDIT_EXPORT_BATCH_SIZE", 2)
+        response = client.get(
+            self.url + "export",
+            params={"start_time": BASE_TIME.isoformat()},
+            headers=real_admin_headers,
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["resource_id"] for line in lines] == [0, 1, 2, 3, 4, 5]
+
+    def test_export_csv(self, client: TestClient, real_admin_headers, audit_entries):
+        """Test the CSV export's header and JSON-encoded details."""
+        response = client.get(
+            self.url + "export",
+            params={"format": "csv", "action": "create_node"},
+            headers=real_admin_headers,
+        )
+
+        assert response.headers["content-type"].startswith("text/csv")
+        assert "audit-logs.csv" in response.headers["content-disposition"]
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert [row["resource_id"] for row in rows] == ["1", "3", "5"]
+        assert json.loads(rows[0]["details"]) == {"n": 1}
+        assert rows[0]["user_id"] == ""
+
+    def test_filtered_query_uses_composite_index(self, db_session, audit_entries):
+        """Test that a per-user listing seeks the (user_id, created_at) index."""
+        plan = db_session.execute(
+            text(
+                "EXPLAIN QUERY PLAN SELECT * FROM audit_logs WHERE user_id = 1 "
+                "ORDER BY created_at DESC, id DESC LIMIT 10"
+            )
+        ).all()
+
+        assert any("ix_audit_logs_user_id_created_at" in row[-1] for row in plan)
+
+
+@pytest.fixture
+def old_entries(db_session, real_admin_headers, tmp_path, monkeypatch):
+    """Five entries from January and February 2020, archived to a temporary directory."""
+    from app.core.audit_segments import audit_archive
+    from app.services import audit_service
+
+    monkeypatch.setattr(audit_archive, "directory", tmp_path)
+    audit_service.log_actions(
+        db_session,
+        [
+            {
+                "user_id": None,
+                "action": "create_node",
+                "resource_type": "node",
+                "resource_id": i,
+                "details": {"n": i},
+                "ip_address": None,
+                "created_at": OLD_TIME + timedelta(days=20 * i),
+            }
+            for i in range(5)
+        ],
+    )
+    # The newest ID is never archived; keep it a current entry
+    audit_service.log_action(db_session, None, "create_node", "node", resource_id=99)
+    return audit_archive
+
+
+class TestAuditRetention:
+    """Tests for moving old audit entries into archive segments"""
+
+    url = "/api/v1/audit-logs/"
+
+    def test_old_entries_moved_to_monthly_segments(self, db_session, old_entries):
+        """Test that old entries leave the live table for compressed monthly segments."""
+        from app.models.audit_log import AuditLog
+        from app.services import audit_retention_service
+
+        archived = audit_retention_service.archive_audit_logs(
+            db_session, older_than_days=365, batch_size=2, pause_seconds=0
+        )
+
+        assert archived == 5
+        assert db_session.query(AuditLog).filter(AuditLog.action == "create_node").count() == 1
+        assert sorted(path.name for path in old_entries.directory.glob("*.gz")) == [
+            "audit-2020-01.ndjson.gz",
+            "audit-2020-02.ndjson.gz",
+            "audit-2020-03.ndjson.gz",
+        ]
+        # Appended batches are gzip members of one stream
+        with gzip.open(old_entries.directory / "audit-2020-01.ndjson.gz", "rt") as f:
+            assert [json.loads(line)["resource_id"] for line in f] == [0, 1]
+        assert old_entries.stats()["entries"] == 5
+        assert db_session.query(AuditLog).filter(
+            AuditLog.action == "archive_audit_logs"
+        ).one().details["archived"] == 5
+
+    def test_archived_entries_queryable(
+        self, client: TestClient, db_session, real_admin_headers, old_entries
+    ):
+        """Test that listing pages continue from live into archived entries, and export includes them."""
+        from app.services import audit_retention_service
+
+        audit_retention_service.archive_audit_logs(db_session, older_than_days=365, pause_seconds=0)
+        live = client.get(self.url, params={"action": "create_node"}, headers=real_admin_headers)
+        assert [entry["resource_id"] for entry in live.json()] == [99]
+
+        seen = []
+        params = {"action": "create_node", "include_archived": True, "limit": 2}
+        while True:
+            response = client.get(self.url, params=params, headers=real_admin_headers)
+            seen += [entry["resource_id"] for entry in response.json()]
+            if "X-Next-Cursor" not in response.headers:
+                break
+            params["cursor"] = response.headers["X-Next-Cursor"]
+        assert seen == [99, 4, 3, 2, 1, 0]
+
+        exported = client.get(
+            self.url + "export",
+            params={
+                "include_archived": True,
+                "start_time": (OLD_TIME + timedelta(days=30)).isoformat(),
+                "end_time": BASE_TIME.isoformat(),
+            },
+            headers=real_admin_headers,
+        )
+        lines = [json.loads(line) for line in exported.text.splitlines()]
+        assert [(line["action"], line["resource_id"]) for line in lines[:3]] == [
+            ("create_node", 2),
+            ("create_node", 3),
+            ("create_node", 4),
+        ]
+        assert lines[0]["details"] == {"n": 2}
+
+    def test_interrupted_run_not_archived_twice(
+        self, db_session, old_entries, monkeypatch
+    ):
+        """Test that rows archived before a failed delete are deleted, not re-archived, next run."""
+        from app.crud import crud_audit
+        from app.models.audit_log import AuditLog
+        from app.services import audit_retention_service
+
+        delete_audit_logs = crud_audit.delete_audit_logs
+
+        def fail(db, entry_ids):
+            raise RuntimeError("killed")
+
+        monkeypatch.setattr(crud_audit, "delete_audit_logs", fail)
+        with pytest.raises(RuntimeError):
+            audit_retention_service.archive_audit_logs(
+                db_session, older_than_days=365, batch_size=2, pause_seconds=0
+            )
+        # A torn append left bytes the index doesn't know about
+        with open(old_entries.directory / "audit-2020-01.ndjson.gz", "ab") as f:
+            f.write(b"torn")
+        monkeypatch.setattr(crud_audit, "delete_audit_logs", delete_audit_logs)
+
+        audit_retention_service.archive_audit_logs(
+            db_session, older_than_days=365, batch_size=2, pause_seconds=0
+        )
+
+        archived = [entry["resource_id"] for entry in old_entries.iter_entries()]
+        assert archived == [0, 1, 2, 3, 4]
+        assert db_session.query(AuditLog).filter(AuditLog.action == "create_node").count() == 1
@@ -2,8 +2,14 @@
 Unit tests for authentication and SSH key management APIs.
 """
 
+from datetime import datetime, timezone
+
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.crud.principal_cache import principal_cache
 
 VALID_SSH_KEY = (
     "ssh-ed25519 AAAAC3NzaC1lZDI1NTE5AAAAIFB8r8QKq3VqQ3t9PjFf1xw0WkPq2KzNvC5F0XbV+M2P "
@@ -72,6 +78,179 @@ class TestAuthLogin:
         assert response.status_code == 422  # Validation error
 
 
+class TestPasswordHashing:
+    """Tests for password verification on the hashing pool"""
+
+    def _login(self, client, test_user_data):
+        return client.post(
+            "/api/v1/auth/login",
+            data={
+                "username": test_user_data["username"],
+                "password": test_user_data["password"],
+            },
+        )
+
+    def test_outdated_cost_upgraded_on_login(
+        self, client: TestClient, db_session, test_user_data
+    ):
+        """Test that a hash with another bcrypt cost is replaced after login."""
+        from passlib.context import CryptContext
+
+        from app.crud import crud_user
+        from app.schemas.user import UserCreate
+
+        old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=5).hash(
+            test_user_data["password"]
+        )
+        crud_user.create_user(db_session, UserCreate(**test_user_data), old_hash)
+
+        response = self._login(client, test_user_data)
+
+        assert response.status_code == 200
+        user = crud_user.get_user_by_username(db_session, test_user_data["username"])
+        db_session.refresh(user)
+        assert user.hashed_password != old_hash
+        assert user.hashed_password.startswith(f"$2b${settings.BCRYPT_ROUNDS:02d}$")
+
+    def test_saturated_pool_returns_503(
+        self, client: TestClient, db_session, test_user_data, monkeypatch
+    ):
+        """Test that logins are refused instead of queueing without bound."""
+        from app.core import security
+        from app.schemas.user import UserCreate
+        from app.services import auth_service
+
+        auth_service.create_user(db_session, UserCreate(**test_user_data))
+        monkeypatch.setattr(security, "password_hasher", security.PasswordHasher(1, 0))
+
+        response = self._login(client, test_user_data)
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        assert security.password_hasher.stats()["rejected"] == 1
+
+    def test_pool_load_is_reported(self, client: TestClient):
+        """Test that /health exposes the pool's queue depth."""
+        stats = client.get("/health").json()["password_hasher"]
+
+        assert stats["queue_depth"] == 0
+        assert stats["workers"] == settings.PASSWORD_HASH_WORKERS
+
+
+class TestLoginThrottling:
+    """Tests for login rate limiting and failed-login auditing"""
+
+    def _login(self, client, username, password="wrong", ip="10.1.1.1"):
+        return client.post(
+            "/api/v1/auth/login",
+            data={"username": username, "password": password},
+            headers={"X-Forwarded-For": ip},
+        )
+
+    def test_username_limit_refuses_before_verification(
+        self, client: TestClient, db_session, test_user_data, monkeypatch
+    ):
+        """Test that attempts beyond the burst get 429 without hashing a password."""
+        from app.schemas.user import UserCreate
+        from app.services import auth_service
+
+        auth_service.create_user(db_session, UserCreate(**test_user_data))
+        verified = []
+        verify = auth_service.verify_password_async
+
+        async def counting_verify(plain, hashed):
+            verified.append(plain)
+            return await verify(plain, hashed)
+
+        monkeypatch.setattr(auth_service, "verify_password_async", counting_verify)
+
+        statuses = [
+            self._login(client, test_user_data["username"], ip=f"10.1.1.{i}").status_code
+            for i in range(settings.LOGIN_USERNAME_BURST + 1)
+        ]
+
+        assert statuses == [401] * settings.LOGIN_USERNAME_BURST + [429]
+        assert len(verified) == settings.LOGIN_USERNAME_BURST
+        refused = self._login(
+            client, test_user_data["username"], test_user_data["password"], ip="10.9.9.9"
+        )
+        assert refused.status_code == 429
+        assert int(refused.headers["Retry-After"]) >= 1
+
+    def test_ip_limit_spans_usernames(self, client: TestClient):
+        """Test that one address can't spray many usernames."""
+        statuses = [
+            self._login(client, f"user{i}").status_code
+            for i in range(settings.LOGIN_IP_BURST + 1)
+        ]
+
+        assert statuses[-1] == 429
+        assert self._login(client, "user0", ip="10.2.2.2").status_code == 401
+
+    def test_one_address_cant_lock_out_owner(
+        self, client: TestClient, db_session, test_user_data
+    ):
+        """Test that guessing from one address is stopped before the username bucket runs dry."""
+        from app.schemas.user import UserCreate
+        from app.services import auth_service
+
+        auth_service.create_user(db_session, UserCreate(**test_user_data))
+        statuses = [
+            self._login(client, test_user_data["username"]).status_code
+            for _ in range(settings.LOGIN_IP_BURST * 2)
+        ]
+
+        assert statuses.count(429) == settings.LOGIN_IP_BURST
+        owner = self._login(
+            client, test_user_data["username"], test_user_data["password"], ip="10.9.9.9"
+        )
+        assert owner.status_code == 200
+
+    def test_refused_attempt_takes_no_tokens(self):
+        """Test that a request refused by one bucket doesn't drain the other."""
+        from app.core.rate_limit import TokenBucketLimiter, acquire_all
+
+        ips = TokenBucketLimiter(capacity=1, per_minute=60, max_keys=10)
+        usernames = TokenBucketLimiter(capacity=2, per_minute=60, max_keys=10)
+
+        assert acquire_all((ips, "ip"), (usernames, "user"), now=0.0) == 0.0
+        assert acquire_all((ips, "ip"), (usernames, "user"), now=0.0) == pytest.approx(1.0)
+        assert usernames.acquire("user", now=0.0) == 0.0
+        assert usernames.acquire("user", now=0.0) > 0
+
+    def test_bucket_refills(self):
+        """Test token bucket burst, refill and LRU eviction."""
+        from app.core.rate_limit import TokenBucketLimiter
+
+        limiter = TokenBucketLimiter(capacity=2, per_minute=60, max_keys=2)
+
+        assert [limiter.acquire("a", now=0.0) for _ in range(3)] == [0.0, 0.0, 1.0]
+        assert limiter.acquire("a", now=0.5) == pytest.approx(0.5)
+        assert limiter.acquire("a", now=1.0) == 0.0
+        limiter.acquire("b", now=1.0)
+        limiter.acquire("c", now=1.0)
+        assert len(limiter) == 2
+
+    def test_failures_audited_as_summary(
+        self, client: TestClient, db_session
+    ):
+        """Test that failed attempts become one audit entry per username."""
+        from app.models.audit_log import AuditLog
+        from app.services import auth_service
+
+        for ip in ("10.3.3.1", "10.3.3.1", "10.3.3.2"):
+            self._login(client, "ghost", ip=ip)
+        assert db_session.query(AuditLog).count() == 0
+
+        assert auth_service.flush_failed_logins(db_session, force=True) == 1
+
+        entry = db_session.query(AuditLog).one()
+        assert entry.action == "failed_login_summary"
+        assert entry.details["username"] == "ghost"
+        assert entry.details["failed"] == 3
+        assert entry.details["ip_addresses"] == {"10.3.3.1": 2, "10.3.3.2": 1}
+
+
 class TestGetCurrentUser:
     """Tests for GET /api/v1/users/me"""
 
@@ -99,6 +278,231 @@ class TestGetCurrentUser:
         assert response.status_code == 401
 
 
+class TestPrincipalCache:
+    """Tests for the principal cache behind get_current_user"""
+
+    @pytest.fixture
+    def legacy_headers(self, auth_headers, test_user_data):
+        """Headers with a token that has no user ID claim, as issued before claims."""
+        from app.core.security import create_access_token
+
+        token = create_access_token({"sub": test_user_data["username"]})
+        return {"Authorization": f"Bearer {token}"}
+
+    def _user_queries(self, db_session, request):
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            if "FROM users" in statement:
+                statements.append(statement)
+
+        engine = db_session.get_bind()
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            request()
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        return statements
+
+    def test_repeat_requests_skip_user_query(
+        self, client: TestClient, db_session, legacy_headers
+    ):
+        """Test that only the first authenticated request loads the user."""
+        principal_cache.clear()
+        first = self._user_queries(
+            db_session, lambda: client.get("/api/v1/users/me/ssh-keys", headers=legacy_headers)
+        )
+        second = self._user_queries(
+            db_session, lambda: client.get("/api/v1/users/me/ssh-keys", headers=legacy_headers)
+        )
+
+        assert len(first) == 1
+        assert second == []
+        assert principal_cache.stats() == {"size": 1, "hits": 1, "misses": 1}
+
+    def test_cached_user_still_loads_relationships(
+        self, client: TestClient, legacy_headers
+    ):
+        """Test that SSH keys added after caching show up on /me."""
+        client.get("/api/v1/users/me", headers=legacy_headers)
+        client.post(
+            "/api/v1/users/me/ssh-keys",
+            headers=legacy_headers,
+            json={"public_key": VALID_SSH_KEY},
+        )
+
+        response = client.get("/api/v1/users/me", headers=legacy_headers)
+
+        assert len(response.json()["ssh_keys"]) == 1
+
+    def test_deactivation_invalidates(
+        self, client: TestClient, db_session, legacy_headers, test_user_data
+    ):
+        """Test that a deactivated user is refused right away despite the cache."""
+        from app.crud import crud_user
+
+        assert client.get("/api/v1/users/me", headers=legacy_headers).status_code == 200
+        crud_user.get_user_by_username(db_session, test_user_data["username"]).is_active = False
+        db_session.commit()
+
+        response = client.get("/api/v1/users/me", headers=legacy_headers)
+
+        assert response.status_code == 400
+
+    def test_deletion_invalidates(
+        self, client: TestClient, db_session, legacy_headers, test_user_data
+    ):
+        """Test that a deleted user's token stops working right away."""
+        from app.crud import crud_user
+
+        assert client.get("/api/v1/users/me", headers=legacy_headers).status_code == 200
+        db_session.delete(crud_user.get_user_by_username(db_session, test_user_data["username"]))
+        db_session.commit()
+
+        response = client.get("/api/v1/users/me", headers=legacy_headers)
+
+        assert response.status_code == 401
+
+
+class TestTokenClaims:
+    """Tests for claims-carrying access tokens, refresh tokens and revocation"""
+
+    def _login(self, client, test_user_data):
+        return client.post(
+            "/api/v1/auth/login",
+            data={
+                "username": test_user_data["username"],
+                "password": test_user_data["password"],
+            },
+        ).json()
+
+    def _headers(self, tokens):
+        return {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    def test_claims_authorize_without_user_query(
+        self, client: TestClient, db_session, auth_headers
+    ):
+        """Test that a claims-carrying token is authorized without reading users."""
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            if "FROM users" in statement:
+                statements.append(statement)
+
+        engine = db_session.get_bind()
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            response = client.get("/api/v1/users/me/ssh-keys", headers=auth_headers)
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+        assert response.status_code == 200
+        assert statements == []
+
+    def test_refresh_issues_new_pair(
+        self, client: TestClient, db_session, test_user_data
+    ):
+        """Test that a refresh token yields working tokens and an access token doesn't."""
+        from app.schemas.user import UserCreate
+        from app.services import auth_service
+
+        auth_service.create_user(db_session, UserCreate(**test_user_data))
+        tokens = self._login(client, test_user_data)
+        assert tokens["expires_in"] == settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
+        refreshed = client.post(
+            "/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]}
+        )
+        assert refreshed.status_code == 200
+        me = client.get("/api/v1/users/me", headers=self._headers(refreshed.json()))
+        assert me.json()["username"] == test_user_data["username"]
+
+        wrong_type = client.post(
+            "/api/v1/auth/refresh", json={"refresh_token": tokens["access_token"]}
+        )
+        assert wrong_type.status_code == 401
+        as_access = {"Authorization": f"Bearer {tokens['refresh_token']}"}
+        assert client.get("/api/v1/users/me", headers=as_access).status_code == 401
+
+    def test_deactivation_revokes_tokens(
+        self, client: TestClient, db_session, test_user_data
+    ):
+        """Test that deactivating a user stops both of their tokens right away."""
+        from app.crud import crud_user
+        from app.schemas.user import UserCreate
+        from app.services import auth_service
+
+        auth_service.create_user(db_session, UserCreate(**test_user_data))
+        tokens = self._login(client, test_user_data)
+        assert client.get("/api/v1/users/me", headers=self._headers(tokens)).status_code == 200
+
+        crud_user.get_user_by_username(db_session, test_user_data["username"]).is_active = False
+        db_session.commit()
+
+        assert client.get("/api/v1/users/me", headers=self._headers(tokens)).status_code == 401
+        refreshed = client.post(
+            "/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]}
+        )
+        assert refreshed.status_code == 401
+
+    def test_logout_revokes_everywhere(
+        self, client: TestClient, db_session, test_user_data
+    ):
+        """Test that logout invalidates earlier sessions but not later logins."""
+        from app.schemas.user import UserCreate
+        from app.services import auth_service
+
+        auth_service.create_user(db_session, UserCreate(**test_user_data))
+        first = self._login(client, test_user_data)
+
+        response = client.post("/api/v1/auth/logout", headers=self._headers(first))
+
+        assert response.status_code == 204
+        assert client.get("/api/v1/users/me", headers=self._headers(first)).status_code == 401
+        second = self._login(client, test_user_data)
+        assert client.get("/api/v1/users/me", headers=self._headers(second)).status_code == 200
+
+    def test_revocation_by_another_process(
+        self, client: TestClient, db_session, auth_headers, test_user_data
+    ):
+        """Test that revocations written elsewhere apply once the filter refreshes."""
+        from sqlalchemy import update
+
+        from app.crud.token_revocation import revocation_filter
+        from app.models.token_revocation import TokenRevocation
+        from app.models.user import User
+
+        assert client.get("/api/v1/users/me", headers=auth_headers).status_code == 200
+        # Core statements bypass the ORM events, like a write from another process
+        user_id = (
+            db_session.query(User.id)
+            .filter(User.username == test_user_data["username"])
+            .scalar()
+        )
+        db_session.execute(update(User).where(User.id == user_id).values(token_version=1))
+        db_session.execute(
+            TokenRevocation.__table__.insert().values(
+                user_id=user_id, token_version=0, revoked_at=datetime.now(timezone.utc)
+            )
+        )
+        db_session.commit()
+
+        revocation_filter.refresh(db_session, force=True)
+
+        assert client.get("/api/v1/users/me", headers=auth_headers).status_code == 401
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        """Test that every added key is reported and most others aren't."""
+        from app.crud.token_revocation import BloomFilter
+
+        bloom = BloomFilter(bits=1 << 14, hashes=7)
+        for i in range(500):
+            bloom.add(f"{i}:0")
+
+        assert all(f"{i}:0" in bloom for i in range(500))
+        assert sum(f"{i}:1" in bloom for i in range(1000)) < 20
+
+
 class TestSSHKeyManagement:
     """Tests for SSH key management endpoints"""
 
@@ -227,3 +631,216 @@ class TestSSHKeyManagement:
         )
         # Admin should get 404 since it's not their key
         assert delete_response.status_code == 404
+
+
+class TestSSHKeyFingerprints:
+    """Tests for OpenSSH fingerprints and POST /api/v1/users/me/ssh-keys/import"""
+
+    OTHER_KEY = (
+        "ssh-ed25519 AAAAC3NzaC1lZDI1NTE5AAAAIGx0c1QKq3VqQ3t9PjFf1xw0WkPq2KzNvC5F0XbV+M2P bob"
+    )
+
+    def _expected_fingerprint(self, public_key):
+        import base64
+        import hashlib
+
+        blob = base64.b64decode(public_key.split()[1])
+        return "SHA256:" + base64.b64encode(hashlib.sha256(blob).digest()).decode().rstrip("=")
+
+    def test_fingerprint_of_key_blob(self, client: TestClient, auth_headers):
+        """Test that the stored fingerprint is OpenSSH's and ignores the comment."""
+        response = client.post(
+            "/api/v1/users/me/ssh-keys",
+            headers=auth_headers,
+            json={"public_key": VALID_SSH_KEY},
+        )
+        recommented = client.post(
+            "/api/v1/users/me/ssh-keys",
+            headers=auth_headers,
+            json={"public_key": VALID_SSH_KEY.rsplit(" ", 1)[0] + " laptop"},
+        )
+
+        assert response.json()["fingerprint"] == self._expected_fingerprint(VALID_SSH_KEY)
+        assert recommented.status_code == 400
+
+    def test_key_of_another_user_refused(
+        self, client: TestClient, auth_headers, admin_headers
+    ):
+        """Test that a key registered by one user can't be added by another."""
+        client.post(
+            "/api/v1/users/me/ssh-keys", headers=auth_headers, json={"public_key": VALID_SSH_KEY}
+        )
+
+        response = client.post(
+            "/api/v1/users/me/ssh-keys", headers=admin_headers, json={"public_key": VALID_SSH_KEY}
+        )
+
+        assert response.status_code == 400
+        assert response.json()["detail"] == "SSH key already exists"
+
+    def test_blob_must_match_type(self, client: TestClient, auth_headers):
+        """Test that a key whose blob names another type is refused."""
+        mislabelled = "ssh-rsa " + VALID_SSH_KEY.split()[1]
+
+        response = client.post(
+            "/api/v1/users/me/ssh-keys", headers=auth_headers, json={"public_key": mislabelled}
+        )
+
+        assert response.status_code == 400
+
+    def test_import_authorized_keys(self, client: TestClient, db_session, auth_headers):
+        """Test that new keys are imported and every other line is reported."""
+        from app.models.audit_log import AuditLog
+
+        client.post(
+            "/api/v1/users/me/ssh-keys", headers=auth_headers, json={"public_key": VALID_SSH_KEY}
+        )
+        authorized_keys = "\n".join(
+            [
+                "# laptop",
+                f'from="10.0.0.0/8",no-pty {self.OTHER_KEY}',
+                "",
+                "ssh-ed25519 not-base64!",
+                VALID_SSH_KEY,
+                self.OTHER_KEY.replace(" bob", " bob-again"),
+            ]
+        )
+
+        response = client.post(
+            "/api/v1/users/me/ssh-keys/import",
+            headers=auth_headers,
+            json={"authorized_keys": authorized_keys},
+        )
+
+        assert response.status_code == 201
+        data = response.json()
+        assert [key["public_key"] for key in data["imported"]] == [self.OTHER_KEY]
+        assert data["skipped"] == [
+            {"line": 4, "reason": "Invalid SSH public key format"},
+            {"line": 5, "reason": "SSH key already exists"},
+            {"line": 6, "reason": "Same key as line 2"},
+        ]
+        assert db_session.query(AuditLog).filter(AuditLog.action == "create_ssh_key").count() == 2
+
+    def test_import_limit(self, client: TestClient, auth_headers, monkeypatch):
+        """Test that oversized files are refused before anything is written."""
+        monkeypatch.setattr(settings, "SSH_KEY_IMPORT_MAX_KEYS", 1)
+
+        response = client.post(
+            "/api/v1/users/me/ssh-keys/import",
+            headers=auth_headers,
+            json={"authorized_keys": f"{VALID_SSH_KEY}\n{self.OTHER_KEY}"},
+        )
+
+        assert response.status_code == 400
+        assert client.get("/api/v1/users/me/ssh-keys", headers=auth_headers).json() == []
+
+
+class TestApiKeys:
+    """Tests for API keys under /api/v1/users/me/api-keys"""
+
+    def _create(self, client, auth_headers, **body):
+        return client.post(
+            "/api/v1/users/me/api-keys",
+            headers=auth_headers,
+            json={"name": "ci-agent", **body},
+        )
+
+    def _headers(self, key):
+        return {"Authorization": f"Bearer {key}"}
+
+    def _reservation(self, node):
+        return {
+            "node_id": node.id,
+            "start_time": "2030-01-01T08:00:00",
+            "end_time": "2030-01-01T10:00:00",
+            "type": "machine",
+        }
+
+    def test_key_shown_once_and_authenticates(self, client: TestClient, auth_headers):
+        """Test that the key authenticates and listings never include it."""
+        created = self._create(client, auth_headers)
+        assert created.status_code == 201
+        key = created.json()["key"]
+        assert key.startswith("ssk_")
+
+        listed = client.get("/api/v1/users/me/api-keys", headers=auth_headers).json()
+        me = client.get("/api/v1/users/me", headers=self._headers(key))
+
+        assert [entry["prefix"] for entry in listed] == [created.json()["prefix"]]
+        assert "key" not in listed[0]
+        assert me.status_code == 200
+        assert me.json()["username"] == "testuser"
+
+    def test_wrong_secret_refused(self, client: TestClient, auth_headers):
+        """Test that a known prefix with another secret is refused."""
+        key = self._create(client, auth_headers).json()["key"]
+        forged = key[:-4] + ("AAAA" if not key.endswith("AAAA") else "BBBB")
+
+        response = client.get("/api/v1/users/me", headers=self._headers(forged))
+
+        assert response.status_code == 401
+
+    def test_verification_is_one_query(self, client: TestClient, db_session, auth_headers):
+        """Test that a key and its owner are loaded by a single statement."""
+        key = self._create(client, auth_headers).json()["key"]
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            if "FROM api_keys" in statement or "FROM users" in statement:
+                statements.append(statement)
+
+        engine = db_session.get_bind()
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            response = client.get("/api/v1/users/me/ssh-keys", headers=self._headers(key))
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+        assert response.status_code == 200
+        assert len(statements) == 1
+
+    def test_scopes_restrict_requests(
+        self, client: TestClient, auth_headers, node_with_devices
+    ):
+        """Test that read-only and reservation scopes are enforced."""
+        read_only = self._create(client, auth_headers, scopes=["read"]).json()["key"]
+        booking = self._create(client, auth_headers, scopes=["reservations"]).json()["key"]
+        reservation = self._reservation(node_with_devices)
+
+        assert client.get("/api/v1/nodes/", headers=self._headers(read_only)).status_code == 200
+        refused = client.post(
+            "/api/v1/reservations/", headers=self._headers(read_only), json=reservation
+        )
+        assert refused.status_code == 403
+        booked = client.post(
+            "/api/v1/reservations/", headers=self._headers(booking), json=reservation
+        )
+        assert booked.status_code == 201
+        assert client.get("/api/v1/nodes/", headers=self._headers(booking)).status_code == 403
+
+    def test_revoked_key_refused(self, client: TestClient, auth_headers):
+        """Test that deleting a key stops it right away."""
+        created = self._create(client, auth_headers).json()
+
+        deleted = client.delete(
+            f"/api/v1/users/me/api-keys/{created['id']}", headers=auth_headers
+        )
+
+        assert deleted.status_code == 204
+        response = client.get("/api/v1/users/me", headers=self._headers(created["key"]))
+        assert response.status_code == 401
+
+    def test_inactive_owner_refused(
+        self, client: TestClient, db_session, auth_headers, test_user_data
+    ):
+        """Test that keys of a deactivated user stop working."""
+        from app.crud import crud_user
+
+        key = self._create(client, auth_headers).json()["key"]
+        crud_user.get_user_by_username(db_session, test_user_data["username"]).is_active = False
+        db_session.commit()
+
+        response = client.get("/api/v1/users/me", headers=self._headers(key))
+
+        assert response.status_code == 401
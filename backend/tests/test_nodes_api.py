@@ -0,0 +1,392 @@
+"""
+Unit tests for node and device APIs.
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+BASE_TIME = datetime(2030, 1, 1, 8, 0, 0)
+
+KEY_A = "ssh-ed25519 AAAAC3NzaC1lZDI1NTE5AAAAIFB8r8QKq3VqQ3t9PjFf1xw0WkPq2KzNvC5F0XbV+M2P alice"
+KEY_B = "ssh-ed25519 AAAAC3NzaC1lZDI1NTE5AAAAIGx0c1QKq3VqQ3t9PjFf1xw0WkPq2KzNvC5F0XbV+M2P bob"
+
+
+class TestNodeAvailability:
+    """Tests for GET /api/v1/nodes/availability"""
+
+    def _reserve(self, client, headers, node, hours, device_indexes=None):
+        payload = {
+            "node_id": node.id,
+            "start_time": (BASE_TIME + timedelta(hours=hours[0])).isoformat(),
+            "end_time": (BASE_TIME + timedelta(hours=hours[1])).isoformat(),
+            "type": "machine" if device_indexes is None else "device",
+        }
+        if device_indexes is not None:
+            payload["device_ids"] = [node.devices[i].id for i in device_indexes]
+        response = client.post("/api/v1/reservations/", headers=headers, json=payload)
+        assert response.status_code == 201
+
+    def test_availability_grid(self, client: TestClient, auth_headers, node_with_devices):
+        """Test that device and machine reservations are rasterized per slot."""
+        self._reserve(client, auth_headers, node_with_devices, (1, 2), device_indexes=[1])
+        self._reserve(client, auth_headers, node_with_devices, (3, 4))
+
+        response = client.get(
+            "/api/v1/nodes/availability",
+            headers=auth_headers,
+            params={
+                "start": BASE_TIME.isoformat(),
+                "end": (BASE_TIME + timedelta(hours=5)).isoformat(),
+                "step": "1h",
+            },
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["slots"] == 5
+        assert data["step_minutes"] == 60
+        node = data["nodes"][0]
+        assert node["occupancy"] == "01010"
+        rows = [device["occupancy"] for device in node["devices"]]
+        assert rows == ["00010", "01010", "00010", "00010"]
+
+    def test_partial_slots_are_busy(self, client: TestClient, auth_headers, node_with_devices):
+        """Test that a slot partially covered by a reservation counts as busy."""
+        self._reserve(client, auth_headers, node_with_devices, (0.5, 1.25), device_indexes=[0])
+
+        response = client.get(
+            "/api/v1/nodes/availability",
+            headers=auth_headers,
+            params={
+                "start": BASE_TIME.isoformat(),
+                "end": (BASE_TIME + timedelta(hours=2)).isoformat(),
+                "step": "1h",
+            },
+        )
+
+        assert response.json()["nodes"][0]["devices"][0]["occupancy"] == "11"
+
+    def test_invalid_step(self, client: TestClient, auth_headers, node_with_devices):
+        """Test that malformed slot lengths are rejected."""
+        response = client.get(
+            "/api/v1/nodes/availability",
+            headers=auth_headers,
+            params={
+                "start": BASE_TIME.isoformat(),
+                "end": (BASE_TIME + timedelta(hours=2)).isoformat(),
+                "step": "15x",
+            },
+        )
+
+        assert response.status_code == 400
+
+    def test_availability_unauthorized(self, client: TestClient):
+        """Test that the grid requires authentication."""
+        response = client.get(
+            "/api/v1/nodes/availability",
+            params={"start": BASE_TIME.isoformat(), "end": BASE_TIME.isoformat()},
+        )
+        assert response.status_code == 401
+
+
+class TestAuthorizedKeys:
+    """Tests for GET /api/v1/nodes/{id}/authorized_keys"""
+
+    def _reserve_now(self, db_session, node, username, hours):
+        from app.crud import crud_reservation, crud_user
+        from app.models.reservation import ReservationType
+        from app.schemas.reservation import ReservationCreate
+
+        now = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+        return crud_reservation.create_reservation(
+            db_session,
+            ReservationCreate(
+                node_id=node.id,
+                start_time=now + timedelta(hours=hours[0]),
+                end_time=now + timedelta(hours=hours[1]),
+                type=ReservationType.MACHINE,
+            ),
+            user_id=crud_user.get_user_by_username(db_session, username).id,
+        )
+
+    def _url(self, node):
+        return f"/api/v1/nodes/{node.id}/authorized_keys"
+
+    def test_active_users_keys_with_etag(
+        self, client: TestClient, db_session, auth_headers, real_admin_headers, node_with_devices
+    ):
+        """Test that only users reserving the node now are listed, and 304 on a match."""
+        client.post("/api/v1/users/me/ssh-keys", headers=auth_headers, json={"public_key": KEY_A})
+        client.post(
+            "/api/v1/users/me/ssh-keys", headers=real_admin_headers, json={"public_key": KEY_B}
+        )
+        self._reserve_now(db_session, node_with_devices, "testuser", (-1, 1))
+        self._reserve_now(db_session, node_with_devices, "admin", (2, 3))
+
+        response = client.get(self._url(node_with_devices), headers=real_admin_headers)
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "# testuser\n" + KEY_A + "\n" in response.text
+        assert KEY_B not in response.text
+        etag = response.headers["ETag"]
+        assert etag.startswith('"') and not etag.startswith("W/")
+        unchanged = client.get(
+            self._url(node_with_devices),
+            headers={**real_admin_headers, "If-None-Match": etag},
+        )
+        assert unchanged.status_code == 304
+        assert unchanged.headers["ETag"] == etag
+
+    def test_cached_until_invalidated(
+        self, client: TestClient, db_session, auth_headers, real_admin_headers, node_with_devices
+    ):
+        """Test that repeat polls skip the database until an SSH key changes."""
+        self._reserve_now(db_session, node_with_devices, "testuser", (-1, 1))
+        first = client.get(self._url(node_with_devices), headers=real_admin_headers)
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            if "FROM reservations" in statement or "FROM ssh_keys" in statement:
+                statements.append(statement)
+
+        engine = db_session.get_bind()
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            second = client.get(self._url(node_with_devices), headers=real_admin_headers)
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        assert statements == []
+        assert second.headers["ETag"] == first.headers["ETag"]
+
+        client.post("/api/v1/users/me/ssh-keys", headers=auth_headers, json={"public_key": KEY_A})
+        third = client.get(self._url(node_with_devices), headers=real_admin_headers)
+
+        assert third.headers["ETag"] != first.headers["ETag"]
+        assert KEY_A in third.text
+
+    def test_valid_until_next_boundary(
+        self, db_session, auth_headers, node_with_devices, monkeypatch
+    ):
+        """Test that a built file expires when the next reservation starts."""
+        from app.core.config import settings
+        from app.services import authorized_keys_service
+
+        monkeypatch.setattr(settings, "AUTHORIZED_KEYS_MAX_AGE_SECONDS", 3600)
+        upcoming = self._reserve_now(db_session, node_with_devices, "testuser", (0.25, 1))
+
+        built = authorized_keys_service.build_authorized_keys(
+            db_session, node_with_devices.id, datetime.now(timezone.utc).replace(tzinfo=None)
+        )
+
+        assert built.valid_until == upcoming.start_time
+
+    def test_requires_admin_and_existing_node(
+        self, client: TestClient, auth_headers, real_admin_headers, node_with_devices
+    ):
+        """Test that regular users get 403 and unknown nodes 404."""
+        forbidden = client.get(self._url(node_with_devices), headers=auth_headers)
+        missing = client.get("/api/v1/nodes/999/authorized_keys", headers=real_admin_headers)
+
+        assert forbidden.status_code == 403
+        assert missing.status_code == 404
+
+
+class TestSSHAccessFeed:
+    """Tests for GET /api/v1/nodes/{id}/ssh-access and the reference agent"""
+
+    def _url(self, node):
+        return f"/api/v1/nodes/{node.id}/ssh-access"
+
+    def _add_key(self, client, headers, public_key):
+        return client.post("/api/v1/users/me/ssh-keys", headers=headers, json={"public_key": public_key})
+
+    def _agent_headers(self, client, admin_headers):
+        key = client.post(
+            "/api/v1/users/me/api-keys",
+            headers=admin_headers,
+            json={"name": "agent", "scopes": ["node_access"]},
+        ).json()["key"]
+        return {"Authorization": f"Bearer {key}"}
+
+    def test_snapshot_then_deltas(
+        self, client: TestClient, db_session, auth_headers, real_admin_headers, node_with_devices
+    ):
+        """Test that a full snapshot is followed by versioned grant/revoke deltas."""
+        first_key = self._add_key(client, auth_headers, KEY_A).json()
+        TestAuthorizedKeys()._reserve_now(db_session, node_with_devices, "testuser", (-1, 1))
+
+        snapshot = client.get(self._url(node_with_devices), headers=real_admin_headers).json()
+
+        assert snapshot["full"] is True
+        assert [(c["action"], c["username"], c["public_key"]) for c in snapshot["changes"]] == [
+            ("grant", "testuser", KEY_A)
+        ]
+        assert snapshot["version"] == snapshot["changes"][0]["version"]
+
+        self._add_key(client, auth_headers, KEY_B)
+        client.delete(f"/api/v1/users/me/ssh-keys/{first_key['id']}", headers=auth_headers)
+        delta = client.get(
+            self._url(node_with_devices),
+            params={"since": snapshot["version"], "timeout": 0},
+            headers=real_admin_headers,
+        ).json()
+
+        assert delta["full"] is False
+        assert [(c["action"], c["public_key"]) for c in delta["changes"]] == [
+            ("revoke", KEY_A),
+            ("grant", KEY_B),
+        ]
+        assert delta["version"] == delta["changes"][-1]["version"] > snapshot["version"]
+
+    def test_timeout_without_changes(
+        self, client: TestClient, real_admin_headers, node_with_devices
+    ):
+        """Test that a poll with nothing new returns no changes at the same version."""
+        snapshot = client.get(self._url(node_with_devices), headers=real_admin_headers).json()
+
+        response = client.get(
+            self._url(node_with_devices),
+            params={"since": snapshot["version"], "timeout": 0.1},
+            headers=real_admin_headers,
+        )
+
+        assert response.status_code == 200
+        assert response.json()["changes"] == []
+        assert response.json()["version"] == snapshot["version"] == 0
+
+    def test_node_access_key_reads_only_agent_endpoints(
+        self, client: TestClient, real_admin_headers, node_with_devices
+    ):
+        """Test that a node_access key can poll nodes but not use other admin endpoints."""
+        headers = self._agent_headers(client, real_admin_headers)
+
+        feed = client.get(self._url(node_with_devices), headers=headers)
+        keys = client.get(f"/api/v1/nodes/{node_with_devices.id}/authorized_keys", headers=headers)
+        nodes = client.get("/api/v1/nodes/", headers=headers)
+        audit = client.get("/api/v1/audit-logs/", headers=headers)
+
+        assert feed.status_code == keys.status_code == 200
+        assert nodes.status_code == audit.status_code == 403
+
+    def test_unchanged_keys_skip_write_guard(
+        self, client: TestClient, db_session, auth_headers, real_admin_headers, node_with_devices, monkeypatch
+    ):
+        """Test that re-checking unchanged authorized keys doesn't take the write lock."""
+        from app.services import ssh_access_service
+
+        self._add_key(client, auth_headers, KEY_A)
+        TestAuthorizedKeys()._reserve_now(db_session, node_with_devices, "testuser", (-1, 1))
+        snapshot = client.get(self._url(node_with_devices), headers=real_admin_headers).json()
+        guarded = []
+        guard = ssh_access_service.with_node_write_guard
+
+        def recording_guard(db, node_ids, operation):
+            guarded.append(list(node_ids))
+            return guard(db, node_ids, operation)
+
+        monkeypatch.setattr(ssh_access_service, "with_node_write_guard", recording_guard)
+        ssh_access_service.clear_sync_state()
+        delta = client.get(
+            self._url(node_with_devices),
+            params={"since": snapshot["version"], "timeout": 0},
+            headers=real_admin_headers,
+        ).json()
+
+        assert delta["changes"] == []
+        assert guarded == []
+
+        self._add_key(client, auth_headers, KEY_B)
+        client.get(
+            self._url(node_with_devices),
+            params={"since": snapshot["version"], "timeout": 0},
+            headers=real_admin_headers,
+        )
+        assert guarded == [[node_with_devices.id]]
+
+    def test_long_poll_woken_by_change(
+        self, client: TestClient, db_session, real_admin_headers, node_with_devices, monkeypatch
+    ):
+        """Test that a waiting poll answers as soon as the node's access changes."""
+        from app.crud import crud_user
+        from app.schemas.user import SSHKeyCreate
+        from app.services import auth_service, ssh_access_service
+
+        TestAuthorizedKeys()._reserve_now(db_session, node_with_devices, "admin", (-1, 1))
+        snapshot = client.get(self._url(node_with_devices), headers=real_admin_headers).json()
+        checked, committed = threading.Event(), threading.Event()
+        get_changes = ssh_access_service.get_changes
+
+        def get_changes_and_signal(*args):
+            # The test shares one session with the app, so take turns using it
+            if checked.is_set():
+                committed.wait(5)
+            delta = get_changes(*args)
+            checked.set()
+            return delta
+
+        monkeypatch.setattr(ssh_access_service, "get_changes", get_changes_and_signal)
+        result = {}
+
+        def poll():
+            result["response"] = client.get(
+                self._url(node_with_devices),
+                params={"since": snapshot["version"], "timeout": 30},
+                headers=real_admin_headers,
+            )
+
+        poller = threading.Thread(target=poll)
+        started = time.monotonic()
+        poller.start()
+        assert checked.wait(5)
+        admin = crud_user.get_user_by_username(db_session, "admin")
+        auth_service.add_ssh_key(db_session, admin.id, SSHKeyCreate(public_key=KEY_B))
+        committed.set()
+        poller.join(10)
+
+        assert not poller.is_alive()
+        assert time.monotonic() - started < 10
+        assert [c["action"] for c in result["response"].json()["changes"]] == ["grant"]
+
+    def test_agent_applies_deltas(
+        self, client: TestClient, db_session, auth_headers, real_admin_headers, node_with_devices, tmp_path
+    ):
+        """Test that the reference agent keeps its block in sync and other lines intact."""
+        import importlib.util
+        from pathlib import Path
+
+        spec = importlib.util.spec_from_file_location(
+            "ssh_access_agent", Path(__file__).parent.parent / "scripts" / "ssh_access_agent.py"
+        )
+        agent_module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(agent_module)
+
+        path = tmp_path / "authorized_keys"
+        path.write_text("ssh-rsa AAAAB3NzaC1yc2EAAAADAQABAAABAQ== ops@bastion\n")
+        agent = agent_module.SSHAccessAgent(
+            client,
+            node_with_devices.id,
+            path,
+            headers=self._agent_headers(client, real_admin_headers),
+            timeout=0,
+        )
+        first_key = self._add_key(client, auth_headers, KEY_A).json()
+        TestAuthorizedKeys()._reserve_now(db_session, node_with_devices, "testuser", (-1, 1))
+
+        assert agent.poll_once() == 1
+        assert KEY_A in path.read_text()
+
+        self._add_key(client, auth_headers, KEY_B)
+        client.delete(f"/api/v1/users/me/ssh-keys/{first_key['id']}", headers=auth_headers)
+        assert agent.poll_once() == 2
+        assert agent.poll_once() == 0
+
+        content = path.read_text()
+        assert content.startswith("ssh-rsa AAAAB3NzaC1yc2EAAAADAQABAAABAQ== ops@bastion\n")
+        assert KEY_B in content and KEY_A not in content
+        assert oct(path.stat().st_mode & 0o777) == "0o600"
@@ -0,0 +1,1466 @@
+"""
+Unit tests for reservation APIs and conflict detection.
+"""
+
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.crud.reservation_index import reservation_index
+from app.models.reservation import Reservation, ReservationType
+from app.schemas.reservation import ReservationCreate
+from app.services import reservation_service
+
+BASE_TIME = datetime(2030, 1, 1, 8, 0, 0)
+
+
+def reservation_payload(node, hours=(0, 2), device_indexes=None):
+    """Build a reservation request body relative to BASE_TIME."""
+    payload = {
+        "node_id": node.id,
+        "start_time": (BASE_TIME + timedelta(hours=hours[0])).isoformat(),
+        "end_time": (BASE_TIME + timedelta(hours=hours[1])).isoformat(),
+        "type": "machine",
+    }
+    if device_indexes is not None:
+        payload["type"] = "device"
+        payload["device_ids"] = [node.devices[i].id for i in device_indexes]
+    return payload
+
+
+class TestReservationConflicts:
+    """Tests for conflict detection on POST /api/v1/reservations"""
+
+    def test_device_reservations_on_different_devices(
+        self, client: TestClient, auth_headers, node_with_devices
+    ):
+        """Test that disjoint device sets can share a time window."""
+        first = client.post(
+            "/api/v1/reservations/",
+            headers=auth_headers,
+            json=reservation_payload(node_with_devices, device_indexes=[0, 1]),
+        )
+        second = client.post(
+            "/api/v1/reservations/",
+            headers=auth_headers,
+            json=reservation_payload(node_with_devices, device_indexes=[2, 3]),
+        )
+
+        assert first.status_code == 201
+        assert second.status_code == 201
+
+    def test_device_overlap_conflict(
+        self, client: TestClient, auth_headers, node_with_devices
+    ):
+        """Test that overlapping device reservations conflict."""
+        client.post(
+            "/api/v1/reservations/",
+            headers=auth_headers,
+            json=reservation_payload(node_with_devices, device_indexes=[0, 1]),
+        )
+        response = client.post(
+            "/api/v1/reservations/",
+            headers=auth_headers,
+            json=reservation_payload(node_with_devices, hours=(1, 3), device_indexes=[1]),
+        )
+
+        assert response.status_code == 409
+
+    def test_machine_conflicts_with_device(
+        self, client: TestClient, auth_headers, node_with_devices
+    ):
+        """Test that a machine reservation conflicts with any device reservation."""
+        client.post(
+            "/api/v1/reservations/",
+            headers=auth_headers,
+            json=reservation_payload(node_with_devices, device_indexes=[3]),
+        )
+        response = client.post(
+            "/api/v1/reservations/",
+            headers=auth_headers,
+            json=reservation_payload(node_with_devices, hours=(1, 5)),
+        )
+
+        assert response.status_code == 409
+
+    def test_conflict_report_lists_everything(
+        self, client: TestClient, auth_headers, node_with_devices
+    ):
+        """Test that the 409 lists every clash and the earliest window that fits."""
+        ids = [
+            client.post(
+                "/api/v1/reservations/",
+                headers=auth_headers,
+                json=reservation_payload(node_with_devices, hours, device_indexes=[index]),
+            ).json()["id"]
+            for hours, index in [((0, 2), 0), ((1, 3), 1), ((0, 9), 2), ((4, 5), 0)]
+        ]
+
+        response = client.post(
+            "/api/v1/reservations/",
+            headers=auth_headers,
+            json=reservation_payload(node_with_devices, device_indexes=[0, 1]),
+        )
+
+        assert response.status_code == 409
+        detail = response.json()["detail"]
+        assert detail["message"] == f"Reservation conflict with existing reservation ID: {ids[0]}"
+        assert [(c["reservation_id"], c["device_ids"]) for c in detail["conflicts"]] == [
+            (ids[0], [node_with_devices.devices[0].id]),
+            (ids[1], [node_with_devices.devices[1].id]),
+        ]
+        # 11:00-12:00 is too short; device 2 is busy but wasn't requested
+        assert detail["next_available_start"] == "2030-01-01T13:00:00"
+
+    def test_conflict_report_for_machine_request(
+        self, client: TestClient, auth_headers, node_with_devices
+    ):
+        """Test that a machine request waits for every device and reports them."""
+        existing = client.post(
+            "/api/v1/reservations/",
+            headers=auth_headers,
+            json=reservation_payload(node_with_devices, hours=(1, 3), device_indexes=[2, 3]),
+        ).json()
+
+        response = client.post(
+            "/api/v1/reservations/",
+            headers=auth_headers,
+            json=reservation_payload(node_with_devices),
+        )
+
+        detail = response.json()["detail"]
+        assert detail["conflicts"][0]["reservation_id"] == existing["id"]
+        assert sorted(detail["conflicts"][0]["device_ids"]) == [
+            node_with_devices.devices[2].id,
+            node_with_devices.devices[3].id,
+        ]
+        assert detail["next_available_start"] == "2030-01-01T11:00:00"
+
+    def test_back_to_back_reservations(
+        self, client: TestClient, auth_headers, node_with_devices
+    ):
+        """Test that a reservation may start exactly when another ends."""
+        client.post(
+            "/api/v1/reservations/",
+            headers=auth_headers,
+            json=reservation_payload(node_with_devices),
+        )
+        response = client.post(
+            "/api/v1/reservations/",
+            headers=auth_headers,
+            json=reservation_payload(node_with_devices, hours=(2, 4)),
+        )
+
+        assert response.status_code == 201
+
+    def test_slot_reusable_after_delete(
+        self, client: TestClient, auth_headers, node_with_devices
+    ):
+        """Test that deleting a reservation frees its slot."""
+        created = client.post(
+            "/api/v1/reservations/",
+            headers=auth_headers,
+            json=reservation_payload(node_with_devices),
+        ).json()
+        client.delete(f"/api/v1/reservations/{created['id']}", headers=auth_headers)
+
+        response = client.post(
+            "/api/v1/reservations/",
+            headers=auth_headers,
+            json=reservation_payload(node_with_devices, device_indexes=[0]),
+        )
+
+        assert response.status_code == 201
+
+
+class TestReservationIndex:
+    """Tests for the in-memory reservation interval index"""
+
+    def test_index_tracks_writes(self, db_session, node_with_devices):
+        """Test that the index answers from memory after create and delete."""
+        from app.crud import crud_reservation
+        from app.models.reservation import ReservationType
+        from app.schemas.reservation import ReservationCreate
+
+        reservation = crud_reservation.create_reservation(
+            db_session,
+            ReservationCreate(
+                node_id=node_with_devices.id,
+                start_time=BASE_TIME,
+                end_time=BASE_TIME + timedelta(hours=2),
+                type=ReservationType.DEVICE,
+                device_ids=[node_with_devices.devices[0].id],
+            ),
+            user_id=None,
+        )
+        assert reservation_index.ensure_node(db_session, node_with_devices.id)
+
+        conflicts = reservation_index.find_conflicts(
+            node_with_devices.id,
+            BASE_TIME + timedelta(hours=1),
+            BASE_TIME + timedelta(hours=3),
+        )
+        assert conflicts == [reservation.id]
+        assert reservation_index.find_conflicts(
+            node_with_devices.id,
+            BASE_TIME,
+            BASE_TIME + timedelta(hours=2),
+            [node_with_devices.devices[1].id],
+        ) == []
+
+        crud_reservation.delete_reservation(db_session, reservation.id)
+        assert reservation_index.ensure_node(db_session, node_with_devices.id)
+        assert reservation_index.find_conflicts(
+            node_with_devices.id, BASE_TIME, BASE_TIME + timedelta(hours=2)
+        ) == []
+
+    def test_stale_index_falls_back_to_sql(self, db_session, node_with_devices):
+        """Test that writes the index did not see make it report stale."""
+        from app.crud import crud_reservation
+        from app.models.reservation import Reservation, ReservationType
+
+        assert reservation_index.ensure_node(db_session, node_with_devices.id)
+
+        # Simulate a write from another process
+        db_session.add(
+            Reservation(
+                node_id=node_with_devices.id,
+                start_time=BASE_TIME,
+                end_time=BASE_TIME + timedelta(hours=2),
+                type=ReservationType.MACHINE,
+            )
+        )
+        db_session.commit()
+
+        assert not reservation_index.ensure_node(db_session, node_with_devices.id)
+        conflict = crud_reservation.check_conflict(
+            db_session,
+            node_id=node_with_devices.id,
+            start_time=BASE_TIME + timedelta(hours=1),
+            end_time=BASE_TIME + timedelta(hours=3),
+        )
+        assert conflict is not None
+
+
+class TestSqlConflictQuery:
+    """Tests for the set-based SQL conflict query"""
+
+    def _reserve(self, db_session, node, hours, device_indexes=None):
+        from app.models.reservation import Reservation, ReservationType
+
+        reservation = Reservation(
+            node_id=node.id,
+            start_time=BASE_TIME + timedelta(hours=hours[0]),
+            end_time=BASE_TIME + timedelta(hours=hours[1]),
+            type=ReservationType.MACHINE if device_indexes is None else ReservationType.DEVICE,
+        )
+        for i in device_indexes or []:
+            reservation.reserved_devices.append(node.devices[i])
+        db_session.add(reservation)
+        db_session.commit()
+        return reservation.id
+
+    def test_conflict_rules(self, db_session, node_with_devices):
+        """Test machine/device conflict rules against the joined query."""
+        from app.crud.crud_reservation import find_conflicting_reservation_id
+
+        node = node_with_devices
+        devices = [device.id for device in node.devices]
+        device_res = self._reserve(db_session, node, (0, 2), device_indexes=[0, 1])
+        machine_res = self._reserve(db_session, node, (4, 6))
+
+        def find(hours, device_ids=None):
+            return find_conflicting_reservation_id(
+                db_session,
+                node.id,
+                BASE_TIME + timedelta(hours=hours[0]),
+                BASE_TIME + timedelta(hours=hours[1]),
+                device_ids,
+            )
+
+        assert find((1, 3), [devices[1], devices[2]]) == device_res
+        assert find((1, 3), [devices[2], devices[3]]) is None
+        assert find((1, 3)) == device_res
+        assert find((5, 7), [devices[3]]) == machine_res
+        assert find((2, 4)) is None
+        assert find((0, 6), [devices[0]]) == device_res
+
+
+class TestFreeSlotSearch:
+    """Tests for GET /api/v1/reservations/slots"""
+
+    def _search(self, client, headers, **params):
+        params.setdefault("earliest_start", BASE_TIME.isoformat())
+        return client.get("/api/v1/reservations/slots", headers=headers, params=params)
+
+    def test_free_node_starts_immediately(
+        self, client: TestClient, auth_headers, node_with_devices
+    ):
+        """Test that an idle node is proposed at the earliest start."""
+        response = self._search(client, auth_headers, duration_minutes=60, device_count=2)
+
+        assert response.status_code == 200
+        candidates = response.json()
+        assert len(candidates) == 1
+        assert candidates[0]["start_time"] == BASE_TIME.isoformat()
+        assert len(candidates[0]["device_ids"]) == 2
+
+    def test_waits_for_enough_devices(
+        self, client: TestClient, auth_headers, node_with_devices
+    ):
+        """Test that the search skips windows with too few free devices."""
+        client.post(
+            "/api/v1/reservations/",
+            headers=auth_headers,
+            json=reservation_payload(node_with_devices, hours=(0, 2), device_indexes=[0, 1]),
+        )
+        client.post(
+            "/api/v1/reservations/",
+            headers=auth_headers,
+            json=reservation_payload(node_with_devices, hours=(1, 4), device_indexes=[2]),
+        )
+
+        # Three devices are only free together from hour 2 (devices 0, 1, 3)
+        response = self._search(client, auth_headers, duration_minutes=60, device_count=3)
+        candidate = response.json()[0]
+        assert candidate["start_time"] == (BASE_TIME + timedelta(hours=2)).isoformat()
+        expected = [node_with_devices.devices[i].id for i in (0, 1, 3)]
+        assert candidate["device_ids"] == expected
+
+        # The whole machine is only free once every reservation has ended
+        response = self._search(client, auth_headers, duration_minutes=60, type="machine")
+        assert response.json()[0]["start_time"] == (BASE_TIME + timedelta(hours=4)).isoformat()
+
+    def test_gap_must_fit_duration(
+        self, client: TestClient, auth_headers, node_with_devices
+    ):
+        """Test that gaps shorter than the requested duration are skipped."""
+        client.post(
+            "/api/v1/reservations/",
+            headers=auth_headers,
+            json=reservation_payload(node_with_devices, hours=(1, 2)),
+        )
+
+        response = self._search(client, auth_headers, duration_minutes=90, type="machine")
+        assert response.json()[0]["start_time"] == (BASE_TIME + timedelta(hours=2)).isoformat()
+
+    def test_model_filter(self, client: TestClient, auth_headers, node_with_devices):
+        """Test that nodes without the requested model are not proposed."""
+        response = self._search(
+            client, auth_headers, duration_minutes=60, model_name="OtherModel"
+        )
+        assert response.json() == []
+
+    def test_earliest_common_start(self):
+        """Test the boundary sweep directly."""
+        from app.services.scheduling_service import earliest_common_start
+
+        t = lambda h: BASE_TIME + timedelta(hours=h)
+        ranges = {
+            "a": [(t(0), t(1)), (t(5), t(9))],
+            "b": [(t(2), t(6))],
+            "c": [(t(6), t(9))],
+        }
+        assert earliest_common_start(ranges, 2) == (t(5), ["b", "a"])
+        assert earliest_common_start(ranges, 3) == (t(6), ["b", "a", "c"])
+        assert earliest_common_start(ranges, 4) is None
+
+
+class TestBatchReservations:
+    """Tests for POST /api/v1/reservations/batch"""
+
+    def test_batch_created_atomically(
+        self, client: TestClient, auth_headers, node_with_devices, db_session
+    ):
+        """Test that a valid batch creates every reservation and audit entry."""
+        from app.models.audit_log import AuditLog
+
+        batch = [
+            reservation_payload(node_with_devices, hours=(0, 2), device_indexes=[i])
+            for i in range(4)
+        ] + [reservation_payload(node_with_devices, hours=(2, 3))]
+
+        response = client.post(
+            "/api/v1/reservations/batch",
+            headers=auth_headers,
+            json={"reservations": batch},
+        )
+
+        assert response.status_code == 201
+        data = response.json()
+        assert len(data) == 5
+        assert [len(r["reserved_devices"]) for r in data] == [1, 1, 1, 1, 0]
+        audit_count = (
+            db_session.query(AuditLog).filter(AuditLog.action == "create_reservation").count()
+        )
+        assert audit_count == 5
+
+    def test_batch_reports_all_conflicts(
+        self, client: TestClient, auth_headers, node_with_devices
+    ):
+        """Test that conflicts with the store and within the batch are all listed."""
+        existing = client.post(
+            "/api/v1/reservations/",
+            headers=auth_headers,
+            json=reservation_payload(node_with_devices, device_indexes=[0]),
+        ).json()
+
+        batch = [
+            reservation_payload(node_with_devices, hours=(1, 2), device_indexes=[0]),
+            reservation_payload(node_with_devices, hours=(4, 6), device_indexes=[1]),
+            reservation_payload(node_with_devices, hours=(5, 7)),
+            {**reservation_payload(node_with_devices), "node_id": 9999},
+        ]
+        response = client.post(
+            "/api/v1/reservations/batch",
+            headers=auth_headers,
+            json={"reservations": batch},
+        )
+
+        assert response.status_code == 409
+        conflicts = response.json()["detail"]["conflicts"]
+        assert {(c["index"], c["reservation_id"], c["batch_index"]) for c in conflicts} == {
+            (0, existing["id"], None),
+            (2, None, 1),
+            (3, None, None),
+        }
+
+        # Nothing from the batch was written
+        listed = client.get("/api/v1/reservations/", headers=auth_headers).json()
+        assert [r["id"] for r in listed] == [existing["id"]]
+
+    def test_batch_empty(self, client: TestClient, auth_headers):
+        """Test that an empty batch is rejected."""
+        response = client.post(
+            "/api/v1/reservations/batch",
+            headers=auth_headers,
+            json={"reservations": []},
+        )
+        assert response.status_code == 422
+
+
+class TestReservationPagination:
+    """Tests for cursor pagination of GET /api/v1/reservations"""
+
+    def _walk(self, client, headers, path, limit):
+        ids, cursor = [], None
+        while True:
+            params = {"limit": limit}
+            if cursor:
+                params["cursor"] = cursor
+            response = client.get(path, headers=headers, params=params)
+            assert response.status_code == 200
+            ids.extend(item["id"] for item in response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                return ids
+
+    def test_cursor_pages_cover_everything_once(
+        self, client: TestClient, auth_headers, node_with_devices
+    ):
+        """Test that cursor pages follow (start_time, id) order, ties included."""
+        created = []
+        for day, device_index in [(0, 0), (1, 0), (1, 1), (1, 2), (2, 0)]:
+            response = client.post(
+                "/api/v1/reservations/",
+                headers=auth_headers,
+                json=reservation_payload(
+                    node_with_devices,
+                    hours=(24 * day, 24 * day + 1),
+                    device_indexes=[device_index],
+                ),
+            )
+            created.append((day, response.json()["id"]))
+        expected = [rid for _, rid in sorted(created, reverse=True)]
+
+        for path in ("/api/v1/reservations/", "/api/v1/reservations/my"):
+            assert self._walk(client, auth_headers, path, limit=2) == expected
+
+    def test_offset_mode_still_works(
+        self, client: TestClient, auth_headers, node_with_devices
+    ):
+        """Test that skip/limit keep working and announce the next cursor."""
+        for day in range(3):
+            client.post(
+                "/api/v1/reservations/",
+                headers=auth_headers,
+                json=reservation_payload(node_with_devices, hours=(24 * day, 24 * day + 1)),
+            )
+
+        first = client.get("/api/v1/reservations/", headers=auth_headers, params={"limit": 2})
+        rest = client.get(
+            "/api/v1/reservations/",
+            headers=auth_headers,
+            params={"limit": 2, "cursor": first.headers["X-Next-Cursor"]},
+        )
+        skipped = client.get(
+            "/api/v1/reservations/", headers=auth_headers, params={"skip": 2, "limit": 2}
+        )
+
+        assert len(first.json()) == 2
+        assert rest.json() == skipped.json()
+        assert "X-Next-Cursor" not in rest.headers
+
+    def test_invalid_cursor(self, client: TestClient, auth_headers):
+        """Test that a malformed cursor is rejected."""
+        response = client.get(
+            "/api/v1/reservations/", headers=auth_headers, params={"cursor": "not-a-cursor"}
+        )
+        assert response.status_code == 400
+
+
+class TestRecurringReservations:
+    """Tests for /api/v1/reservations/recurring"""
+
+    # BASE_TIME is a Tuesday; the series runs 20:00-23:00 on weeknights
+    NIGHT = BASE_TIME + timedelta(hours=12)
+
+    def _series(self, node, **rule):
+        payload = {
+            "node_id": node.id,
+            "start_time": self.NIGHT.isoformat(),
+            "end_time": (self.NIGHT + timedelta(hours=3)).isoformat(),
+            "type": "device",
+            "device_ids": [device.id for device in node.devices[:2]],
+            "frequency": "weekly",
+            "by_weekday": [0, 1, 2, 3, 4],
+            "count": 20,
+        }
+        payload.update(rule)
+        return payload
+
+    def _create(self, client, headers, node, **rule):
+        return client.post(
+            "/api/v1/reservations/recurring", headers=headers, json=self._series(node, **rule)
+        )
+
+    def _one_off(self, node, start, hours=1, device_indexes=(0,)):
+        return {
+            "node_id": node.id,
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(hours=hours)).isoformat(),
+            "type": "device",
+            "device_ids": [node.devices[i].id for i in device_indexes],
+        }
+
+    def test_occurrences_expand_inside_window(
+        self, client: TestClient, auth_headers, node_with_devices
+    ):
+        """Test that only weeknight occurrences inside the window are returned."""
+        series = self._create(client, auth_headers, node_with_devices)
+        assert series.status_code == 201
+        assert series.json()["by_weekday"] == [0, 1, 2, 3, 4]
+
+        response = client.get(
+            f"/api/v1/reservations/recurring/{series.json()['id']}/occurrences",
+            headers=auth_headers,
+            params={
+                "start": (BASE_TIME + timedelta(days=3)).isoformat(),
+                "end": (BASE_TIME + timedelta(days=7)).isoformat(),
+            },
+        )
+
+        assert response.status_code == 200
+        starts = [item["start_time"] for item in response.json()]
+        # Friday, then (skipping the weekend) Monday
+        assert starts == ["2030-01-04T20:00:00", "2030-01-07T20:00:00"]
+
+    def test_series_blocks_one_off_reservations(
+        self, client: TestClient, auth_headers, node_with_devices
+    ):
+        """Test that occurrences conflict with one-off reservations, weekends don't."""
+        series_id = self._create(client, auth_headers, node_with_devices).json()["id"]
+
+        thursday = client.post(
+            "/api/v1/reservations/",
+            headers=auth_headers,
+            json=self._one_off(node_with_devices, self.NIGHT + timedelta(days=2, hours=1)),
+        )
+        saturday = client.post(
+            "/api/v1/reservations/",
+            headers=auth_headers,
+            json=self._one_off(node_with_devices, self.NIGHT + timedelta(days=4, hours=1)),
+        )
+        other_device = client.post(
+            "/api/v1/reservations/",
+            headers=auth_headers,
+            json=self._one_off(
+                node_with_devices, self.NIGHT + timedelta(days=2), device_indexes=(3,)
+            ),
+        )
+
+        assert thursday.status_code == 409
+        detail = thursday.json()["detail"]
+        assert f"recurring reservation ID: {series_id}" in detail["message"]
+        assert [c["recurring_reservation_id"] for c in detail["conflicts"]] == [series_id]
+        assert saturday.status_code == 201
+        assert other_device.status_code == 201
+
+    def test_series_is_checked_as_a_unit(
+        self, client: TestClient, auth_headers, node_with_devices
+    ):
+        """Test that one conflicting occurrence rejects the whole series."""
+        existing = client.post(
+            "/api/v1/reservations/",
+            headers=auth_headers,
+            json=self._one_off(node_with_devices, self.NIGHT + timedelta(days=13), hours=2),
+        ).json()
+
+        response = self._create(client, auth_headers, node_with_devices)
+
+        assert response.status_code == 409
+        assert f"existing reservation ID: {existing['id']}" in response.json()["detail"]
+        listed = client.get("/api/v1/reservations/recurring", headers=auth_headers)
+        assert listed.json() == []
+
+    def test_series_conflicts_with_other_series(
+        self, client: TestClient, auth_headers, node_with_devices
+    ):
+        """Test that overlapping series are rejected even when first occurrences differ."""
+        friday = self.NIGHT + timedelta(days=3)
+        first = self._create(
+            client,
+            auth_headers,
+            node_with_devices,
+            start_time=friday.isoformat(),
+            end_time=(friday + timedelta(hours=3)).isoformat(),
+            by_weekday=[4],
+        )
+        second = self._create(
+            client,
+            auth_headers,
+            node_with_devices,
+            start_time=(self.NIGHT + timedelta(days=7)).isoformat(),
+            end_time=(self.NIGHT + timedelta(days=7, hours=1)).isoformat(),
+            type="machine",
+            device_ids=None,
+            frequency="daily",
+            by_weekday=None,
+            count=5,
+        )
+
+        assert first.status_code == 201
+        assert second.status_code == 409
+        assert "2030-01-11T20:00:00" in second.json()["detail"]
+        assert f"recurring reservation ID: {first.json()['id']}" in second.json()["detail"]
+
+    def test_cancel_single_occurrence(
+        self, client: TestClient, auth_headers, node_with_devices
+    ):
+        """Test that a cancelled occurrence frees its slot and is flagged."""
+        series_id = self._create(client, auth_headers, node_with_devices).json()["id"]
+        wednesday = self.NIGHT + timedelta(days=1)
+
+        cancelled = client.delete(
+            f"/api/v1/reservations/recurring/{series_id}/occurrences/{wednesday.isoformat()}",
+            headers=auth_headers,
+        )
+        not_an_occurrence = client.delete(
+            f"/api/v1/reservations/recurring/{series_id}/occurrences/"
+            f"{(wednesday + timedelta(hours=1)).isoformat()}",
+            headers=auth_headers,
+        )
+        booked = client.post(
+            "/api/v1/reservations/",
+            headers=auth_headers,
+            json=self._one_off(node_with_devices, wednesday),
+        )
+        occurrences = client.get(
+            f"/api/v1/reservations/recurring/{series_id}/occurrences",
+            headers=auth_headers,
+            params={"start": BASE_TIME.isoformat(), "end": (BASE_TIME + timedelta(days=3)).isoformat()},
+        ).json()
+
+        assert cancelled.status_code == 204
+        assert not_an_occurrence.status_code == 404
+        assert booked.status_code == 201
+        assert [item["cancelled"] for item in occurrences] == [False, True, False]
+
+    def test_delete_series(self, client: TestClient, auth_headers, node_with_devices):
+        """Test that deleting a series frees all its occurrences."""
+        series_id = self._create(client, auth_headers, node_with_devices).json()["id"]
+
+        deleted = client.delete(f"/api/v1/reservations/recurring/{series_id}", headers=auth_headers)
+        booked = client.post(
+            "/api/v1/reservations/",
+            headers=auth_headers,
+            json=self._one_off(node_with_devices, self.NIGHT + timedelta(days=2)),
+        )
+
+        assert deleted.status_code == 204
+        assert booked.status_code == 201
+
+    def test_start_on_unlisted_weekday_rejected(
+        self, client: TestClient, auth_headers, node_with_devices
+    ):
+        """Test that a weekly start_time must itself be one of the by_weekday days."""
+        # NIGHT is a Tuesday
+        response = self._create(client, auth_headers, node_with_devices, by_weekday=[3, 4])
+
+        assert response.status_code == 422
+        assert client.get("/api/v1/reservations/recurring", headers=auth_headers).json() == []
+
+    def test_unbounded_series_rejected(
+        self, client: TestClient, auth_headers, node_with_devices
+    ):
+        """Test that a rule needs 'until' or 'count'."""
+        response = self._create(client, auth_headers, node_with_devices, count=None)
+        assert response.status_code == 409
+
+
+class TestWaitlist:
+    """Tests for /api/v1/reservations/waitlist"""
+
+    def _join(self, client, headers, node, hours=(0, 2), device_indexes=None, **extra):
+        payload = reservation_payload(node, hours, device_indexes)
+        payload.update(extra)
+        return client.post("/api/v1/reservations/waitlist", headers=headers, json=payload)
+
+    def _block(self, client, headers, node, hours=(0, 2), device_indexes=None):
+        response = client.post(
+            "/api/v1/reservations/",
+            headers=headers,
+            json=reservation_payload(node, hours, device_indexes),
+        )
+        assert response.status_code == 201
+        return response.json()["id"]
+
+    def test_free_window_is_allocated_immediately(
+        self, client: TestClient, auth_headers, node_with_devices
+    ):
+        """Test that joining with a free window books it right away."""
+        response = self._join(client, auth_headers, node_with_devices)
+
+        assert response.status_code == 201
+        data = response.json()
+        assert data["status"] == "allocated"
+        assert data["reservation_id"] is not None
+        assert data["position"] is None
+
+    def test_taken_window_waits_in_fifo_order(
+        self, client: TestClient, auth_headers, admin_headers, node_with_devices
+    ):
+        """Test that conflicting requests queue up with increasing positions."""
+        self._block(client, admin_headers, node_with_devices)
+
+        first = self._join(client, auth_headers, node_with_devices, device_indexes=[0])
+        second = self._join(client, auth_headers, node_with_devices, hours=(1, 3))
+
+        assert first.json()["status"] == "waiting"
+        assert first.json()["position"] == 1
+        assert second.json()["position"] == 2
+
+    def test_release_allocates_in_order(
+        self, client: TestClient, auth_headers, admin_headers, node_with_devices
+    ):
+        """Test that deleting the blocker allocates the head; the rest keep waiting."""
+        blocker = self._block(client, admin_headers, node_with_devices)
+        first = self._join(client, auth_headers, node_with_devices, hours=(1, 3)).json()
+        second = self._join(client, auth_headers, node_with_devices, hours=(1, 2)).json()
+        disjoint = self._join(
+            client, auth_headers, node_with_devices, hours=(0, 1), device_indexes=[0]
+        ).json()
+
+        deleted = client.delete(f"/api/v1/reservations/{blocker}", headers=admin_headers)
+        assert deleted.status_code == 204
+
+        entries = {
+            e["id"]: e
+            for e in client.get("/api/v1/reservations/waitlist", headers=auth_headers).json()
+        }
+        assert entries[first["id"]]["status"] == "allocated"
+        reservation = client.get(
+            f"/api/v1/reservations/{entries[first['id']]['reservation_id']}",
+            headers=auth_headers,
+        ).json()
+        assert reservation["start_time"].startswith("2030-01-01T09:00:00")
+        # Overlaps the allocated entry, so it is still queued - now at the front
+        assert entries[second["id"]]["status"] == "waiting"
+        assert entries[second["id"]]["position"] == 1
+        # Doesn't compete with the first entry, so it fits as well
+        assert entries[disjoint["id"]]["status"] == "allocated"
+
+    def test_priority_served_first(
+        self, client: TestClient, auth_headers, real_admin_headers, node_with_devices
+    ):
+        """Test that a higher priority entry is allocated ahead of older ones."""
+        blocker = self._block(client, auth_headers, node_with_devices)
+        older = self._join(client, auth_headers, node_with_devices).json()
+        urgent = self._join(client, real_admin_headers, node_with_devices, priority=10).json()
+        assert urgent["position"] == 1
+
+        client.delete(f"/api/v1/reservations/{blocker}", headers=auth_headers)
+
+        older = client.get(f"/api/v1/reservations/waitlist/{older['id']}", headers=auth_headers)
+        urgent = client.get(
+            f"/api/v1/reservations/waitlist/{urgent['id']}", headers=real_admin_headers
+        )
+        assert urgent.json()["status"] == "allocated"
+        assert older.json()["status"] == "waiting"
+
+    def test_release_skips_conflict_reports(
+        self, client: TestClient, auth_headers, admin_headers, node_with_devices, monkeypatch
+    ):
+        """Test that entries that still don't fit are skipped without building a report."""
+        from app.crud import crud_reservation
+
+        blocker = self._block(client, admin_headers, node_with_devices, hours=(0, 1))
+        self._block(client, admin_headers, node_with_devices, hours=(2, 3))
+        fits = self._join(client, auth_headers, node_with_devices, hours=(0, 1)).json()
+        still_blocked = self._join(client, auth_headers, node_with_devices, hours=(0, 3)).json()
+
+        def no_report(*args, **kwargs):
+            raise AssertionError("conflict report built for a waitlist entry")
+
+        monkeypatch.setattr(crud_reservation, "get_conflict_report", no_report)
+        deleted = client.delete(f"/api/v1/reservations/{blocker}", headers=admin_headers)
+
+        assert deleted.status_code == 204
+        entries = {
+            e["id"]: e
+            for e in client.get("/api/v1/reservations/waitlist", headers=auth_headers).json()
+        }
+        assert entries[fits["id"]]["status"] == "allocated"
+        assert entries[still_blocked["id"]]["status"] == "waiting"
+
+    def test_entry_with_removed_device_expires(
+        self, client: TestClient, db_session, auth_headers, admin_headers, node_with_devices
+    ):
+        """Test that an entry whose device is gone is closed out on release."""
+        blocker = self._block(client, admin_headers, node_with_devices)
+        entry = self._join(client, auth_headers, node_with_devices, device_indexes=[3]).json()
+        db_session.delete(node_with_devices.devices[3])
+        db_session.commit()
+
+        client.delete(f"/api/v1/reservations/{blocker}", headers=admin_headers)
+
+        entry = client.get(f"/api/v1/reservations/waitlist/{entry['id']}", headers=auth_headers)
+        assert entry.json()["status"] == "expired"
+        assert entry.json()["reservation_id"] is None
+
+    def test_priority_requires_admin(
+        self, client: TestClient, auth_headers, node_with_devices
+    ):
+        """Test that regular users can't jump the queue."""
+        response = self._join(client, auth_headers, node_with_devices, priority=5)
+        assert response.status_code == 403
+
+    def test_cancelled_entry_is_skipped(
+        self, client: TestClient, auth_headers, admin_headers, node_with_devices
+    ):
+        """Test that a cancelled entry is not allocated on release."""
+        blocker = self._block(client, admin_headers, node_with_devices)
+        entry = self._join(client, auth_headers, node_with_devices).json()
+
+        cancelled = client.delete(
+            f"/api/v1/reservations/waitlist/{entry['id']}", headers=auth_headers
+        )
+        client.delete(f"/api/v1/reservations/{blocker}", headers=admin_headers)
+
+        assert cancelled.status_code == 204
+        entry = client.get(f"/api/v1/reservations/waitlist/{entry['id']}", headers=auth_headers)
+        assert entry.json()["status"] == "cancelled"
+
+    def test_past_window_rejected(
+        self, client: TestClient, auth_headers, node_with_devices
+    ):
+        """Test that only future windows can be waitlisted."""
+        payload = reservation_payload(node_with_devices)
+        payload["start_time"] = "2020-01-01T08:00:00"
+        payload["end_time"] = "2020-01-01T10:00:00"
+
+        response = client.post(
+            "/api/v1/reservations/waitlist", headers=auth_headers, json=payload
+        )
+
+        assert response.status_code == 400
+
+    def test_other_users_entries_hidden(
+        self, client: TestClient, auth_headers, admin_headers, node_with_devices
+    ):
+        """Test that entries are only visible to their owner."""
+        entry = self._join(client, auth_headers, node_with_devices).json()
+
+        response = client.get(
+            f"/api/v1/reservations/waitlist/{entry['id']}", headers=admin_headers
+        )
+
+        assert response.status_code == 403
+
+
+class TestPlacement:
+    """Tests for POST /api/v1/reservations/place"""
+
+    @pytest.fixture
+    def second_node(self, db_session):
+        """An idle node with four devices next to npu-node-01."""
+        from app.crud import crud_node
+        from app.schemas.node import DeviceCreate, NodeCreate
+
+        node = crud_node.create_node(
+            db_session, NodeCreate(name="npu-node-02", ip_address="10.0.0.2")
+        )
+        for index in range(4):
+            crud_node.create_device(
+                db_session, DeviceCreate(device_index=index, model_name="Ascend910B"), node.id
+            )
+        db_session.refresh(node)
+        return node
+
+    def _place(self, client, headers, device_count, type="device"):
+        return client.post(
+            "/api/v1/reservations/place",
+            headers=headers,
+            json={
+                "start_time": BASE_TIME.isoformat(),
+                "end_time": (BASE_TIME + timedelta(hours=2)).isoformat(),
+                "type": type,
+                "device_count": device_count,
+            },
+        )
+
+    def test_small_job_fills_partly_used_node(
+        self, client: TestClient, auth_headers, node_with_devices, second_node
+    ):
+        """Test that devices are packed onto the busy node, keeping the idle one whole."""
+        client.post(
+            "/api/v1/reservations/",
+            headers=auth_headers,
+            json=reservation_payload(second_node, device_indexes=[0]),
+        )
+
+        response = self._place(client, auth_headers, 2)
+
+        assert response.status_code == 201
+        data = response.json()
+        assert data["node_id"] == second_node.id
+        assert [d["id"] for d in data["reserved_devices"]] == [
+            second_node.devices[1].id,
+            second_node.devices[2].id,
+        ]
+
+    def test_large_job_takes_whole_free_node(
+        self, client: TestClient, auth_headers, node_with_devices, second_node
+    ):
+        """Test that a job needing a full node still finds one after small jobs."""
+        for _ in range(3):
+            assert self._place(client, auth_headers, 1).status_code == 201
+
+        response = self._place(client, auth_headers, 4)
+
+        assert response.status_code == 201
+        nodes = {r["node_id"] for r in client.get(
+            "/api/v1/reservations/my", headers=auth_headers
+        ).json()}
+        assert nodes == {node_with_devices.id, second_node.id}
+
+    def test_machine_placement_needs_idle_node(
+        self, client: TestClient, auth_headers, node_with_devices, second_node
+    ):
+        """Test that whole-node requests skip nodes with any device in use."""
+        client.post(
+            "/api/v1/reservations/",
+            headers=auth_headers,
+            json=reservation_payload(node_with_devices, device_indexes=[3]),
+        )
+
+        response = self._place(client, auth_headers, 1, type="machine")
+
+        assert response.status_code == 201
+        assert response.json()["node_id"] == second_node.id
+
+    def test_no_capacity_conflict(
+        self, client: TestClient, auth_headers, node_with_devices
+    ):
+        """Test that 409 is returned when no node has enough free devices."""
+        response = self._place(client, auth_headers, 5)
+        assert response.status_code == 409
+
+    def test_replans_when_choice_is_taken(
+        self, client: TestClient, db_session, auth_headers, node_with_devices, second_node,
+        monkeypatch,
+    ):
+        """Test that losing the chosen devices to a concurrent writer triggers a re-plan."""
+        from app.services import scheduling_service
+
+        choose = scheduling_service.choose_placement
+        calls = []
+
+        def racing_choose(db, *args, **kwargs):
+            choice = choose(db, *args, **kwargs)
+            if not calls:
+                # Another request books the chosen devices first
+                reservation_service.create_reservation(
+                    db,
+                    ReservationCreate(
+                        node_id=choice["node_id"],
+                        start_time=BASE_TIME,
+                        end_time=BASE_TIME + timedelta(hours=2),
+                        type=ReservationType.DEVICE,
+                        device_ids=choice["device_ids"],
+                    ),
+                    user_id=1,
+                )
+            calls.append(choice)
+            return choice
+
+        monkeypatch.setattr(scheduling_service, "choose_placement", racing_choose)
+
+        response = self._place(client, auth_headers, 4)
+
+        assert response.status_code == 201
+        assert len(calls) == 2
+        assert response.json()["node_id"] != calls[0]["node_id"]
+
+
+class TestUpdateReservation:
+    """Tests for PATCH /api/v1/reservations/{id}"""
+
+    def _create(self, client, headers, node, hours=(0, 2), device_indexes=(0, 1)):
+        response = client.post(
+            "/api/v1/reservations/",
+            headers=headers,
+            json=reservation_payload(node, hours, list(device_indexes)),
+        )
+        assert response.status_code == 201
+        return response.json()
+
+    def _patch(self, client, headers, reservation_id, **changes):
+        return client.patch(
+            f"/api/v1/reservations/{reservation_id}", headers=headers, json=changes
+        )
+
+    def test_extend_checks_only_added_range(
+        self, client: TestClient, auth_headers, node_with_devices, monkeypatch
+    ):
+        """Test that extending checks just the new tail, not the held range."""
+        from app.crud import crud_reservation
+
+        reservation = self._create(client, auth_headers, node_with_devices)
+        checked = []
+        check = crud_reservation.check_conflict
+
+        def recording_check(db, node_id, start_time, end_time, device_ids=None):
+            checked.append((start_time, end_time, device_ids))
+            return check(db, node_id, start_time, end_time, device_ids)
+
+        monkeypatch.setattr(crud_reservation, "check_conflict", recording_check)
+
+        response = self._patch(
+            client,
+            auth_headers,
+            reservation["id"],
+            end_time=(BASE_TIME + timedelta(hours=4)).isoformat(),
+        )
+
+        assert response.status_code == 200
+        assert response.json()["end_time"].startswith("2030-01-01T12:00:00")
+        assert checked == [
+            (
+                BASE_TIME + timedelta(hours=2),
+                BASE_TIME + timedelta(hours=4),
+                [node_with_devices.devices[0].id, node_with_devices.devices[1].id],
+            )
+        ]
+
+    def test_extend_into_other_reservation_conflicts(
+        self, client: TestClient, auth_headers, node_with_devices
+    ):
+        """Test that a clash in the added range is reported and nothing changes."""
+        reservation = self._create(client, auth_headers, node_with_devices)
+        blocker = self._create(
+            client, auth_headers, node_with_devices, hours=(3, 5), device_indexes=(1,)
+        )
+
+        response = self._patch(
+            client,
+            auth_headers,
+            reservation["id"],
+            end_time=(BASE_TIME + timedelta(hours=4)).isoformat(),
+        )
+
+        assert response.status_code == 409
+        conflicts = response.json()["detail"]["conflicts"]
+        assert [c["reservation_id"] for c in conflicts] == [blocker["id"]]
+        unchanged = client.get(f"/api/v1/reservations/{reservation['id']}", headers=auth_headers)
+        assert unchanged.json()["end_time"].startswith("2030-01-01T10:00:00")
+
+    def test_device_diff(
+        self, client: TestClient, auth_headers, node_with_devices
+    ):
+        """Test that devices are added and dropped, and dropped ones become free."""
+        reservation = self._create(client, auth_headers, node_with_devices)
+        devices = [device.id for device in node_with_devices.devices]
+
+        response = self._patch(
+            client, auth_headers, reservation["id"], device_ids=[devices[1], devices[2]]
+        )
+
+        assert response.status_code == 200
+        assert sorted(d["id"] for d in response.json()["reserved_devices"]) == devices[1:3]
+        freed = client.post(
+            "/api/v1/reservations/",
+            headers=auth_headers,
+            json=reservation_payload(node_with_devices, device_indexes=[0]),
+        )
+        taken = client.post(
+            "/api/v1/reservations/",
+            headers=auth_headers,
+            json=reservation_payload(node_with_devices, device_indexes=[2]),
+        )
+        assert freed.status_code == 201
+        assert taken.status_code == 409
+
+    def test_added_device_conflict(
+        self, client: TestClient, auth_headers, node_with_devices
+    ):
+        """Test that a new device busy during the kept range is rejected."""
+        reservation = self._create(client, auth_headers, node_with_devices)
+        blocker = self._create(
+            client, auth_headers, node_with_devices, hours=(1, 3), device_indexes=(3,)
+        )
+
+        response = self._patch(
+            client,
+            auth_headers,
+            reservation["id"],
+            device_ids=[node_with_devices.devices[i].id for i in (0, 1, 3)],
+        )
+
+        assert response.status_code == 409
+        conflict = response.json()["detail"]["conflicts"][0]
+        assert conflict["reservation_id"] == blocker["id"]
+        assert conflict["device_ids"] == [node_with_devices.devices[3].id]
+
+    def test_shrink_releases_to_waitlist(
+        self, client: TestClient, auth_headers, admin_headers, node_with_devices
+    ):
+        """Test that time given up by shrinking goes to a waiting entry."""
+        reservation = self._create(client, auth_headers, node_with_devices, hours=(0, 4))
+        entry = client.post(
+            "/api/v1/reservations/waitlist",
+            headers=admin_headers,
+            json=reservation_payload(node_with_devices, (2, 4), [0]),
+        ).json()
+        assert entry["status"] == "waiting"
+
+        response = self._patch(
+            client,
+            auth_headers,
+            reservation["id"],
+            end_time=(BASE_TIME + timedelta(hours=2)).isoformat(),
+        )
+
+        assert response.status_code == 200
+        entry = client.get(f"/api/v1/reservations/waitlist/{entry['id']}", headers=admin_headers)
+        assert entry.json()["status"] == "allocated"
+
+    def test_invalid_updates_rejected(
+        self, client: TestClient, auth_headers, admin_headers, node_with_devices
+    ):
+        """Test empty ranges, devices on machine reservations and foreign owners."""
+        devices = self._create(client, auth_headers, node_with_devices)
+        machine = client.post(
+            "/api/v1/reservations/",
+            headers=auth_headers,
+            json=reservation_payload(node_with_devices, hours=(5, 6)),
+        ).json()
+
+        empty = self._patch(
+            client,
+            auth_headers,
+            devices["id"],
+            end_time=BASE_TIME.isoformat(),
+        )
+        machine_devices = self._patch(
+            client, auth_headers, machine["id"], device_ids=[node_with_devices.devices[0].id]
+        )
+        foreign = self._patch(
+            client, admin_headers, devices["id"], end_time=BASE_TIME.isoformat()
+        )
+
+        assert empty.status_code == 400
+        assert machine_devices.status_code == 400
+        assert foreign.status_code == 403
+
+
+class TestIdempotencyKeys:
+    """Tests for Idempotency-Key handling on reservation writes"""
+
+    def test_retry_replays_create(
+        self, client: TestClient, db_session, auth_headers, node_with_devices
+    ):
+        """Test that a retried create returns the first booking instead of a 409."""
+        headers = {**auth_headers, "Idempotency-Key": "create-1"}
+        payload = reservation_payload(node_with_devices, device_indexes=[0])
+
+        first = client.post("/api/v1/reservations/", headers=headers, json=payload)
+        retry = client.post("/api/v1/reservations/", headers=headers, json=payload)
+
+        assert first.status_code == retry.status_code == 201
+        assert retry.json() == first.json()
+        assert retry.headers["Idempotent-Replayed"] == "true"
+        assert db_session.query(Reservation).count() == 1
+
+    def test_retry_replays_delete(
+        self, client: TestClient, auth_headers, node_with_devices
+    ):
+        """Test that a retried delete returns 204 again instead of 404."""
+        reservation = client.post(
+            "/api/v1/reservations/",
+            headers=auth_headers,
+            json=reservation_payload(node_with_devices),
+        ).json()
+        headers = {**auth_headers, "Idempotency-Key": "delete-1"}
+
+        first = client.delete(f"/api/v1/reservations/{reservation['id']}", headers=headers)
+        retry = client.delete(f"/api/v1/reservations/{reservation['id']}", headers=headers)
+        fresh = client.delete(f"/api/v1/reservations/{reservation['id']}", headers=auth_headers)
+
+        assert first.status_code == retry.status_code == 204
+        assert fresh.status_code == 404
+
+    def test_key_reuse_with_other_body_rejected(
+        self, client: TestClient, auth_headers, node_with_devices
+    ):
+        """Test that a key can't be replayed for a different request."""
+        headers = {**auth_headers, "Idempotency-Key": "create-1"}
+        client.post(
+            "/api/v1/reservations/",
+            headers=headers,
+            json=reservation_payload(node_with_devices, device_indexes=[0]),
+        )
+
+        response = client.post(
+            "/api/v1/reservations/",
+            headers=headers,
+            json=reservation_payload(node_with_devices, device_indexes=[1]),
+        )
+
+        assert response.status_code == 422
+
+    def test_keys_are_scoped_per_caller(
+        self, client: TestClient, auth_headers, admin_headers, node_with_devices
+    ):
+        """Test that another user's identical key runs its own request."""
+        first = client.post(
+            "/api/v1/reservations/",
+            headers={**auth_headers, "Idempotency-Key": "shared"},
+            json=reservation_payload(node_with_devices, device_indexes=[0]),
+        )
+        other = client.post(
+            "/api/v1/reservations/",
+            headers={**admin_headers, "Idempotency-Key": "shared"},
+            json=reservation_payload(node_with_devices, device_indexes=[0]),
+        )
+
+        assert first.status_code == 201
+        assert other.status_code == 409
+        assert "Idempotent-Replayed" not in other.headers
+
+    def test_retry_after_token_refresh_replays(
+        self, client: TestClient, db_session, auth_headers, node_with_devices
+    ):
+        """Test that a retry with a refreshed access token still replays the booking."""
+        from app.core.security import create_access_token, decode_access_token
+
+        claims = decode_access_token(auth_headers["Authorization"].split()[1])
+        claims.pop("exp")
+        refreshed = create_access_token(claims, expires_delta=timedelta(minutes=5))
+        payload = reservation_payload(node_with_devices)
+
+        first = client.post(
+            "/api/v1/reservations/",
+            headers={**auth_headers, "Idempotency-Key": "refresh-1"},
+            json=payload,
+        )
+        retry = client.post(
+            "/api/v1/reservations/",
+            headers={"Authorization": f"Bearer {refreshed}", "Idempotency-Key": "refresh-1"},
+            json=payload,
+        )
+
+        assert refreshed != auth_headers["Authorization"].split()[1]
+        assert first.status_code == retry.status_code == 201
+        assert retry.headers["Idempotent-Replayed"] == "true"
+        assert db_session.query(Reservation).count() == 1
+
+    def test_auth_failures_not_stored(
+        self, client: TestClient, db_session, auth_headers, node_with_devices
+    ):
+        """Test that a 403 is not replayed once the request is allowed."""
+        from app.crud import crud_user
+        from app.schemas.user import ApiKeyCreate
+        from app.services import auth_service
+
+        user_id = crud_user.get_user_by_username(db_session, "testuser").id
+        payload = reservation_payload(node_with_devices)
+        api_key, key = auth_service.create_api_key(
+            db_session, user_id, ApiKeyCreate(name="ci", scopes=["read"])
+        )
+        headers = {"Authorization": f"Bearer {key}", "Idempotency-Key": "scoped-1"}
+
+        denied = client.post("/api/v1/reservations/", headers=headers, json=payload)
+        api_key.scopes = ["read", "reservations"]
+        db_session.commit()
+        allowed = client.post("/api/v1/reservations/", headers=headers, json=payload)
+
+        assert denied.status_code == 403
+        assert allowed.status_code == 201
+        assert "Idempotent-Replayed" not in allowed.headers
+
+    def test_store_is_bounded_and_expires(self, monkeypatch):
+        """Test size-bounded and TTL eviction of stored responses."""
+        from app.core import idempotency
+
+        now = [1000.0]
+        monkeypatch.setattr(idempotency.time, "monotonic", lambda: now[0])
+        store = idempotency.IdempotencyStore(max_entries=2, ttl_seconds=60)
+        for key in ("a", "b", "c"):
+            assert store.begin((key,), "body")[0] == idempotency.NEW
+            store.finish((key,), "body", (201, [], b"{}"))
+
+        assert len(store) == 2
+        assert store.begin(("a",), "body")[0] == idempotency.NEW
+        assert store.begin(("c",), "body")[0] == idempotency.REPLAY
+        assert store.begin(("c",), "other")[0] == idempotency.MISMATCH
+        assert store.begin(("a",), "body")[0] == idempotency.IN_PROGRESS
+
+        now[0] += 61
+        assert store.begin(("c",), "body")[0] == idempotency.NEW
+
+
+class _NoLocks:
+    """Stand-in for the in-process lock stripes, leaving only the DB guard."""
+
+    @contextmanager
+    def hold(self, *keys):
+        yield
+
+
+class TestConcurrentReservations:
+    """Stress tests for reservation_service.create_reservation under concurrency"""
+
+    THREADS = 8
+    ROUNDS = 5
+
+    @pytest.fixture
+    def file_db(self, tmp_path):
+        """A file-backed SQLite database, so every thread gets its own connection."""
+        from app.crud import crud_node
+        from app.schemas.node import DeviceCreate, NodeCreate
+        from app.schemas.user import UserCreate
+        from app.services import auth_service
+
+        engine = create_engine(
+            f"sqlite:///{tmp_path / 'concurrency.db'}",
+            connect_args={"check_same_thread": False},
+        )
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        with Session() as db:
+            user = auth_service.create_user(
+                db, UserCreate(username="racer", email="racer@example.com", password="racer123")
+            )
+            nodes = []
+            for n in range(self.THREADS):
+                node = crud_node.create_node(
+                    db, NodeCreate(name=f"npu-node-{n:02d}", ip_address=f"10.0.1.{n}")
+                )
+                for index in range(2):
+                    crud_node.create_device(
+                        db, DeviceCreate(device_index=index, model_name="Ascend910B"), node.id
+                    )
+                devices = crud_node.get_node_devices(db, node.id)
+                nodes.append((node.id, [device.id for device in devices]))
+            yield Session, user.id, nodes
+        engine.dispose()
+
+    def _race(self, Session, user_id, requests):
+        """Submit one request per thread at the same instant; return outcomes."""
+        barrier = threading.Barrier(len(requests))
+        outcomes = [None] * len(requests)
+
+        def worker(i):
+            with Session() as db:
+                barrier.wait()
+                try:
+                    outcomes[i] = reservation_service.create_reservation(db, requests[i], user_id).id
+                except ValueError as exc:
+                    outcomes[i] = exc
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(requests))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def _overlapping_requests(self, node_id, device_ids, round_no):
+        start = BASE_TIME + timedelta(days=round_no)
+        return [
+            ReservationCreate(
+                node_id=node_id,
+                start_time=start + timedelta(minutes=5 * i),
+                end_time=start + timedelta(hours=2),
+                type=ReservationType.DEVICE,
+                device_ids=[device_ids[0]],
+            )
+            for i in range(self.THREADS)
+        ]
+
+    def _assert_single_winner(self, Session, user_id, node_id, device_ids):
+        for round_no in range(self.ROUNDS):
+            outcomes = self._race(
+                Session, user_id, self._overlapping_requests(node_id, device_ids, round_no)
+            )
+            winners = [outcome for outcome in outcomes if isinstance(outcome, int)]
+            assert len(winners) == 1
+            assert all("conflict" in str(outcome) for outcome in outcomes if outcome not in winners)
+        with Session() as db:
+            assert db.query(Reservation).filter(Reservation.node_id == node_id).count() == self.ROUNDS
+
+    def test_no_double_booking(self, file_db):
+        """Test that overlapping requests racing for one device produce one booking."""
+        Session, user_id, nodes = file_db
+        node_id, device_ids = nodes[0]
+        self._assert_single_winner(Session, user_id, node_id, device_ids)
+
+    def test_database_guard_alone_prevents_double_booking(self, file_db, monkeypatch):
+        """Test that the DB-level guard holds without the in-process stripes (multi-worker case)."""
+        monkeypatch.setattr(reservation_service, "node_write_locks", _NoLocks())
+        Session, user_id, nodes = file_db
+        node_id, device_ids = nodes[0]
+        self._assert_single_winner(Session, user_id, node_id, device_ids)
+
+    def test_different_nodes_all_succeed(self, file_db):
+        """Test that concurrent requests on different nodes are all accepted."""
+        Session, user_id, nodes = file_db
+        requests = [
+            ReservationCreate(
+                node_id=node_id,
+                start_time=BASE_TIME,
+                end_time=BASE_TIME + timedelta(hours=2),
+                type=ReservationType.MACHINE,
+            )
+            for node_id, _ in nodes
+        ]
+
+        outcomes = self._race(Session, user_id, requests)
+
+        assert all(isinstance(outcome, int) for outcome in outcomes)
+        with Session() as db:
+            assert db.query(Reservation).count() == len(nodes)
+
+    def test_different_nodes_use_different_stripes(self):
+        """Test that lock stripes are keyed so distinct nodes don't share a lock."""
+        from app.core.locks import LockStripes
+
+        stripes = LockStripes(64)
+        assert len({stripes.stripe(node_id) for node_id in range(64)}) == 64
@@ -0,0 +1,184 @@
+"""
+Unit tests for reservation archival and the history/stats APIs.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.crud import crud_reservation
+from app.crud.reservation_index import reservation_index
+from app.models.reservation import (
+    ArchivedReservation,
+    ArchivedReservationDevice,
+    Reservation,
+    ReservationDevice,
+    ReservationType,
+)
+from app.schemas.reservation import ReservationCreate
+from app.services import archive_service
+
+LONG_AGO = datetime(2020, 1, 1, 8, 0, 0)
+FUTURE = datetime(2030, 1, 1, 8, 0, 0)
+
+
+@pytest.fixture
+def history(db_session, node_with_devices):
+    """IDs of three finished two-hour device reservations and one in the future."""
+    user_id = _user_id(db_session)
+    reservations = []
+    for day, start in enumerate([LONG_AGO, LONG_AGO, LONG_AGO, FUTURE]):
+        reservations.append(
+            crud_reservation.create_reservation(
+                db_session,
+                ReservationCreate(
+                    node_id=node_with_devices.id,
+                    start_time=start + timedelta(days=day),
+                    end_time=start + timedelta(days=day, hours=2),
+                    type=ReservationType.DEVICE,
+                    device_ids=[node_with_devices.devices[day].id],
+                ),
+                user_id=user_id,
+            ).id
+        )
+    return reservations
+
+
+def _user_id(db_session):
+    from app.crud import crud_user
+
+    return crud_user.get_user_by_username(db_session, "admin").id
+
+
+class TestArchiveReservations:
+    """Tests for archive_service.archive_reservations"""
+
+    def test_moves_finished_reservations_in_batches(
+        self, db_session, real_admin_headers, node_with_devices, history
+    ):
+        """Test that old reservations and their devices move; current ones stay."""
+        assert reservation_index.ensure_node(db_session, node_with_devices.id)
+
+        archived = archive_service.archive_reservations(
+            db_session, older_than_days=30, batch_size=2, pause_seconds=0
+        )
+
+        assert archived == 3
+        assert [r.id for r in db_session.query(Reservation)] == [history[3]]
+        assert db_session.query(ReservationDevice).count() == 1
+        assert sorted(r.id for r in db_session.query(ArchivedReservation)) == history[:3]
+        assert db_session.query(ArchivedReservationDevice).count() == 3
+        # The index dropped the archived reservations and still matches the DB
+        assert reservation_index.ensure_node(db_session, node_with_devices.id)
+
+    def test_ids_not_reused_after_archiving(
+        self, db_session, real_admin_headers, node_with_devices, history
+    ):
+        """Test that a reservation created after archiving the newest ID gets a fresh ID."""
+        crud_reservation.delete_reservation(db_session, history[3])
+        assert archive_service.archive_reservations(
+            db_session, older_than_days=30, pause_seconds=0
+        ) == 3
+
+        replacement = crud_reservation.create_reservation(
+            db_session,
+            ReservationCreate(
+                node_id=node_with_devices.id,
+                start_time=LONG_AGO,
+                end_time=LONG_AGO + timedelta(hours=1),
+                type=ReservationType.MACHINE,
+            ),
+            user_id=_user_id(db_session),
+        )
+        replacement_id = replacement.id
+
+        assert replacement_id > history[3]
+        assert archive_service.archive_reservations(
+            db_session, older_than_days=30, pause_seconds=0
+        ) == 1
+        assert sorted(r.id for r in db_session.query(ArchivedReservation)) == [
+            *history[:3],
+            replacement_id,
+        ]
+
+    def test_negative_age_rejected(self, db_session):
+        """Test that unfinished reservations can't be archived."""
+        with pytest.raises(ValueError):
+            archive_service.archive_reservations(db_session, older_than_days=-1)
+
+
+class TestReservationHistory:
+    """Tests for GET /api/v1/history/reservations"""
+
+    def test_history_reads_live_and_archive(
+        self, client: TestClient, db_session, real_admin_headers, history
+    ):
+        """Test that archived reservations are still listed, newest first."""
+        archive_service.archive_reservations(db_session, older_than_days=30, pause_seconds=0)
+
+        response = client.get("/api/v1/history/reservations", headers=real_admin_headers)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [item["id"] for item in data] == list(reversed(history))
+        assert [item["archived"] for item in data] == [False, True, True, True]
+        assert data[0]["user_email"] == "admin@example.com"
+        assert data[0]["node_name"] == "npu-node-01"
+
+    def test_history_pagination_spans_both_tables(
+        self, client: TestClient, db_session, real_admin_headers, history
+    ):
+        """Test that skip/limit apply to the combined result."""
+        archive_service.archive_reservations(db_session, older_than_days=30, pause_seconds=0)
+
+        response = client.get(
+            "/api/v1/history/reservations",
+            headers=real_admin_headers,
+            params={"skip": 1, "limit": 2},
+        )
+
+        assert [item["id"] for item in response.json()] == [history[2], history[1]]
+
+    def test_history_cursor_spans_both_tables(
+        self, client: TestClient, db_session, real_admin_headers, history
+    ):
+        """Test that cursor pages walk from live into archived reservations."""
+        archive_service.archive_reservations(db_session, older_than_days=30, pause_seconds=0)
+
+        ids, cursor = [], None
+        while True:
+            params = {"limit": 3}
+            if cursor:
+                params["cursor"] = cursor
+            response = client.get(
+                "/api/v1/history/reservations", headers=real_admin_headers, params=params
+            )
+            ids.extend(item["id"] for item in response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+
+        assert ids == list(reversed(history))
+
+    def test_history_requires_admin(self, client: TestClient, auth_headers):
+        """Test that regular users can't read everyone's history."""
+        response = client.get("/api/v1/history/reservations", headers=auth_headers)
+        assert response.status_code == 403
+
+
+class TestUserStats:
+    """Tests for GET /api/v1/stats/users"""
+
+    def test_user_stats_include_archive(
+        self, client: TestClient, db_session, real_admin_headers, history
+    ):
+        """Test that totals are the same before and after archiving."""
+        before = client.get("/api/v1/stats/users", headers=real_admin_headers).json()
+        archive_service.archive_reservations(db_session, older_than_days=30, pause_seconds=0)
+        after = client.get("/api/v1/stats/users", headers=real_admin_headers).json()
+
+        assert before == after
+        report = after["reports"][0]
+        assert report["total_reservations"] == 4
+        assert report["total_usage_hours"] == pytest.approx(8.0)
@@ -20,8 +20,21 @@ export const authStore = {
         api.defaults.headers.common["Authorization"] = `Bearer ${token}`;
     },
 
+    getRefreshToken(): string | null {
+        return localStorage.getItem("refresh_token");
+    },
+
+    setRefreshToken(token: string | null) {
+        if (token) {
+            localStorage.setItem("refresh_token", token);
+        } else {
+            localStorage.removeItem("refresh_token");
+        }
+    },
+
     removeToken() {
         localStorage.removeItem("token");
+        localStorage.removeItem("refresh_token");
         delete api.defaults.headers.common["Authorization"];
     },
 
@@ -44,11 +57,46 @@ api.interceptors.request.use(
     }
 );
 
+// 访问令牌有效期很短，过期后用刷新令牌换取新令牌（并发请求共用一次刷新）
+let refreshing: Promise<string | null> | null = null;
+
+const refreshAccessToken = (): Promise<string | null> => {
+    const refreshToken = authStore.getRefreshToken();
+    if (!refreshToken) {
+        return Promise.resolve(null);
+    }
+    if (!refreshing) {
+        refreshing = axios
+            .post(`${api.defaults.baseURL ?? ""}/api/v1/auth/refresh`, {
+                refresh_token: refreshToken,
+            })
+            .then((response) => {
+                authStore.setToken(response.data.access_token);
+                authStore.setRefreshToken(response.data.refresh_token ?? null);
+                return response.data.access_token as string;
+            })
+            .catch(() => null)
+            .finally(() => {
+                refreshing = null;
+            });
+    }
+    return refreshing;
+};
+
 // 响应拦截器 - 处理 401 错误
 api.interceptors.response.use(
     (response) => response,
-    (error) => {
+    async (error) => {
+        const original = error.config;
         if (error.response?.status === 401) {
+            if (original && !original._retried) {
+                original._retried = true;
+                const token = await refreshAccessToken();
+                if (token) {
+                    original.headers.Authorization = `Bearer ${token}`;
+                    return api(original);
+                }
+            }
             authStore.removeToken();
             window.location.href = "/login";
         }
@@ -7,6 +7,8 @@ export type LoginPayload = {
 export type LoginResponse = {
     access_token: string;
     token_type: string;
+    refresh_token?: string;
+    expires_in?: number;
 };
 
 export type CurrentUser = {
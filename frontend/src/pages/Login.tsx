@@ -17,6 +17,7 @@ const Login = () => {
         try {
             const response = await login(values);
             authStore.setToken(response.data.access_token);
+            authStore.setRefreshToken(response.data.refresh_token ?? null);
             messageApi.success("登录成功");
             navigate("/", { replace: true });
         } catch (error) {
@@ -127,7 +127,19 @@ const Reservations = () => {
                 // 表单验证错误，不显示 message
                 return;
             }
-            message.error(error.response?.data?.detail || "创建预约失败");
+            const detail = error.response?.data?.detail;
+            if (detail?.message) {
+                // 预约冲突：提示最早可用时间
+                message.error(
+                    detail.next_available_start
+                        ? `${detail.message}，最早可预约时间：${dayjs(
+                              detail.next_available_start
+                          ).format("YYYY-MM-DD HH:mm")}`
+                        : detail.message
+                );
+            } else {
+                message.error(detail || "创建预约失败");
+            }
         } finally {
             setSubmitting(false);
         }